@@ -0,0 +1,176 @@
+'''
+Benchmarks for the Pacman engine, the gym environments, the feature
+extractors and the gridworld MDP.
+
+Each benchmark plays a fixed, seeded workload on one of the shipped layouts
+or grids, so that runs on the same machine are comparable. `run` measures
+for each benchmark:
+
+  ops_per_sec: operations per second, from the fastest of `repeat` timed runs
+  retained_blocks_per_op: memory blocks still allocated and reachable at the
+    end of a run, per operation (see `sys.getallocatedblocks`). This is net
+    growth, e.g. a cache or a leak; blocks allocated and freed within the
+    run are not counted
+  peak_bytes: the peak memory allocated during a run, from `tracemalloc`
+
+Results are stored as JSON with `save`, and `compare` checks them against a
+saved baseline. From the command line:
+
+  python -m benchmarks --output baseline.json
+  python -m benchmarks --baseline baseline.json --threshold 0.1
+'''
+
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks import workloads
+
+FORMAT_VERSION = 2
+SEED = 0
+METRICS = ('ops_per_sec', 'retained_blocks_per_op', 'peak_bytes')
+
+
+def names():
+    '''
+    Names of the benchmarks, in the order they are run.
+    '''
+    return list(workloads.BENCHMARKS)
+
+
+def run_benchmark(name, repeat=5, scale=1.0, seed=SEED):
+    '''
+    Run one benchmark and return a dict of its metrics, or of the error it
+    raised.
+
+    repeat: the number of timed runs.
+    scale: multiplies the number of operations of each run.
+    '''
+    setup, ops = workloads.BENCHMARKS[name]
+    ops = max(1, int(ops * scale))
+    try:
+        random.seed(seed)
+        run = setup(seed)
+        run(ops) # warm up caches and lazily built tables
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(ops)
+            times.append(time.perf_counter() - start)
+
+        gc.collect()
+        blocks = sys.getallocatedblocks()
+        run(ops)
+        gc.collect() # unreachable cycles are not retained
+        blocks = sys.getallocatedblocks() - blocks
+
+        tracemalloc.start()
+        try:
+            run(ops)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except Exception as e:
+        return {'ops': ops, 'error': '%s: %s' % (type(e).__name__, e)}
+
+    best = min(times)
+    return {
+        'ops': ops,
+        'seconds': best,
+        'ops_per_sec': ops / best if best > 0 else float('inf'),
+        'retained_blocks_per_op': blocks / ops,
+        'peak_bytes': peak,
+    }
+
+
+def run(selected=None, repeat=5, scale=1.0, seed=SEED, out=None):
+    '''
+    Run the selected benchmarks (by default all) and return the results, a
+    JSON-serializable dict. Prints a line per benchmark to `out` if given.
+    '''
+    results = {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': seed,
+        'repeat': repeat,
+        'scale': scale,
+        'benchmarks': {},
+    }
+    for name in selected or names():
+        if name not in workloads.BENCHMARKS:
+            raise Exception('Unknown benchmark: ' + name)
+        result = run_benchmark(name, repeat, scale, seed)
+        results['benchmarks'][name] = result
+        if out is not None:
+            print(format_result(name, result), file=out)
+    return results
+
+
+def format_result(name, result):
+    if 'error' in result:
+        return '%-44s error: %s' % (name, result['error'])
+    return '%-44s %12.1f ops/s %9.2f retained blocks/op %9.1f KiB peak' % (
+        name, result['ops_per_sec'], result['retained_blocks_per_op'], result['peak_bytes'] / 1024)
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('version') != FORMAT_VERSION:
+        raise Exception('Unsupported benchmark results version in %s, save a new baseline' % path)
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    Compare results against a baseline. Returns a list with a dict per
+    benchmark measured in both, holding the baseline and current value and the
+    relative change of each metric, and whether it regressed: if ops_per_sec
+    dropped, or retained_blocks_per_op or peak_bytes grew, by more than
+    `threshold` (0.1 is 10%). Blocks per op are allowed to grow by one more
+    than that, since a handful of blocks per run is noise.
+    '''
+    comparisons = []
+    for name, result in results['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None or 'error' in base or 'error' in result:
+            continue
+        for metric in METRICS:
+            old, new = base[metric], result[metric]
+            if metric == 'ops_per_sec':
+                regressed = new < old * (1 - threshold)
+            elif metric == 'retained_blocks_per_op':
+                regressed = new > old * (1 + threshold) + 1
+            else:
+                regressed = new > old * (1 + threshold)
+            comparisons.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': (new - old) / old if old else 0.0,
+                'regressed': regressed,
+            })
+    return comparisons
+
+
+def format_comparison(comparisons):
+    lines = ['%-44s %-24s %14s %14s %8s' % ('benchmark', 'metric', 'baseline', 'current', 'change')]
+    for c in comparisons:
+        lines.append('%-44s %-24s %14.2f %14.2f %+7.1f%%%s' % (
+            c['benchmark'], c['metric'], c['baseline'], c['current'], 100 * c['change'],
+            '  REGRESSION' if c['regressed'] else ''))
+    return '\n'.join(lines)
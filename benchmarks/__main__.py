@@ -0,0 +1,61 @@
+'''
+Run the benchmarks, optionally save the results and compare them against a
+baseline. Exits with status 1 if a benchmark regressed.
+
+  python -m benchmarks --list
+  python -m benchmarks --output baseline.json
+  python -m benchmarks engine.generateSuccessor.mediumClassic --baseline baseline.json
+'''
+
+import argparse
+import sys
+
+import benchmarks
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description='Run the benchmarks')
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('-l', '--list', action='store_true', default=False,
+                        help='List the benchmarks and exit')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write the results as JSON to this file')
+    parser.add_argument('-b', '--baseline', default=None,
+                        help='Compare the results against the JSON results in this file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                        help='Relative change of a metric that counts as a regression (default %(default)s)')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='Number of timed runs of each benchmark (default %(default)s)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply the number of operations of each run (default %(default)s)')
+    parser.add_argument('--seed', type=int, default=benchmarks.SEED,
+                        help='Seed of the workloads (default %(default)s)')
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    if args.list:
+        print('\n'.join(benchmarks.names()))
+        return 0
+
+    baseline = benchmarks.load(args.baseline) if args.baseline else None
+    results = benchmarks.run(args.names, args.repeat, args.scale, args.seed, out=sys.stdout)
+    if args.output:
+        benchmarks.save(results, args.output)
+        print('Results written to', args.output)
+
+    if baseline is not None:
+        comparisons = benchmarks.compare(results, baseline, args.threshold)
+        print()
+        print(benchmarks.format_comparison(comparisons))
+        regressions = [c for c in comparisons if c['regressed']]
+        if regressions:
+            print('%d regression(s) beyond %.0f%%' % (len(regressions), 100 * args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
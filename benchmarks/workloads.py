@@ -0,0 +1,159 @@
+'''
+The benchmark workloads. Each benchmark is a `setup(seed)` function, which
+builds the workload and returns a `run(n)` function doing n operations, and
+the default number of operations per run. Setup is not timed.
+'''
+
+import random
+
+from reinforcement import featureExtractors, gridworld, layout, pacman
+
+TRAJECTORY_LENGTH = 2000
+
+
+def random_trajectory(layout_name, seed, length=TRAJECTORY_LENGTH):
+    '''
+    Play random legal moves for all agents on a layout, starting a new game
+    whenever one ends, and return the (state, agentIndex, action) triples.
+    '''
+    rng = random.Random(seed)
+    lay = layout.getLayout(layout_name)
+    trajectory = []
+    while len(trajectory) < length:
+        state = pacman.GameState()
+        state.initialize(lay, lay.getNumGhosts())
+        agent = 0
+        while not (state.isWin() or state.isLose()) and len(trajectory) < length:
+            action = rng.choice(state.getLegalActions(agent))
+            trajectory.append((state, agent, action))
+            state = state.generateSuccessor(agent, action)
+            agent = (agent + 1) % state.getNumAgents()
+    return trajectory
+
+
+def generate_successor(layout_name):
+    def setup(seed):
+        trajectory = random_trajectory(layout_name, seed)
+
+        def run(n):
+            for i in range(n):
+                state, agent, action = trajectory[i % len(trajectory)]
+                state.generateSuccessor(agent, action)
+        return run
+    return setup
+
+
+def simple_extractor(layout_name):
+    def setup(seed):
+        extractor = featureExtractors.SimpleExtractor()
+        pairs = [(state, action) for state, agent, action in random_trajectory(layout_name, seed)
+                 if agent == 0]
+
+        def run(n):
+            for i in range(n):
+                state, action = pairs[i % len(pairs)]
+                extractor.getFeatures(state, action)
+        return run
+    return setup
+
+
+def pacman_env_step(layout_name, ghost_agent='RandomGhost', **env_kwargs):
+    def setup(seed):
+        from gymberkeleyrl.envs.pacmanenv import PacmanEnv
+        env = PacmanEnv(layout=layout_name, ghost_agent=ghost_agent, quiet_graphics=True, **env_kwargs)
+        env.seed(seed)
+        env.reset(quiet=True)
+        rng = random.Random(seed)
+
+        def run(n):
+            for _ in range(n):
+                _, _, done, _ = env.step(rng.choice(env.getPossibleActions()))
+                if done:
+                    env.reset(quiet=True)
+        return run
+    return setup
+
+
+def gridworld_env_step(grid):
+    def setup(seed):
+        from gymberkeleyrl.envs.gridworldenv import GridworldEnv
+        env = GridworldEnv(grid=grid, textDisplay=True)
+        env.seed(seed)
+        env.reset()
+        rng = random.Random(seed)
+
+        def run(n):
+            for _ in range(n):
+                _, _, done, _ = env.step(rng.choice(env.getPossibleActions()))
+                if done:
+                    env.reset()
+        return run
+    return setup
+
+
+def gridworld_env_step_many(grid, episodes=20):
+    '''
+    One operation is a whole episode played with one call to `step_many`.
+    Without noise the moves are deterministic, so action sequences found by
+    a seeded random walk can be replayed open loop.
+    '''
+    def setup(seed):
+        from gymberkeleyrl.envs.gridworldenv import GridworldEnv
+        env = GridworldEnv(grid=grid, noise=0.0, textDisplay=True)
+        env.seed(seed)
+        rng = random.Random(seed)
+        plans = []
+        for _ in range(episodes):
+            env.reset()
+            plan = []
+            done = False
+            while not done:
+                plan.append(rng.choice(env.getPossibleActions()))
+                _, _, done, _ = env.step(plan[-1])
+            plans.append(plan)
+
+        def run(n):
+            for i in range(n):
+                env.reset()
+                env.step_many(plans[i % len(plans)])
+        return run
+    return setup
+
+
+def bellman_sweep(grid, discount=0.9):
+    '''
+    One operation is a sweep of Bellman backups over all the states of a grid,
+    through the MDP interface that the value iteration agents use. The agents
+    themselves are left for students to write, so they are not timed.
+    '''
+    def setup(seed):
+        mdp = getattr(gridworld, 'get' + grid)()
+        states = mdp.getStates()
+
+        def run(n):
+            values = dict.fromkeys(states, 0.0)
+            for _ in range(n):
+                new_values = {}
+                for state in states:
+                    q_values = [sum(prob * (mdp.getReward(state, action, next_state) +
+                                            discount * values[next_state])
+                                    for next_state, prob in mdp.getTransitionStatesAndProbs(state, action))
+                                for action in mdp.getPossibleActions(state)]
+                    new_values[state] = max(q_values) if q_values else 0.0
+                values = new_values
+        return run
+    return setup
+
+
+# name: (setup, operations per run)
+BENCHMARKS = {
+    'engine.generateSuccessor.mediumClassic': (generate_successor('mediumClassic'), 5000),
+    'engine.generateSuccessor.originalClassic': (generate_successor('originalClassic'), 5000),
+    'features.SimpleExtractor.mediumClassic': (simple_extractor('mediumClassic'), 500),
+    'env.PacmanEnv.step.mediumClassic': (pacman_env_step('mediumClassic'), 1000),
+    'env.PacmanEnv.step.readonly.mediumClassic': (
+        pacman_env_step('mediumClassic', readonly_observations=True), 1000),
+    'env.GridworldEnv.step.BookGrid': (gridworld_env_step('BookGrid'), 5000),
+    'env.GridworldEnv.step_many.BookGrid': (gridworld_env_step_many('BookGrid'), 200),
+    'mdp.BellmanSweep.MazeGrid': (bellman_sweep('MazeGrid'), 20),
+}
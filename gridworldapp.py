@@ -1,7 +1,10 @@
 
 import argparse
-from gymberkeleyrl.envs.gridworldenv import GridworldEnv
-from reinforcement import valueIterationAgents, qlearningAgents
+import csv
+import functools
+import multiprocessing
+import sys
+from reinforcement import gridworld, valueIterationAgents, qlearningAgents, profiling, telemetry
 import random
 
 
@@ -118,6 +121,26 @@ def parseArgs():
                          help='Manually control agent')
     parser.add_argument('-v', '--valueSteps', action='store_true', default=False,
                          help='Display each step of value iteration')
+    parser.add_argument('--profile', metavar='PREFIX', default=None,
+                         help='Profile the agent\'s construction (e.g. value iteration) and the episodes, writing the profile to files starting with PREFIX')
+    parser.add_argument('--profiler', choices=profiling.MODES, default='cprofile',
+                         help='How to profile: cprofile writes PREFIX.pstats, sampling writes PREFIX.collapsed for flame graphs (default %(default)s)')
+    parser.add_argument('--metricsFile', metavar='FILE', default=None,
+                         help='Write the return, length, epsilon, alpha and time of each episode of the q agent to FILE (JSON lines, or CSV if FILE ends in .csv)')
+    parser.add_argument('--memoryLog', metavar='FILE', default=None,
+                         help='Trace allocations, logging the memory retained and the sites which grew after each episode to FILE')
+    parser.add_argument('--memoryTop', type=int, default=10,
+                         help='Number of growing allocation sites to log per episode (default %(default)s)')
+    parser.add_argument('-b', '--batch', action='store_true', default=False,
+                         help='Run the episodes headless for several seeds, without display or messages')
+    parser.add_argument('--seeds', metavar='M', type=int, default=1,
+                         help='Number of seeds to run in batch mode, SEED to SEED+M-1 (default %(default)s)')
+    parser.add_argument('--seed', type=int, default=0,
+                         help='First seed of batch mode (default %(default)s)')
+    parser.add_argument('--curveFile', metavar='FILE', default=None,
+                         help='In batch mode, write the return and length of every episode of every seed to FILE as CSV')
+    parser.add_argument('--workers', type=int, default=1,
+                         help='Number of processes running the seeds of batch mode (default %(default)s)')
     args = parser.parse_args()
     # MANAGE CONFLICTS
     if args.textDisplay or args.quiet:
@@ -125,12 +148,128 @@ def parseArgs():
 
     if args.manual:
         args.pause = True
+
+    if args.batch and args.agent not in ('random', 'value', 'q'):
+        parser.error('batch mode runs the random, value or q agent')
+    if args.batch and (args.metricsFile or args.memoryLog):
+        parser.error('batch mode writes its episodes with --curveFile, not --metricsFile or --memoryLog')
         
     return args
 
 
+def make_batch_agent(args, mdp, actionFn):
+    '''
+    The agent of a seed of batch mode.
+    '''
+    if args.agent == 'value':
+        return valueIterationAgents.ValueIterationAgent(mdp, args.discount, args.iters)
+    elif args.agent == 'q':
+        return qlearningAgents.QLearningAgent(gamma=args.discount, alpha=args.learningRate,
+                                              epsilon=args.epsilon, actionFn=actionFn)
+    return RandomAgent(actionFn=actionFn)
+
+
+def run_seed(args, seed):
+    '''
+    Run the episodes of one seed of batch mode, with the agent and 
+    transitions drawn from random streams seeded with `seed`. Returns the 
+    seed and the discounted return and length of each episode.
+    '''
+    random.seed(seed) # used by the agents
+    mdp = getattr(gridworld, 'get' + args.grid)()
+    mdp.setLivingReward(args.livingReward)
+    mdp.setNoise(args.noise)
+    env = gridworld.GridworldEnvironment(mdp, random.Random(seed))
+    agent = make_batch_agent(args, mdp, mdp.getPossibleActions)
+    start_episode = getattr(agent, 'startEpisode', None)
+    stop_episode = getattr(agent, 'stopEpisode', None)
+    observe_transition = getattr(agent, 'observeTransition', None)
+
+    returns = []
+    lengths = []
+    for _ in range(args.episodes):
+        if start_episode is not None:
+            start_episode()
+        env.reset()
+        state = env.getCurrentState()
+        episode_returns = 0.0
+        total_discount = 1.0
+        length = 0
+        while mdp.getPossibleActions(state):
+            action = agent.getAction(state)
+            if action == None:
+                raise Exception('Error: Agent returned None action')
+            next_state, reward = env.doAction(action)
+            if observe_transition is not None:
+                observe_transition(state, action, next_state, reward)
+            state = next_state
+            episode_returns += reward * total_discount
+            total_discount *= args.discount
+            length += 1
+        if stop_episode is not None:
+            stop_episode()
+        returns.append(episode_returns)
+        lengths.append(length)
+    return seed, returns, lengths
+
+
+def run_batch(args):
+    '''
+    Run `args.episodes` episodes for each of `args.seeds` seeds, in 
+    `args.workers` processes, and write the learning curves to 
+    `args.curveFile`. Returns the returns of each seed's episodes.
+    '''
+    seeds = range(args.seed, args.seed + args.seeds)
+    run = functools.partial(run_seed, args)
+    if args.workers > 1:
+        pool = multiprocessing.Pool(args.workers)
+        results = pool.imap(run, seeds)
+    else:
+        pool = None
+        results = map(run, seeds)
+
+    curves = {}
+    rows = None
+    if args.curveFile:
+        out = open(args.curveFile, 'w', newline='')
+        rows = csv.writer(out)
+        rows.writerow(('seed', 'episode', 'return', 'length'))
+    try:
+        for seed, returns, lengths in results:
+            curves[seed] = returns
+            if rows is not None:
+                rows.writerows((seed, episode, episode_returns, length) for episode, (episode_returns, length)
+                               in enumerate(zip(returns, lengths), 1))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if rows is not None:
+            out.close()
+
+    # the mean return over seeds, over all the episodes and the last tenth of them
+    num_last = max(1, args.episodes // 10)
+    all_returns = [sum(returns) / len(returns) for returns in curves.values() if returns]
+    last_returns = [sum(returns[-num_last:]) / num_last for returns in curves.values() if returns]
+    if all_returns:
+        print('RAN %d EPISODES FOR %d SEEDS' % (args.episodes, len(curves)))
+        print('AVERAGE RETURNS FROM START STATE: %s' % (sum(all_returns) / len(all_returns)))
+        print('AVERAGE RETURNS OF THE LAST %d EPISODES: %s' % (num_last, sum(last_returns) / len(last_returns)))
+    return curves
+
+
 def main():
     args = parseArgs()
+    if args.batch:
+        profiler = None
+        if args.profile:
+            profiler = profiling.Profiler(args.profile, args.profiler)
+            profiler.start()
+        curves = run_batch(args)
+        if profiler is not None:
+            print('Profile written to', profiler.save(), file=sys.stderr)
+        return curves
+    from gymberkeleyrl.envs.gridworldenv import GridworldEnv # imports the displays
     
     # Make environment
     env = GridworldEnv(args.grid, args.livingReward, args.noise, args.textDisplay,
@@ -141,6 +280,11 @@ def main():
     def actionFn(state):
         return env.getPossibleActions(state)
             
+    profiler = None
+    if args.profile:
+        profiler = profiling.Profiler(args.profile, args.profiler)
+        profiler.start()
+
     # Make agent
     agent = None
     if args.agent == 'value':
@@ -150,6 +294,8 @@ def main():
                       'alpha': args.learningRate,
                       'epsilon': args.epsilon,
                       'actionFn': actionFn}
+        if args.metricsFile:
+            qLearnOpts['metrics'] = telemetry.MetricsWriter(args.metricsFile)
         agent = qlearningAgents.QLearningAgent(**qLearnOpts)
     elif args.agent == 'random':
         # # No reason to use the random agent without episodes
@@ -167,7 +313,7 @@ def main():
         agent.getAction = UserAgent(actionFn=actionFn).getAction
         
     if args.quiet:
-        message = lambda x: None
+        message = None # skips building the messages
     else:
         message = lambda x: print(x)
         
@@ -193,12 +339,18 @@ def main():
         print(("RUNNING", args.episodes, "EPISODES"))
         print()
         
+    memory_log = None
+    if args.memoryLog:
+        memory_log = profiling.MemoryLog(args.memoryLog, args.memoryTop)
+        memory_log.start()
+
     returns = 0
     for episode in range(1, args.episodes + 1):
         if 'startEpisode' in dir(agent): 
             agent.startEpisode()
             
-        message("BEGINNING EPISODE: "+str(episode)+"\n")
+        if message is not None:
+            message("BEGINNING EPISODE: "+str(episode)+"\n")
         curr_state = env.reset()
         done = False
         episode_returns = 0
@@ -210,11 +362,12 @@ def main():
                 raise Exception('Error: Agent returned None action')
 
             next_state, reward, done, info = env.step(action)
-            print(next_state, reward, done, info)
-            message("Started in state: "+str(curr_state)+
-                    "\nTook action: "+str(action)+
-                    "\nEnded in state: "+str(next_state)+
-                    "\nGot reward: "+str(reward)+"\n")
+            if message is not None:
+                print(next_state, reward, done, info)
+                message("Started in state: "+str(curr_state)+
+                        "\nTook action: "+str(action)+
+                        "\nEnded in state: "+str(next_state)+
+                        "\nGot reward: "+str(reward)+"\n")
             
             # UPDATE LEARNER
             if 'observeTransition' in dir(agent):
@@ -225,11 +378,14 @@ def main():
             episode_returns += reward * total_discount
             total_discount *= args.discount
             if done:
-                message("EPISODE "+str(episode)+" COMPLETE: RETURN WAS "+str(episode_returns)+"\n")
+                if message is not None:
+                    message("EPISODE "+str(episode)+" COMPLETE: RETURN WAS "+str(episode_returns)+"\n")
                 returns += episode_returns
 
         if 'stopEpisode' in dir(agent):
             agent.stopEpisode()
+        if memory_log is not None:
+            memory_log.episode('episode %d' % episode)
         
     if args.episodes > 0:
         print()
@@ -237,6 +393,13 @@ def main():
         print()
         print()
 
+    if profiler is not None:
+        print('Profile written to', profiler.save(), file=sys.stderr)
+    if memory_log is not None:
+        memory_log.close()
+    if getattr(agent, 'metrics', None) is not None:
+        agent.metrics.close()
+
     # DISPLAY POST-LEARNING VALUES / Q-VALUES
     if args.agent == 'q' and not args.manual:
         try:
@@ -1,3 +1,6 @@
 from .gridworldenv import GridworldEnv
 from .pacmanenv import PacmanEnv
 
+from .vecpacmanenv import SubprocVectorPacmanEnv
+from .asyncenv import AsyncEnv, AsyncGridworldEnv, AsyncPacmanEnv
+from .batchpacman import BatchPacmanSimulator
@@ -0,0 +1,142 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import multiprocessing as mp
+
+from gymberkeleyrl.envs.gridworldenv import GridworldEnv
+from gymberkeleyrl.envs.pacmanenv import PacmanEnv
+
+
+def _worker(remote, parent_remote, env_fn):
+    '''
+    Make an environment with `env_fn` in a subprocess and call its methods
+    for the commands received over `remote`. The first message sent back says
+    whether the environment could be made, with the exception if it could not.
+    '''
+    parent_remote.close()
+    try:
+        try:
+            env = env_fn()
+        except Exception as e:
+            remote.send((False, e))
+            return
+        remote.send((True, None))
+        while True:
+            cmd = remote.recv()
+            if cmd is None:
+                break
+            method, args, kwargs = cmd
+            try:
+                remote.send((True, getattr(env, method)(*args, **kwargs)))
+            except Exception as e:
+                remote.send((False, e))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class AsyncEnv:
+    '''
+    Wrap an environment so that `reset` and `step` are coroutines, which can
+    be awaited concurrently, e.g. with `asyncio.gather`, without blocking the
+    event loop.
+
+    The environment is made by calling `env_fn`, whose exceptions are raised
+    by the constructor, even from a worker process. Calls are dispatched to a
+    worker thread dedicated to the environment, so calls to one environment
+    run one at a time, in order. If `processes` is True, the environment
+    lives in a worker process instead, and the arguments and results of each
+    call are pickled. Exceptions raised by the calls are raised by the
+    coroutines.
+    '''
+
+    def __init__(self, env_fn, processes=False, start_method=None):
+        '''
+        env_fn: a function which returns the environment. Must be picklable
+          if `processes` is True.
+        start_method: the multiprocessing start method, when `processes` is True.
+        '''
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.closed = False
+        if processes:
+            ctx = mp.get_context(start_method)
+            self._remote, work_remote = ctx.Pipe()
+            self._process = ctx.Process(target=_worker, args=(work_remote, self._remote, env_fn),
+                                        daemon=True)
+            self._process.start()
+            work_remote.close()
+            self.env = None
+            ok, error = self._remote.recv()
+            if not ok:
+                self._process.join()
+                self._remote.close()
+                self._executor.shutdown()
+                self.closed = True
+                raise error
+        else:
+            self._process = None
+            self.env = env_fn()
+
+    def _dispatch(self, method, args, kwargs):
+        if self._process is None:
+            return getattr(self.env, method)(*args, **kwargs)
+
+        self._remote.send((method, args, kwargs))
+        ok, result = self._remote.recv()
+        if not ok:
+            raise result
+        return result
+
+    async def call(self, method, *args, **kwargs):
+        '''
+        Call a method of the environment in the worker thread or process.
+        '''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._dispatch, method, args, kwargs))
+
+    async def reset(self, **kwargs):
+        return await self.call('reset', **kwargs)
+
+    async def step(self, action):
+        return await self.call('step', action)
+
+    async def getPossibleActions(self, *args, **kwargs):
+        return await self.call('getPossibleActions', *args, **kwargs)
+
+    def close(self):
+        if self.closed:
+            return
+        if self._process is not None:
+            self._remote.send(None)
+            self._process.join()
+            self._remote.close()
+        self._executor.shutdown()
+        self.closed = True
+
+
+class AsyncPacmanEnv(AsyncEnv):
+    '''
+    An AsyncEnv wrapping a PacmanEnv, made with the given keyword arguments.
+    The graphics are quiet when the environment runs in a worker process.
+    '''
+
+    def __init__(self, processes=False, start_method=None, **env_kwargs):
+        if processes:
+            env_kwargs['quiet_graphics'] = True
+        super(AsyncPacmanEnv, self).__init__(
+            functools.partial(PacmanEnv, **env_kwargs), processes, start_method)
+
+
+class AsyncGridworldEnv(AsyncEnv):
+    '''
+    An AsyncEnv wrapping a GridworldEnv, made with the given keyword arguments.
+    The display is text only when the environment runs in a worker process.
+    '''
+
+    def __init__(self, processes=False, start_method=None, **env_kwargs):
+        if processes:
+            env_kwargs['textDisplay'] = True
+        super(AsyncGridworldEnv, self).__init__(
+            functools.partial(GridworldEnv, **env_kwargs), processes, start_method)
@@ -0,0 +1,276 @@
+import numpy as np
+
+from reinforcement import layout as layout_
+from reinforcement.game import Actions, Directions
+from reinforcement.pacman import SCARED_TIME, TIME_PENALTY
+from gymberkeleyrl.envs.pacmanenv import OBSERVATION_CHANNELS
+
+
+# Actions are coded as indices into ACTIONS, the engine's direction codes.
+ACTIONS = Directions.NAMES
+ACTION_INDEX = Directions.CODES
+STOP = Directions.STOP_CODE
+_DX = np.array([Actions._codeVectors[a][0] for a in range(len(ACTIONS))])
+_DY = np.array([Actions._codeVectors[a][1] for a in range(len(ACTIONS))])
+_REVERSE = np.array(Directions.REVERSE_CODES)
+
+# Positions are kept in half cells, the smallest move a (scared) ghost makes,
+# so they are integers. A manhattan distance of at most COLLISION_TOLERANCE
+# (0.7 cells) is a distance of at most 1 half cell.
+_KILL_DISTANCE = 1
+
+
+class BatchPacmanSimulator:
+    '''
+    Simulate a batch of classic pacman games on one layout, with the game
+    state held in NumPy arrays and every rule applied to all the games at
+    once. It follows the semantics of `PacmanRules` and `GhostRules` in
+    pacman.py, but is meant for fast data generation rather than for
+    Berkeley agents, which need GameState objects.
+
+    Each `step` is one turn: pacman moves in every game, then each ghost
+    moves in turn, using actions chosen by the caller or by a vectorized
+    version of `RandomGhost` or `DirectionalGhost`. Games which are over are
+    not advanced until they are `reset`.
+
+    The state is in these arrays, for a batch of B games, A agents (pacman is
+    agent 0) and a layout of size W x H:
+
+    - pos: (B, A, 2) agent positions, in half cells
+    - direction: (B, A) agent directions, as indices into ACTIONS
+    - scared_timer: (B, A) ghost scared timers
+    - food, capsules: (B, W, H) boolean maps, indexed like a `Grid`
+    - score: (B,) scores
+    - win, lose: (B,) game outcomes
+    '''
+
+    def __init__(self, layout='mediumClassic', batch_size=64, max_ghosts=4,
+                 ghost_agent='RandomGhost', prob_attack=0.8, prob_scaredFlee=0.8, seed=None):
+        '''
+        Number of ghosts is min(max_ghosts, layout.getNumGhosts()).
+
+        ghost_agent: 'RandomGhost' or 'DirectionalGhost', the policy used
+          to move the ghosts when `step` is not given ghost actions.
+        prob_attack, prob_scaredFlee: parameters of 'DirectionalGhost'.
+        seed: seed of the random generator used by the ghost policies.
+        '''
+        self.layout = layout_.getLayout(layout)
+        if self.layout is None:
+            raise Exception("The layout " + layout + " cannot be found")
+        if ghost_agent not in ('RandomGhost', 'DirectionalGhost'):
+            raise Exception('Unknown ghost agent: ' + ghost_agent)
+
+        self.batch_size = batch_size
+        self.num_ghosts = min(max_ghosts, self.layout.getNumGhosts())
+        self.num_agents = self.num_ghosts + 1
+        self.ghost_agent = ghost_agent
+        self.prob_attack = prob_attack
+        self.prob_scaredFlee = prob_scaredFlee
+        self.rng = np.random.default_rng(seed)
+        self._idx = np.arange(batch_size)
+
+        # Static layout data
+        width, height = self.layout.width, self.layout.height
+        self.walls = np.array(self.layout.walls.data, dtype=bool)
+        self._food0 = np.array(self.layout.food.data, dtype=bool)
+        self._capsules0 = np.zeros((width, height), dtype=bool)
+        for x, y in self.layout.capsules:
+            self._capsules0[x, y] = True
+        starts = [pos for isPacman, pos in self.layout.agentPositions if isPacman]
+        starts += [pos for isPacman, pos in self.layout.agentPositions if not isPacman]
+        self._start = 2 * np.array(starts[:self.num_agents], dtype=np.int64)
+
+        # legal[x, y, a] is True if action a does not run into a wall from (x, y).
+        self._legal = np.zeros((width, height, len(ACTIONS)), dtype=bool)
+        for x in range(1, width - 1):
+            for y in range(1, height - 1):
+                if not self.walls[x, y]:
+                    for a in range(len(ACTIONS)):
+                        self._legal[x, y, a] = not self.walls[x + _DX[a], y + _DY[a]]
+
+        self.pos = np.empty((batch_size, self.num_agents, 2), dtype=np.int64)
+        self.direction = np.empty((batch_size, self.num_agents), dtype=np.int64)
+        self.scared_timer = np.empty((batch_size, self.num_agents), dtype=np.int64)
+        self.food = np.empty((batch_size, width, height), dtype=bool)
+        self.capsules = np.empty((batch_size, width, height), dtype=bool)
+        self.num_food = np.empty(batch_size, dtype=np.int64)
+        self.score = np.empty(batch_size, dtype=np.int64)
+        self.win = np.empty(batch_size, dtype=bool)
+        self.lose = np.empty(batch_size, dtype=bool)
+        self.reset()
+
+    def reset(self, mask=None):
+        '''
+        Start new games, in all the games or in the games selected by the
+        boolean `mask`, e.g. the `done` flags returned by `step`.
+        '''
+        games = self._idx if mask is None else self._idx[mask]
+        self.pos[games] = self._start
+        self.direction[games] = STOP
+        self.scared_timer[games] = 0
+        self.food[games] = self._food0
+        self.capsules[games] = self._capsules0
+        self.num_food[games] = self._food0.sum()
+        self.score[games] = 0
+        self.win[games] = False
+        self.lose[games] = False
+
+    def done(self):
+        return self.win | self.lose
+
+    def legal_actions(self, agent=0):
+        '''
+        Return a (B, len(ACTIONS)) boolean mask of the legal actions of
+        an agent in each game.
+        '''
+        pos = self.pos[:, agent]
+        legal = self._legal[pos[:, 0] >> 1, pos[:, 1] >> 1]
+        if agent == 0:
+            return legal
+
+        # Ghosts cannot stop, and cannot turn around unless they reach a dead end.
+        legal = legal.copy()
+        legal[:, STOP] = False
+        direction = self.direction[:, agent]
+        reverse = _REVERSE[direction]
+        turn_around = legal[self._idx, reverse] & (legal.sum(axis=1) > 1)
+        legal[self._idx[turn_around], reverse[turn_around]] = False
+
+        # In between grid points, ghosts must continue straight.
+        between = ((pos[:, 0] | pos[:, 1]) & 1).astype(bool)
+        legal[between] = False
+        legal[between, direction[between]] = True
+        return legal
+
+    def step(self, pacman_actions, ghost_actions=None):
+        '''
+        Play one turn in every game which is not over.
+
+        pacman_actions: (B,) pacman actions, as indices into ACTIONS.
+        ghost_actions: optional (B, num_ghosts) ghost actions. By default
+          the ghosts are moved by the ghost policy.
+
+        Returns (rewards, dones), the change in score over the turn and
+        whether each game is over.
+        '''
+        pacman_actions = np.asarray(pacman_actions)
+        score = self.score.copy()
+
+        active = ~self.done()
+        games = self._idx[active]
+        actions = pacman_actions[active]
+        if not self.legal_actions(0)[games, actions].all():
+            raise Exception('Illegal action')
+        self._move(games, 0, actions, 2)
+
+        # Eat
+        x, y = self.pos[games, 0, 0] >> 1, self.pos[games, 0, 1] >> 1
+        ate = self.food[games, x, y]
+        self.food[games[ate], x[ate], y[ate]] = False
+        self.num_food[games[ate]] -= 1
+        self.score[games[ate]] += 10
+        cleared = ate & (self.num_food[games] == 0)
+        self.score[games[cleared]] += 500
+        self.win[games[cleared]] = True
+        capsule = self.capsules[games, x, y]
+        self.capsules[games[capsule], x[capsule], y[capsule]] = False
+        self.scared_timer[games[capsule], 1:] = SCARED_TIME
+
+        self.score[games] -= TIME_PENALTY
+        for ghost in range(1, self.num_agents):
+            self._checkDeath(games, ghost)
+
+        for ghost in range(1, self.num_agents):
+            active = ~self.done()
+            if ghost_actions is None:
+                actions = self._ghostPolicy(ghost)
+            else:
+                actions = np.asarray(ghost_actions)[:, ghost - 1]
+                if not self.legal_actions(ghost)[active, actions[active]].all():
+                    raise Exception('Illegal ghost action')
+            games = self._idx[active]
+            actions = actions[active]
+            timer = self.scared_timer[games, ghost]
+            self._move(games, ghost, actions, np.where(timer > 0, 1, 2))
+
+            # Time passes. The timer running out puts the ghost back on the grid.
+            ending = games[timer == 1]
+            self.pos[ending, ghost] += self.pos[ending, ghost] & 1
+            self.scared_timer[games, ghost] = np.maximum(0, timer - 1)
+            self._checkDeath(games, ghost)
+
+        return (self.score - score).astype(np.float64), self.done()
+
+    def _move(self, games, agent, actions, speed):
+        '''
+        Move an agent by `speed` half cells in the direction of its action.
+        Stopping keeps the previous direction.
+        '''
+        self.pos[games, agent, 0] += _DX[actions] * speed
+        self.pos[games, agent, 1] += _DY[actions] * speed
+        moved = actions != STOP
+        self.direction[games[moved], agent] = actions[moved]
+
+    def _checkDeath(self, games, ghost):
+        '''
+        Resolve collisions between pacman and a ghost. A scared ghost is
+        eaten and sent back to its start, otherwise pacman dies.
+        '''
+        pacman = self.pos[games, 0]
+        distance = np.abs(self.pos[games, ghost] - pacman).sum(axis=1)
+        collide = distance <= _KILL_DISTANCE
+        scared = self.scared_timer[games, ghost] > 0
+        eaten = games[collide & scared]
+        self.score[eaten] += 200
+        self.pos[eaten, ghost] = self._start[ghost]
+        self.direction[eaten, ghost] = STOP
+        self.scared_timer[eaten, ghost] = 0
+        killed = games[collide & ~scared]
+        killed = killed[~self.win[killed]]
+        self.score[killed] -= 500
+        self.lose[killed] = True
+
+    def _ghostPolicy(self, ghost):
+        '''
+        Sample an action for a ghost in every game.
+        '''
+        legal = self.legal_actions(ghost)
+        if self.ghost_agent == 'RandomGhost':
+            # The argmax of uniform noise over the legal actions is a uniform choice.
+            noise = self.rng.random(legal.shape)
+            noise[~legal] = -1
+            return noise.argmax(axis=1)
+
+        # DirectionalGhost rushes pacman, or flees when scared.
+        scared = self.scared_timer[:, ghost] > 0
+        speed = np.where(scared, 1, 2)[:, None]
+        pos = self.pos[:, ghost]
+        pacman = self.pos[:, 0]
+        distance = (np.abs(pos[:, 0, None] + _DX * speed - pacman[:, 0, None]) +
+                    np.abs(pos[:, 1, None] + _DY * speed - pacman[:, 1, None]))
+        far = np.where(legal, distance, -1).max(axis=1)
+        near = np.where(legal, distance, np.iinfo(distance.dtype).max).min(axis=1)
+        best = legal & (distance == np.where(scared, far, near)[:, None])
+        best_prob = np.where(scared, self.prob_scaredFlee, self.prob_attack)
+        prob = (best * (best_prob / np.maximum(best.sum(axis=1), 1))[:, None] +
+                legal * ((1 - best_prob) / np.maximum(legal.sum(axis=1), 1))[:, None])
+        cumulative = prob.cumsum(axis=1)
+        sample = self.rng.random(self.batch_size) * cumulative[:, -1]
+        return (cumulative > sample[:, None]).argmax(axis=1)
+
+    def observation(self):
+        '''
+        Encode the games as a uint8 array of shape (B, channels, width, height),
+        like `encode_state`, with the channels listed in OBSERVATION_CHANNELS.
+        '''
+        obs = np.zeros((self.batch_size, len(OBSERVATION_CHANNELS)) + self.walls.shape, dtype=np.uint8)
+        obs[:, 0] = self.walls
+        obs[:, 1] = self.food
+        obs[:, 2] = self.capsules
+        # The nearest grid point of a position in half cells
+        cell = (self.pos + 1) >> 1
+        channel = np.where(self.scared_timer > 0, 5, 4)
+        channel[:, 0] = 3
+        games = np.repeat(self._idx, self.num_agents)
+        np.add.at(obs, (games, channel.ravel(), cell[:, :, 0].ravel(), cell[:, :, 1].ravel()), 1)
+        return obs
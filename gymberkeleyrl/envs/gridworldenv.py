@@ -4,6 +4,7 @@ from gym.spaces import Space
 from gym.utils import seeding
 
 import numpy as np
+import random
 from reinforcement import gridworld
 from reinforcement import environment
 from reinforcement import textGridworldDisplay
@@ -50,7 +51,9 @@ class GridworldEnv(gym.Env):
         self.mdp = mdpFunction() # Used by dynamic programming ValueIterationAgent
         self.mdp.setLivingReward(livingReward)
         self.mdp.setNoise(noise)
-        self.env = gridworld.GridworldEnvironment(self.mdp)
+        # The environment's own random stream, used to sample transitions
+        self.rng = random.Random()
+        self.env = gridworld.GridworldEnvironment(self.mdp, self.rng)
         self.state = self.env.getCurrentState()
 
         # initialize display
@@ -80,7 +83,12 @@ class GridworldEnv(gym.Env):
         return self.state
 
     def seed(self, seed=None):
+        '''
+        Seed the environment's random streams, `np_random` and `rng`, the 
+        `random.Random` used to sample transitions.
+        '''
         self.np_random, seed = seeding.np_random(seed)
+        self.rng.seed(seed)
         return [seed]
 
     def step(self, action):
@@ -102,6 +110,27 @@ class GridworldEnv(gym.Env):
         done = (len(self.getPossibleActions()) == 0) # done if no legal actions
         return (next_state, reward, done, {})
 
+    def step_many(self, actions):
+        """
+        Run one timestep per action, like calling `step` once per action.
+        Stops early if the episode ends. To repeat an action k times, pass 
+        `[action] * k`.
+
+        Returns a tuple (observation, rewards, dones, info), where rewards and 
+        dones are arrays with one entry per step taken.
+        """
+        rewards = []
+        dones = []
+        for action in actions:
+            next_state, reward = self.env.doAction(action)
+            done = (len(self.env.getPossibleActions(next_state)) == 0)
+            rewards.append(reward)
+            dones.append(done)
+            if done:
+                break
+        self.state = self.env.getCurrentState()
+        return (self.state, np.array(rewards, dtype=np.float64), np.array(dones, dtype=bool), {})
+
     def render(self, mode='human', agent=None):
         '''
         Display the gridworld with the action-values or values of the agent.
@@ -7,17 +7,62 @@ from gym.utils import seeding
 
 import numpy as np
 import random
+import time
+from collections import namedtuple
 
 from reinforcement import game
+from reinforcement import ghostAgents
 from reinforcement.game import Agent
 from reinforcement import layout as layout_
 from reinforcement import pacman
 from reinforcement import textDisplay
+from reinforcement import util
 from reinforcement.pacman import ClassicGameRules
 
 from gymberkeleyrl.spaces import ObjectSpace
 
 
+# Channels of the array returned by `encode_state`.
+OBSERVATION_CHANNELS = ('walls', 'food', 'capsules', 'pacman', 'ghosts', 'scared_ghosts')
+
+
+def encode_state(state, out=None):
+    '''
+    Encode a GameState as a uint8 array of shape (channels, width, height), 
+    indexed like a `Grid`, i.e. `array[channel][x][y]`, with the channels
+    listed in `OBSERVATION_CHANNELS`. The agent channels count the agents 
+    at the (nearest) grid point.
+
+    out: an existing array to write the encoding into, e.g. a view on shared memory.
+    '''
+    data = state.data
+    walls = data.layout.walls
+    if out is None:
+        out = np.zeros((len(OBSERVATION_CHANNELS), walls.width, walls.height), dtype=np.uint8)
+    else:
+        out[2:] = 0
+
+    out[0] = walls.data
+    out[1] = data.food.data
+    for x, y in data.capsules:
+        out[2, x, y] = 1
+    for agentState in data.agentStates:
+        x2, y2 = agentState.configuration.pos2
+        x, y = (x2 + 1) >> 1, (y2 + 1) >> 1 # the nearest grid point
+        if agentState.isPacman:
+            out[3, x, y] += 1
+        elif agentState.scaredTimer > 0:
+            out[5, x, y] += 1
+        else:
+            out[4, x, y] += 1
+    return out
+
+
+# A snapshot of a PacmanEnv, made by `PacmanEnv.clone_state`.
+PacmanSnapshot = namedtuple('PacmanSnapshot', ['game', 'state', 'game_over', 'agent_idx',
+                                               'move_history', 'keyframes', 'random_state'])
+
+
 class PacmanEnv(gym.Env):
     '''
     Pacman is a multi-agent game involving one pacman agent and a 
@@ -33,21 +78,57 @@ class PacmanEnv(gym.Env):
     so the reward is from the perspective of pacman, not the ghost agents.
     This reward differs from the Berkeley CS188 project, where the reward is the
     difference between the current score and the score when pacman last acted.
+
+    If a `ghost_agent` is given, the environment is single-agent: `step` takes
+    pacman's action, then moves every ghost itself using the ghost agents, and
+    returns the transition for the whole turn with the summed reward. 
+    `agent_idx` is then always 0 between steps.
     '''
     metadata = {'render.modes': ['human']}
 
     def __init__(self, layout='mediumClassic', max_ghosts=4, catch_exceptions=False, timeout=30, 
                  quiet_graphics=False, text_graphics=False, frame_time=0.1, zoom=1.0, 
-                 fix_random_seed=False):
+                 fix_random_seed=False, readonly_observations=False, ghost_agent=None,
+                 track_explored=None, timing=False, keyframe_interval=0):
         '''
         Number of ghosts is min(max_ghosts, layout.getNumGhosts()).
+
+        fix_random_seed: seed `rng` with a fixed seed, to always play the same
+          game against the ghosts of single-agent mode.
+        readonly_observations: if True, `reset` and `step` return a read-only
+          view of the game state (see `pacman.ReadOnlyGameState`) instead of a 
+          deep copy. The view shares storage with the game state and raises an
+          error on any attempt to modify it.
+        ghost_agent: the ghost agent class, or the name of a class in the
+          ghostAgents module (e.g. 'RandomGhost' or 'DirectionalGhost'), used to
+          move the ghosts in single-agent mode. If None, the ghosts are moved 
+          by the caller.
+        track_explored: 'set' or 'count', to track the states explored by
+          generating successors in this environment's games with an
+          `ExploredTracker`, `self.explored_tracker`. Off by default.
+        timing: if True, record the time spent per agent in making 
+          observations, choosing the ghosts' actions, generating successors,
+          applying the rules and rendering, in `self.timer`, a 
+          `util.PhaseTimes` holding the totals since the environment was made.
+          The info dict returned by `step` and `step_many` holds the times of
+          that call alone under 'timing', in another `util.PhaseTimes`.
+        keyframe_interval: keep the state every `keyframe_interval` moves in
+          `game.keyframes`, for `recording.RecordingWriter` to store with the
+          game. 0 keeps no keyframes.
         '''
         self.agent_idx = 0 # tracks the index of the next agent to play.
         self.catch_exceptions = catch_exceptions
+        self.readonly_observations = readonly_observations
         self.max_ghosts = max_ghosts
+        self.timer = util.PhaseTimes() if timing else None
+        self.step_timer = None # the times of the current step
+        self.keyframe_interval = keyframe_interval
+        self.explored_tracker = None
+        if track_explored is not None:
+            self.explored_tracker = pacman.ExploredTracker(track_explored)
         
-        if fix_random_seed:
-            random.seed('cs188')
+        # The environment's own random stream, used by the ghost agents
+        self.rng = random.Random()
 
         # Make layout
         self.layout = layout_.getLayout(layout)
@@ -56,6 +137,15 @@ class PacmanEnv(gym.Env):
             
         self.num_ghosts = min(max_ghosts, self.layout.getNumGhosts())
         self.num_agents = self.num_ghosts + 1
+
+        # Make ghost agents for single-agent mode
+        self.ghost_agents = None
+        if ghost_agent is not None:
+            if isinstance(ghost_agent, str):
+                ghost_agent = getattr(ghostAgents, ghost_agent)
+            self.ghost_agents = [ghost_agent(i) for i in range(1, self.num_agents)]
+            for ghost in self.ghost_agents:
+                ghost.rng = self.rng
                 
         # Make display
         self.display_initialized = False
@@ -63,8 +153,7 @@ class PacmanEnv(gym.Env):
         if quiet_graphics:
             self.display = self.null_display
         elif text_graphics:
-            textDisplay.SLEEP_TIME = frame_time
-            self.display = textDisplay.PacmanGraphics()
+            self.display = textDisplay.PacmanGraphics(frame_time)
         else:
             from reinforcement import graphicsDisplay
             self.display = graphicsDisplay.PacmanGraphics(zoom, frameTime=frame_time)
@@ -80,6 +169,8 @@ class PacmanEnv(gym.Env):
         self.observation_space = None
 
         self.seed()
+        if fix_random_seed:
+            self.rng.seed('cs188')
         
     def reset(self, quiet=False, initialize_display=False):
         '''
@@ -97,8 +188,10 @@ class PacmanEnv(gym.Env):
         # is not being used for the game.run().
         self.game = self.rules.newGame(
             self.layout, Agent(0), [Agent(i) for i in range(1, self.max_ghosts + 1)],
-            self.display, quiet, self.catch_exceptions)
+            self.display, quiet, self.catch_exceptions, keyframeInterval=self.keyframe_interval)
         self.agent_idx = 0 # pacman moves first
+        self.step_timer = None
+        self.game.state.setExploredTracker(self.explored_tracker)
 
         # initialize display when resetting, for agents that
         # use the display internally.
@@ -106,10 +199,20 @@ class PacmanEnv(gym.Env):
             self.display.initialize(self.game.state.data)
             self.display_initialized = True
 
-        return self.game.state.deepCopy()
+        if self.ghost_agents is not None:
+            for ghost in self.ghost_agents:
+                if 'registerInitialState' in dir(ghost):
+                    ghost.registerInitialState(pacman.ReadOnlyGameState(self.game.state))
+
+        return self._observation()
 
     def seed(self, seed=None):
+        '''
+        Seed the environment's random streams, `np_random` and `rng`, the
+        `random.Random` used by the ghost agents of single-agent mode.
+        '''
         self.np_random, seed = seeding.np_random(seed)
+        self.rng.seed(seed)
         return [seed]
 
     def step(self, action):
@@ -126,8 +229,78 @@ class PacmanEnv(gym.Env):
             done (boolean): whether the episode has ended, in which case further step() calls will return undefined results
             info (dict): contains auxiliary diagnostic information (helpful for debugging, and sometimes learning)
         """
+        if self.timer is not None:
+            self.step_timer = util.PhaseTimes()
+        reward = self._turn(action)
+        if reward is None:
+            return
+
+        done = self.game.gameOver # set by rules/game.state during rules.process
+        return (self._observation(), reward, done, self._info())
+
+    def step_many(self, actions):
+        """
+        Run one timestep per action, like calling `step` once per action, but
+        build only the final observation. Stops early if the episode ends. 
+        To repeat an action k times, pass `[action] * k`.
+
+        Returns a tuple (observation, rewards, dones, info), where rewards and 
+        dones are arrays with one entry per step taken.
+        """
+        if self.timer is not None:
+            self.step_timer = util.PhaseTimes()
+        rewards = []
+        dones = []
+        for action in actions:
+            reward = self._turn(action)
+            if reward is None:
+                return
+            rewards.append(reward)
+            dones.append(self.game.gameOver)
+            if self.game.gameOver:
+                break
+
+        return (self._observation(), np.array(rewards, dtype=np.float64), 
+                np.array(dones, dtype=bool), self._info())
+
+    def _turn(self, action):
+        '''
+        Apply the action of the current agent and, in single-agent mode, the 
+        actions of the ghosts. Return the summed reward, or None if an agent crashed.
+        '''
+        reward = self._advance(action)
+        if reward is None:
+            return
+
+        # In single-agent mode the ghosts move until it is pacman's turn again.
+        if self.ghost_agents is not None:
+            while not self.game.gameOver and self.agent_idx != 0:
+                ghost = self.ghost_agents[self.agent_idx - 1]
+                if self.timer is None:
+                    ghost_action = ghost.getAction(pacman.ReadOnlyGameState(self.game.state))
+                else:
+                    start = time.perf_counter()
+                    observation = pacman.ReadOnlyGameState(self.game.state)
+                    middle = time.perf_counter()
+                    ghost_action = ghost.getAction(observation)
+                    self._add_time('observation', self.agent_idx, middle - start)
+                    self._add_time('getAction', self.agent_idx, time.perf_counter() - middle)
+                ghost_reward = self._advance(ghost_action)
+                if ghost_reward is None:
+                    return
+                reward += ghost_reward
+
+        return reward
+
+    def _advance(self, action):
+        '''
+        Apply the action of the current agent to the game and move on to the 
+        next agent. Return the reward, or None if the agent crashed.
+        '''
+        if self.timer is not None:
+            start = time.perf_counter()
+
         # Execute the action
-        self.game.moveHistory.append((self.agent_idx, action))
         if self.catch_exceptions:
             try:
                 next_state = self.game.state.generateSuccessor(self.agent_idx, action)
@@ -141,20 +314,91 @@ class PacmanEnv(gym.Env):
 
         reward = next_state.getScore() - self.game.state.getScore()
         self.game.state = next_state
+        self.game.recordMove(self.agent_idx, action)
+        if self.timer is not None:
+            middle = time.perf_counter()
+            self._add_time('generateSuccessor', self.agent_idx, middle - start)
 
         # Update self.game.gameOver
         self.game.rules.process(self.game.state, self.game)
-        
-        done = self.game.gameOver # set by rules/game.state during rules.process
-        info = {} if not done else {
-            'game': self.game,
-            'layout': self.layout,
-        } # return game for recording
-        
+        if self.timer is not None:
+            self._add_time('process', self.agent_idx, time.perf_counter() - middle)
+
         # It's the next agent's move
         self.agent_idx = (self.agent_idx + 1) % self.num_agents
 
-        return (next_state.deepCopy(), reward, done, info)
+        return reward
+
+    def _info(self):
+        '''
+        Return the info dict for the current game state.
+        '''
+        info = {}
+        if self.game.gameOver:
+            # return game for recording
+            info['game'] = self.game
+            info['layout'] = self.layout
+        if self.timer is not None:
+            info['timing'] = self.step_timer
+        return info
+
+    def _add_time(self, phase, agent_idx, seconds):
+        '''
+        Add the time spent in a phase to the totals and to the current step.
+        '''
+        self.timer.add(phase, agent_idx, seconds)
+        if self.step_timer is not None:
+            self.step_timer.add(phase, agent_idx, seconds)
+
+    def _observation(self):
+        '''
+        Return the observation of the current game state, either a deep copy
+        or a read-only view of it.
+        '''
+        if self.timer is not None:
+            start = time.perf_counter()
+        if self.readonly_observations:
+            observation = pacman.ReadOnlyGameState(self.game.state)
+        else:
+            observation = self.game.state.deepCopy()
+        if self.timer is not None:
+            self._add_time('observation', self.agent_idx, time.perf_counter() - start)
+        return observation
+
+    def clone_state(self, include_rng=True):
+        '''
+        Return a snapshot of the environment, which `restore_state` can 
+        return to, e.g. to branch a tree search from the current state.
+
+        Game states are never modified once they have been made, so the 
+        snapshot shares the current game state, including its layout, 
+        instead of copying it. It also shares the move history (see 
+        `game.SharedMoveHistory`), so cloning and restoring take constant time.
+
+        include_rng: also save the state of `rng`, which the ghost agents
+          use, so that restoring replays the same ghost moves.
+        '''
+        history = self.game.moveHistory
+        if not isinstance(history, game.SharedMoveHistory):
+            history = self.game.moveHistory = game.SharedMoveHistory(history.data)
+        return PacmanSnapshot(self.game, self.game.state, self.game.gameOver, self.agent_idx,
+                              history.share(), self.game.keyframes,
+                              self.rng.getstate() if include_rng else None)
+
+    def restore_state(self, snapshot):
+        '''
+        Return the environment to a snapshot made by `clone_state`.
+        '''
+        self.game = snapshot.game
+        self.game.state = snapshot.state
+        self.game.gameOver = snapshot.game_over
+        self.agent_idx = snapshot.agent_idx
+        # The move history shares its moves with the snapshot, and copies
+        # them only if it goes on with a different move
+        self.game.moveHistory = snapshot.move_history.share()
+        self.game.keyframes = snapshot.keyframes
+        if snapshot.random_state is not None:
+            self.rng.setstate(snapshot.random_state)
 
     def render(self, mode='human'):
         '''
@@ -163,7 +407,11 @@ class PacmanEnv(gym.Env):
             self.display.initialize(self.game.state.data)
             self.display_initialized = True
 
+        if self.timer is not None:
+            start = time.perf_counter()
         self.display.update(self.game.state.data)
+        if self.timer is not None:
+            self.timer.add('display', self.agent_idx, time.perf_counter() - start)
 
     def getPossibleActions(self, state=None, agent_idx=None):
         '''
@@ -182,9 +430,8 @@ class PacmanEnv(gym.Env):
         state: defaults to current state.
         agent_idx: defaults to current agent index.
         '''
-        if agent_idx is None:
-            idx = self.agent_idx
-            
+        idx = self.agent_idx if agent_idx is None else agent_idx
+
         if state is not None:
             return state.getLegalActions(agentIndex=idx)
         else:
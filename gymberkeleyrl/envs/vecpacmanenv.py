@@ -0,0 +1,194 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from gym import spaces
+
+from reinforcement import layout as layout_
+from gymberkeleyrl.envs.pacmanenv import PacmanEnv, OBSERVATION_CHANNELS, encode_state
+
+
+def _worker(remote, parent_remote, shm_name, obs_shape, start, num_envs, seed, env_kwargs):
+    '''
+    Run `num_envs` PacmanEnvs in a subprocess. Commands and their results
+    are sent over `remote`, one message per batch. Observations are encoded
+    into the shared memory block `shm_name`, at rows `start` to
+    `start + num_envs`.
+    '''
+    parent_remote.close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    obs = np.ndarray(obs_shape, dtype=np.uint8, buffer=shm.buf)[start:start + num_envs]
+    envs = [PacmanEnv(**env_kwargs) for _ in range(num_envs)]
+    if seed is not None:
+        for i, env in enumerate(envs):
+            env.seed(seed + start + i)
+
+    def reset(i):
+        state = envs[i].reset(quiet=True)
+        encode_state(state, obs[i])
+        return {'agent_idx': envs[i].agent_idx, 'legal_actions': envs[i].getPossibleActions()}
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                results = []
+                for i, (env, action) in enumerate(zip(envs, data)):
+                    result = env.step(action)
+                    if result is None: # the agent crashed
+                        state, reward, done = None, 0.0, True
+                        info = {'crashed': True}
+                    else:
+                        state, reward, done, _ = result
+                        info = {}
+                    if done:
+                        game = env.game
+                        info['score'] = game.state.getScore()
+                        info['win'] = game.state.isWin()
+                        info['moves'] = len(game.moveHistory)
+                        info.update(reset(i)) # the episode is over, so start a new one
+                    else:
+                        encode_state(state, obs[i])
+                        info['agent_idx'] = env.agent_idx
+                        info['legal_actions'] = env.getPossibleActions()
+                    results.append((reward, done, info))
+                remote.send(results)
+            elif cmd == 'reset':
+                remote.send([reset(i) for i in range(num_envs)])
+            elif cmd == 'seed':
+                remote.send([env.seed(s) for env, s in zip(envs, data)])
+            elif cmd == 'close':
+                break
+            else:
+                raise NotImplementedError('Unknown command: %s' % cmd)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del obs
+        shm.close()
+        remote.close()
+
+
+class SubprocVectorPacmanEnv:
+    '''
+    Run `num_envs` PacmanEnvs in a pool of `num_workers` subprocesses and
+    step them together.
+
+    `step` and `reset` send one message per worker, holding the commands for
+    all of its environments. Observations are not pickled; each worker encodes
+    its states with `encode_state` directly into a shared memory block, which
+    `step` and `reset` return as a uint8 array of shape
+    (num_envs, channels, width, height).
+
+    Environments are reset automatically when an episode ends. The observation
+    returned for such an environment is the first observation of the next
+    episode, and its info dict contains the final `score`, `win` and number
+    of `moves` of the episode that ended. Every info dict contains the
+    `agent_idx` and `legal_actions` of the agent to play next.
+
+    The environment keyword arguments are passed to every PacmanEnv. The
+    graphics are always quiet. Pass a `ghost_agent` to make each step a whole
+    turn (see `PacmanEnv`).
+    '''
+
+    def __init__(self, num_envs, num_workers=None, start_method=None, seed=None, **env_kwargs):
+        '''
+        num_workers: defaults to the number of CPUs, but no more than `num_envs`.
+        start_method: the multiprocessing start method, e.g. 'fork' or 'spawn'.
+          Defaults to the platform default.
+        seed: seeds environment i with `seed + i` (see `seed`). If None,
+          each environment is seeded from the system.
+        '''
+        env_kwargs['quiet_graphics'] = True
+        env_kwargs['readonly_observations'] = True # states are encoded, never kept
+        layout = layout_.getLayout(env_kwargs.get('layout', 'mediumClassic'))
+        if layout is None:
+            raise Exception("The layout " + env_kwargs.get('layout', 'mediumClassic') + " cannot be found")
+
+        self.num_envs = num_envs
+        shape = (len(OBSERVATION_CHANNELS), layout.width, layout.height)
+        self.observation_space = spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8)
+        self.closed = False
+
+        obs_shape = (num_envs,) + shape
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(obs_shape)))
+        self._obs = np.ndarray(obs_shape, dtype=np.uint8, buffer=self._shm.buf)
+
+        if num_workers is None:
+            num_workers = mp.cpu_count()
+        num_workers = max(1, min(num_workers, num_envs))
+        ctx = mp.get_context(start_method)
+        self._remotes = []
+        self._processes = []
+        self._slices = []
+        start = 0
+        for w, envs in enumerate(np.array_split(np.arange(num_envs), num_workers)):
+            remote, work_remote = ctx.Pipe()
+            args = (work_remote, remote, self._shm.name, obs_shape, start, len(envs),
+                    seed, env_kwargs)
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            work_remote.close()
+            self._remotes.append(remote)
+            self._processes.append(process)
+            self._slices.append(slice(start, start + len(envs)))
+            start += len(envs)
+
+    def reset(self):
+        '''
+        Reset all the environments. Return the observations and a list of info dicts.
+        '''
+        for remote in self._remotes:
+            remote.send(('reset', None))
+        infos = [info for remote in self._remotes for info in remote.recv()]
+        return self._obs.copy(), infos
+
+    def step_async(self, actions):
+        '''
+        Send one action per environment, for the agent whose turn it is.
+        '''
+        if len(actions) != self.num_envs:
+            raise Exception('Expected %d actions, got %d' % (self.num_envs, len(actions)))
+        for remote, s in zip(self._remotes, self._slices):
+            remote.send(('step', list(actions[s])))
+
+    def step_wait(self):
+        '''
+        Wait for the actions sent by `step_async`. Return the observations,
+        rewards, done flags and info dicts of all the environments.
+        '''
+        results = [result for remote in self._remotes for result in remote.recv()]
+        rewards, dones, infos = zip(*results)
+        return (self._obs.copy(), np.array(rewards, dtype=np.float64),
+                np.array(dones, dtype=bool), list(infos))
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def seed(self, seed=None):
+        '''
+        Seed each environment with `seed + i`.
+        '''
+        for remote, s in zip(self._remotes, self._slices):
+            seeds = [None if seed is None else seed + i for i in range(s.start, s.stop)]
+            remote.send(('seed', seeds))
+        return [s for remote in self._remotes for s in remote.recv()]
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self._remotes:
+            remote.send(('close', None))
+        for process in self._processes:
+            process.join()
+        del self._obs
+        self._shm.close()
+        self._shm.unlink()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
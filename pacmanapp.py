@@ -1,14 +1,18 @@
 
 import argparse
+import io
 import numpy as np
 import pickle
 import random
+import sys
 import time
 import gym
 import gymberkeleyrl
 from gymberkeleyrl.envs import PacmanEnv
 
-from reinforcement.pacman import parseAgentArgs, replayGame
+from reinforcement.pacman import (parseAgentArgs, replayGame, recordGame, GameResult, GameStats,
+                                  playGamesInPool)
+from reinforcement import profiling, recording, telemetry, util
 from reinforcement import (ghostAgents, learningAgents, qlearningAgents, 
                            keyboardAgents, pacmanAgents, valueIterationAgents)
 
@@ -71,7 +75,7 @@ def parseArgs():
     parser.add_argument('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_argument('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recorded game file (pickle or --recordFile) to replay', default=None)
     parser.add_argument('-a', '--agentArgs', 
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_argument('-x', '--numTraining',  type=int,
@@ -82,6 +86,36 @@ def parseArgs():
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_argument('--timeout', type=int,
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_argument('--internalGhosts', action='store_true',
+                      help='Let the environment move the ghosts, so each step is a whole turn', default=False)
+    parser.add_argument('--fast', action='store_true',
+                      help='Give agents read-only views of the state instead of copies', default=False)
+    parser.add_argument('--workers', type=int,
+                      help=default('Number of processes playing the games after training (requires -q or -t)'), default=1)
+    parser.add_argument('--seed', type=int,
+                      help='Seed game i with SEED + i, to play the same games with any number of workers', default=None)
+    parser.add_argument('--replayStart', type=int,
+                      help=default('Replay from move START, counting from the end if negative'),
+                      metavar='START', default=0)
+    parser.add_argument('--recordFile',
+                      help='Append every game to RECORDFILE, in a compact format which --replay reads', default=None)
+    parser.add_argument('--profile', metavar='PREFIX',
+                      help='Profile the games, writing the profile to files starting with PREFIX', default=None)
+    parser.add_argument('--profiler', choices=profiling.MODES,
+                      help=default('How to profile: cprofile writes PREFIX.pstats, sampling writes PREFIX.collapsed for flame graphs'),
+                      default='cprofile')
+    parser.add_argument('--profileEvalOnly', action='store_true',
+                      help='Only profile the games after training', default=False)
+    parser.add_argument('--metricsFile', metavar='FILE',
+                      help='Write the return, length, epsilon, alpha and time of each episode of a learning agent to FILE (JSON lines, or CSV if FILE ends in .csv) instead of printing its status', default=None)
+    parser.add_argument('--memoryLog', metavar='FILE',
+                      help='Trace allocations, logging the memory retained and the sites which grew after each game to FILE', default=None)
+    parser.add_argument('--memoryTop', type=int,
+                      help=default('Number of growing allocation sites to log per game'), default=10)
+    parser.add_argument('--statsFile',
+                      help='Write the score, outcome, moves and time of each game to a CSV file', default=None)
+    parser.add_argument('--keepGames', action='store_true',
+                      help='Keep the games played after training, e.g. for inspection after main() returns', default=False)
 
     args = parser.parse_args()
     return args
@@ -104,6 +138,9 @@ def run_game(env, agents, quiet, initialize_display):
         if "registerInitialState" in dir(agent):
             agent.registerInitialState(state)
 
+    # Agents do not change their methods during a game
+    observers = ['observeTransition' in dir(agent) for agent in agents]
+
     while not done:
         agent = agents[agent_idx]
 
@@ -112,15 +149,13 @@ def run_game(env, agents, quiet, initialize_display):
 #             if 'observationFunction' in dir(agent):
 #                 agent.observationFunction(state)
 
-        actions = env.getPossibleActions()
-        # action = random.choice(actions) # env.action_space.sample() # your agent here (this takes random actions)
         action = agent.getAction(state)
 
         # reward is not cummulative since the last time this agent acted
         next_state, reward, done, info = env.step(action)
         agent_rewards[agent_idx] = reward
 
-        if 'observeTransition' in dir(agent):
+        if observers[agent_idx]:
             agent.observeTransition(state, action, next_state, agent_rewards.sum())
 
         if not quiet:
@@ -139,15 +174,68 @@ def run_game(env, agents, quiet, initialize_display):
     return game, layout
 
 
+def seed_game(env, seed):
+    '''
+    Seed the agents, which draw from the random module, and the environment.
+    '''
+    random.seed(seed)
+    env.seed(seed)
+
+
+_worker = None
+
+
+def init_worker(env_kwargs, agents):
+    '''
+    Make the environment of a worker process, which plays with its own copy of the agents.
+    The worker is forked (see `playGamesInPool`), so the agents, whose `actionFn` is a
+    closure, are inherited rather than pickled.
+    '''
+    global _worker
+    _worker = (PacmanEnv(**env_kwargs), agents, telemetry.bufferMetrics(agents))
+
+
+def play_game(seed):
+    '''
+    Play a game in a worker process. Return a `GameResult` holding what the game printed.
+    Learning agents count episodes from the end of training in each worker, so the 
+    training status they print differs from a run in one process. Their metrics rows
+    are sent back in the result, to be written by the main process.
+    '''
+    env, agents, metrics = _worker
+    seed_game(env, seed)
+    output = io.StringIO()
+    proxies = util.redirectOutput(output, stderr=False)
+    try:
+        start_time = time.time()
+        game, layout = run_game(env, agents, quiet=False, initialize_display=False)
+    finally:
+        util.restoreOutput(proxies)
+    return GameResult(game, time.time() - start_time, output.getvalue(), telemetry.takeBufferedRows(metrics))
+
+
 def main():
     
     args = parseArgs()
 
+    noKeyboard = args.gameToReplay == None and (
+        args.textGraphics or args.quietGraphics)
+    ghostType = loadAgent(args.ghost, noKeyboard)
+
+    if args.fixRandomSeed:
+        random.seed('cs188') # for the agents, which draw from the random module
+
+    if args.workers > 1 and not noKeyboard:
+        raise Exception('Playing games in several processes requires -q or -t')
+
     # make environment
-    env = PacmanEnv(layout=args.layout, max_ghosts=args.numGhosts, catch_exceptions=args.catchExceptions,
-                    timeout=args.timeout, quiet_graphics=args.quietGraphics,
-                    text_graphics=args.textGraphics, frame_time=args.frameTime, zoom=args.zoom,
-                    fix_random_seed=args.fixRandomSeed)
+    env_kwargs = dict(layout=args.layout, max_ghosts=args.numGhosts, catch_exceptions=args.catchExceptions,
+                      timeout=args.timeout, quiet_graphics=args.quietGraphics,
+                      text_graphics=args.textGraphics, frame_time=args.frameTime, zoom=args.zoom,
+                      fix_random_seed=args.fixRandomSeed, readonly_observations=args.fast,
+                      ghost_agent=ghostType if args.internalGhosts else None,
+                      keyframe_interval=recording.KEYFRAME_INTERVAL if args.recordFile else 0)
+    env = PacmanEnv(**env_kwargs)
     num_ghosts = env.num_ghosts
 
     # make actionFn
@@ -155,9 +243,6 @@ def main():
         def actionFn(state):
             return env.getPossibleActions(state, agent_index)
         
-    noKeyboard = args.gameToReplay == None and (
-        args.textGraphics or args.quietGraphics)
-    
     # make Pacman agent
     pacmanType = loadAgent(args.pacman, noKeyboard)
     agentOpts = parseAgentArgs(args.agentArgs)
@@ -168,6 +253,9 @@ def main():
     # Do not pass actionFn to agents that won't take it.
     if args.pacman not in ['KeyboardAgent', 'LeftTurnAgent', 'GreedyAgent']:
         agentOpts['actionFn'] = make_actionFn(0) # pacman is the first agent
+    metrics = None
+    if args.metricsFile and issubclass(pacmanType, learningAgents.ReinforcementAgent):
+        metrics = agentOpts['metrics'] = telemetry.MetricsWriter(args.metricsFile)
         
     pacman = pacmanType(**agentOpts)
 
@@ -177,51 +265,82 @@ def main():
         numQuiet = int(agentOpts['numTrain'])
         numIgnore = int(agentOpts['numTrain'])
     
-    # make ghost agents
-    ghostType = loadAgent(args.ghost, noKeyboard)
-    ghosts = [ghostType(i+1) for i in range(num_ghosts)]
-    
-    agents = [pacman] + ghosts
+    # make ghost agents, unless the environment moves the ghosts
+    agents = [pacman]
+    if not args.internalGhosts:
+        agents += [ghostType(i+1) for i in range(num_ghosts)]
 
     # Special case: recorded games
     if args.gameToReplay != None:
         print('Replaying recorded game %s.' % args.gameToReplay)
-        with open(args.gameToReplay, 'rb') as f:
-            recorded = pickle.load(f)
+        for recorded in recording.loadRecordedGames(args.gameToReplay):
             recorded['display'] = env.display
-            replayGame(**recorded)
-            sys.exit(0)
+            replayGame(start=args.replayStart, **recorded)
+        sys.exit(0)
 
     
-    # run games
-    games = []
-    for i in range(args.numGames):
+    # run games, after training in worker processes if there are several
+    rows = open(args.statsFile, 'w') if args.statsFile else None
+    stats = GameStats(rows, args.keepGames)
+    recorder = recording.RecordingWriter(args.recordFile) if args.recordFile else None
+    seed = args.seed
+    if args.workers > 1 and seed is None:
+        seed = random.randrange(2 ** 32)
+    num_serial_games = args.numGames if args.workers <= 1 else min(args.numTraining, args.numGames)
+    profiler = profiling.Profiler(args.profile, args.profiler) if args.profile else None
+    memory_log = profiling.MemoryLog(args.memoryLog, args.memoryTop) if args.memoryLog else None
+    if memory_log is not None:
+        memory_log.start()
+    for i in range(num_serial_games):
+        if profiler is not None and (i == args.numTraining or not args.profileEvalOnly):
+            profiler.start()
+        if seed is not None:
+            seed_game(env, seed + i)
         quiet = i < args.numTraining # shush training games
         initialize_display = args.pacman == 'KeyboardAgent' # start display early to get keystrokes
+        start_time = time.time()
         game, layout = run_game(env, agents, quiet, initialize_display=initialize_display)
         if not quiet:
-            games.append(game)
+            stats.add(game, time.time() - start_time)
 
         if args.record:
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            with open(fname, 'wb') as f:
-                components = {'layout': layout, 'actions': game.moveHistory}
-                pickle.dump(components, f)
+            recordGame(layout, game.moveHistory, i)
+        if recorder is not None:
+            recorder.writeGame(game, layout, None if seed is None else seed + i)
+        if memory_log is not None:
+            memory_log.episode('game %d' % (i + 1))
+
+    if num_serial_games < args.numGames:
+        if profiler is not None:
+            profiler.start() # profiles the main process only, not the workers
+        seeds = [seed + i for i in range(num_serial_games, args.numGames)]
+        results = playGamesInPool(args.workers, (env_kwargs, agents), seeds, init_worker, play_game)
+        for i, result in enumerate(results, num_serial_games):
+            sys.stdout.write(result.output) # what the game printed in the worker
+            telemetry.writeBufferedRows(agents, result.metrics, i + 1)
+            stats.add(result, result.time)
+            if args.record:
+                recordGame(env.layout, result.moveHistory, i)
+            if recorder is not None:
+                recorder.writeGame(result, env.layout, seed + i)
+            if memory_log is not None:
+                memory_log.episode('game %d' % (i + 1))
 
     # print testing stats
-    if (args.numGames - args.numTraining) > 0:
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        print('Average Score:', sum(scores) / float(len(scores)))
-        print('Scores:       ', ', '.join([str(score) for score in scores]))
-        print('Win Rate:      %d/%d (%.2f)' %
-              (wins.count(True), len(wins), winRate))
-        print('Record:       ', ', '.join(
-            [['Loss', 'Win'][int(w)] for w in wins]))
-
-    return games
+    if profiler is not None:
+        print('Profile written to', profiler.save(), file=sys.stderr)
+    if memory_log is not None:
+        memory_log.close()
+    if metrics is not None:
+        metrics.close()
+    if rows is not None:
+        rows.close()
+    if recorder is not None:
+        recorder.close()
+    if stats.count > 0:
+        stats.printSummary()
+
+    return stats
 
 
 def gym_test():
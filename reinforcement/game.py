@@ -24,7 +24,9 @@ from .util import *
 import time
 import os
 import traceback
+import weakref
 import sys
+from collections.abc import Sequence
 
 #######################
 # Parts worth reading #
@@ -71,6 +73,13 @@ class Directions:
                WEST: EAST,
                STOP: STOP}
 
+    # Integer codes of the directions, used internally by the engine.
+    # NAMES[code] is the direction with that code and CODES[direction] its code.
+    NAMES = (NORTH, SOUTH, EAST, WEST, STOP)
+    CODES = {NORTH: 0, SOUTH: 1, EAST: 2, WEST: 3, STOP: 4}
+    STOP_CODE = 4
+    REVERSE_CODES = (1, 0, 3, 2, 4)
+
 
 class Configuration:
     """
@@ -79,11 +88,58 @@ class Configuration:
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Positions are stored in half cells, the smallest step an agent takes (a
+    scared ghost moves at half speed), so that they are always integers:
+    pos2 = (2 * x, 2 * y).  pos and getPosition() give the position in
+    cells, with int coordinates at grid points and float coordinates (e.g.
+    3.5) in between.  Positions used to keep the type they were made with,
+    so a ghost that had moved at GHOST_SPEED = 1.0 was at e.g. (3.0, 4.0);
+    it is now at (3, 4), which compares and hashes equal, but prints without
+    the '.0'.  Use float() where a float is needed.
+
+    Likewise the direction is stored as an integer code, dirCode (see
+    Directions.CODES), and direction gives its name.
+
+    Configurations are immutable values: setting an attribute raises an
+    AttributeError, and moving makes a new Configuration.
     """
+    __slots__ = ('pos2', 'dirCode', '_hash')
 
     def __init__(self, pos, direction):
-        self.pos = pos
-        self.direction = direction
+        x, y = pos
+        setattr_ = object.__setattr__
+        setattr_(self, 'pos2', (int(round(2 * x)), int(round(2 * y))))
+        setattr_(self, 'dirCode', Directions.CODES[direction])
+        setattr_(self, '_hash', None)
+
+    def fromPos2(pos2, dirCode):
+        """
+        Makes a Configuration from a position in half cells and a direction code.
+        """
+        config = _new(Configuration)
+        _setPos2(config, pos2)
+        _setDirCode(config, dirCode)
+        _setConfigHash(config, None)
+        return config
+    fromPos2 = staticmethod(fromPos2)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute '%s' of a Configuration" % name)
+
+    def __reduce__(self):
+        return (Configuration.fromPos2, (self.pos2, self.dirCode))
+
+    def _getPos(self):
+        x2, y2 = self.pos2
+        return (x2 / 2.0 if x2 & 1 else x2 >> 1, y2 / 2.0 if y2 & 1 else y2 >> 1)
+
+    pos = property(_getPos)
+
+    def _getDirection(self):
+        return Directions.NAMES[self.dirCode]
+
+    direction = property(_getDirection)
 
     def getPosition(self):
         return (self.pos)
@@ -92,18 +148,20 @@ class Configuration:
         return self.direction
 
     def isInteger(self):
-        x, y = self.pos
-        return x == int(x) and y == int(y)
+        x2, y2 = self.pos2
+        return not (x2 | y2) & 1
 
     def __eq__(self, other):
+        if other is self:
+            return True
         if other == None:
             return False
-        return (self.pos == other.pos and self.direction == other.direction)
+        return (self.pos2 == other.pos2 and self.dirCode == other.dirCode)
 
     def __hash__(self):
-        x = hash(self.pos)
-        y = hash(self.direction)
-        return hash(x + 13 * y)
+        if self._hash is None:
+            _setConfigHash(self, hash(hash(self.pos2) + 13 * self.dirCode))
+        return self._hash
 
     def __str__(self):
         return "(x,y)="+str(self.pos)+", "+str(self.direction)
@@ -116,27 +174,70 @@ class Configuration:
 
         Actions are movement vectors.
         """
-        x, y = self.pos
         dx, dy = vector
-        direction = Actions.vectorToDirection(vector)
-        if direction == Directions.STOP:
-            direction = self.direction  # There is no stop direction
-        return Configuration((x + dx, y+dy), direction)
+        return self.generateSuccessor2((int(round(2 * dx)), int(round(2 * dy))))
+
+    def generateSuccessor2(self, vector2):
+        """
+        Like generateSuccessor, for a movement vector in half cells.
+        """
+        x2, y2 = self.pos2
+        dx2, dy2 = vector2
+        dirCode = Directions.CODES[Actions.vectorToDirection(vector2)]
+        if dirCode == Directions.STOP_CODE:
+            dirCode = self.dirCode  # There is no stop direction
+        return Configuration.fromPos2((x2 + dx2, y2 + dy2), dirCode)
+
+    def move(self, dirCode, speed2):
+        """
+        Returns the configuration reached by moving speed2 half cells in the
+        direction with code dirCode.
+        """
+        x2, y2 = self.pos2
+        dx, dy = Actions._codeVectors[dirCode]
+        if dirCode == Directions.STOP_CODE:
+            dirCode = self.dirCode  # There is no stop direction
+        return Configuration.fromPos2((x2 + dx * speed2, y2 + dy * speed2), dirCode)
+
+
+# Slot setters, which bypass the __setattr__ of the immutable classes
+_new = object.__new__
+_setPos2 = Configuration.pos2.__set__
+_setDirCode = Configuration.dirCode.__set__
+_setConfigHash = Configuration._hash.__set__
+
+
+_MISSING = object()  # an argument that was not given
 
 
 class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
+
+    AgentStates are immutable values, so copies and successor states share
+    them: setting an attribute raises an AttributeError, and replace()
+    makes a changed copy.
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned', '_hash')
 
     def __init__(self, startConfiguration, isPacman):
-        self.start = startConfiguration
-        self.configuration = startConfiguration
-        self.isPacman = isPacman
-        self.scaredTimer = 0
+        setattr_ = object.__setattr__
+        setattr_(self, 'start', startConfiguration)
+        setattr_(self, 'configuration', startConfiguration)
+        setattr_(self, 'isPacman', isPacman)
+        setattr_(self, 'scaredTimer', 0)
         # state below potentially used for contest only
-        self.numCarrying = 0
-        self.numReturned = 0
+        setattr_(self, 'numCarrying', 0)
+        setattr_(self, 'numReturned', 0)
+        setattr_(self, '_hash', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute '%s' of an AgentState" % name)
+
+    def __reduce__(self):
+        return (_makeAgentState, (self.start, self.configuration, self.isPacman,
+                                  self.scaredTimer, self.numCarrying, self.numReturned))
 
     def __str__(self):
         if self.isPacman:
@@ -145,20 +246,34 @@ class AgentState:
             return "Ghost: " + str(self.configuration)
 
     def __eq__(self, other):
+        if other is self:
+            return True
         if other == None:
             return False
         return self.configuration == other.configuration and self.scaredTimer == other.scaredTimer
 
     def __hash__(self):
-        return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
+        if self._hash is None:
+            _setStateHash(self, hash(hash(self.configuration) + 13 * hash(self.scaredTimer)))
+        return self._hash
 
     def copy(self):
-        state = AgentState(self.start, self.isPacman)
-        state.configuration = self.configuration
-        state.scaredTimer = self.scaredTimer
-        state.numCarrying = self.numCarrying
-        state.numReturned = self.numReturned
-        return state
+        # Immutable, so the state itself serves as its copy
+        return self
+
+    def replace(self, configuration=_MISSING, scaredTimer=_MISSING, numCarrying=_MISSING,
+                numReturned=_MISSING):
+        """
+        Returns a copy of the agent state with the given attributes changed.
+        configuration may be None, for an agent that is not in play.
+        """
+        return _makeAgentState(
+            self.start,
+            self.configuration if configuration is _MISSING else configuration,
+            self.isPacman,
+            self.scaredTimer if scaredTimer is _MISSING else scaredTimer,
+            self.numCarrying if numCarrying is _MISSING else numCarrying,
+            self.numReturned if numReturned is _MISSING else numReturned)
 
     def getPosition(self):
         if self.configuration == None:
@@ -169,6 +284,18 @@ class AgentState:
         return self.configuration.getDirection()
 
 
+_agentStateSlots = [getattr(AgentState, name).__set__ for name in AgentState.__slots__]
+_setStateHash = AgentState._hash.__set__
+
+
+def _makeAgentState(start, configuration, isPacman, scaredTimer, numCarrying, numReturned):
+    state = _new(AgentState)
+    for set_, value in zip(_agentStateSlots, (start, configuration, isPacman, scaredTimer,
+                                              numCarrying, numReturned, None)):
+        set_(state, value)
+    return state
+
+
 class Grid:
     """
     A 2-dimensional array of objects backed by a list of lists.  Data is accessed
@@ -262,7 +389,7 @@ class Grid:
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
-        x = index / self.height
+        x = index // self.height
         y = index % self.height
         return x, y
 
@@ -293,6 +420,192 @@ class Grid:
         return bools
 
 
+class ReadOnlyGrid(Grid):
+    """
+    A read-only view of a Grid.  The view shares storage with the grid it
+    wraps, so creating one is cheap.  grid[x][y] works as usual, but columns
+    are handed out as ReadOnlyList views of the grid's own columns, so
+    assignments raise a TypeError, and data is a ReadOnlyList of those
+    columns.  Setting an attribute raises an AttributeError.  Use copy() to
+    get a Grid that can be modified.
+    """
+
+    def __init__(self, grid):
+        if isinstance(grid, ReadOnlyGrid):
+            grid = grid._grid
+        setattr_ = object.__setattr__
+        setattr_(self, '_grid', grid)
+        setattr_(self, 'CELLS_PER_INT', grid.CELLS_PER_INT)
+        setattr_(self, 'width', grid.width)
+        setattr_(self, 'height', grid.height)
+        setattr_(self, '_columns', [None] * grid.width)
+
+    def __getitem__(self, i):
+        # Column views are made on first use and kept for the life of the view
+        column = self._columns[i]
+        if column is None:
+            column = self._columns[i] = ReadOnlyList(self._grid.data[i])
+        return column
+
+    def __setitem__(self, key, item):
+        raise TypeError('ReadOnlyGrid does not support item assignment')
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute '%s' of a ReadOnlyGrid" % name)
+
+    @property
+    def data(self):
+        return ReadOnlyList([self[x] for x in range(self.width)])
+
+    def __str__(self):
+        return str(self._grid)
+
+    def __eq__(self, other):
+        if isinstance(other, ReadOnlyGrid):
+            other = other._grid
+        return self._grid == other
+
+    def __hash__(self):
+        return hash(self._grid)
+
+    def copy(self):
+        return self._grid.copy()
+
+    def shallowCopy(self):
+        # The view cannot be modified, so it can be shared
+        return self
+
+    def count(self, item=True):
+        return self._grid.count(item)
+
+
+class ReadOnlyLayout:
+    """
+    A read-only view of a layout.Layout.  The walls and food are
+    ReadOnlyGrids, and the capsules, agent positions, layout text and action
+    table are ReadOnlyLists, which share storage with the layout.  The
+    methods of the layout, which only read it, are available.  Setting an
+    attribute raises an AttributeError.
+    """
+
+    def __init__(self, layout):
+        if isinstance(layout, ReadOnlyLayout):
+            layout = layout._layout
+        setattr_ = object.__setattr__
+        setattr_(self, '_layout', layout)
+        setattr_(self, 'width', layout.width)
+        setattr_(self, 'height', layout.height)
+        setattr_(self, 'walls', ReadOnlyGrid(layout.walls))
+        setattr_(self, 'food', ReadOnlyGrid(layout.food))
+        setattr_(self, 'capsules', ReadOnlyList(layout.capsules))
+        setattr_(self, 'agentPositions', ReadOnlyList(layout.agentPositions))
+        setattr_(self, 'numGhosts', layout.numGhosts)
+        setattr_(self, 'layoutText', ReadOnlyList(layout.layoutText))
+        setattr_(self, 'totalFood', layout.totalFood)
+        setattr_(self, 'name', layout.name)
+        setattr_(self, '_actionTable', None)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        attribute = getattr(self._layout, name)
+        if not callable(attribute):
+            raise AttributeError("'%s' of a read-only layout is not available" % name)
+        return attribute
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute '%s' of a read-only layout" % name)
+
+    def __str__(self):
+        return str(self._layout)
+
+    def getActionTable(self):
+        if self._actionTable is None:
+            table = ReadOnlyList([ReadOnlyList(column) for column in self._layout.getActionTable()])
+            object.__setattr__(self, '_actionTable', table)
+        return self._actionTable
+
+    @property
+    def actionTable(self):
+        return self.getActionTable()
+
+    def deepCopy(self):
+        return self._layout.deepCopy()
+
+
+_layoutViews = weakref.WeakKeyDictionary()
+
+
+def readOnlyLayout(layout):
+    """
+    Returns the ReadOnlyLayout of a layout, made once per layout.
+    """
+    if isinstance(layout, ReadOnlyLayout):
+        return layout
+    view = _layoutViews.get(layout)
+    if view is None:
+        view = _layoutViews[layout] = ReadOnlyLayout(layout)
+    return view
+
+
+class ReadOnlyList(Sequence):
+    """
+    A read-only view of a list.  The view shares storage with the list it
+    wraps, and raises a TypeError on any attempt to modify it.  Slicing
+    returns an ordinary list.
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, i):
+        return self._items[i]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __eq__(self, other):
+        if isinstance(other, ReadOnlyList):
+            other = other._items
+        return self._items == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return self._items + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self._items
+
+    def __repr__(self):
+        return repr(self._items)
+
+    def index(self, *args):
+        return self._items.index(*args)
+
+    def count(self, item):
+        return self._items.count(item)
+
+    def copy(self):
+        return self._items[:]
+
+    def _readOnly(self, *args, **kwargs):
+        raise TypeError('ReadOnlyList does not support modification')
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readOnly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readOnly
+
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1, 2)):
         return bitRep
@@ -317,6 +630,9 @@ class Actions:
 
     _directionsAsList = [('West', (-1, 0)), ('Stop', (0, 0)), ('East', (1, 0)), ('North', (0, 1)), ('South', (0, -1))]
 
+    # Unit vectors of the direction codes, in the order of Directions.NAMES
+    _codeVectors = ((0, 1), (0, -1), (1, 0), (-1, 0), (0, 0))
+
     TOLERANCE = .001
 
     def reverseDirection(action):
@@ -349,25 +665,65 @@ class Actions:
         return (dx * speed, dy * speed)
     directionToVector = staticmethod(directionToVector)
 
-    def getPossibleActions(config, walls):
-        possible = []
-        x, y = config.pos
-        x_int, y_int = int(x + 0.5), int(y + 0.5)
+    def directionToCode(direction):
+        """
+        Returns the integer code of a direction, or None if it is not a direction.
+        """
+        try:
+            return Directions.CODES.get(direction)
+        except TypeError:  # not hashable
+            return None
+    directionToCode = staticmethod(directionToCode)
+
+    def getPossibleActions(config, walls, actionTable=None):
+        """
+        Returns the actions possible from the configuration.  actionTable is
+        an optional table of the actions possible at each grid point, as
+        made by makeActionTable(walls).
+        """
+        names = Directions.NAMES
+        return [names[code] for code in Actions.getPossibleActionCodes(config, walls, actionTable)]
+    getPossibleActions = staticmethod(getPossibleActions)
+
+    def getPossibleActionCodes(config, walls, actionTable=None):
+        """
+        Like getPossibleActions, returning direction codes.
+        """
+        x2, y2 = config.pos2
 
         # In between grid points, all agents must continue straight
-        if (abs(x - x_int) + abs(y - y_int) > Actions.TOLERANCE):
-            return [config.getDirection()]
+        if (x2 | y2) & 1:
+            return [config.dirCode]
+
+        x_int, y_int = x2 >> 1, y2 >> 1
+        if actionTable is not None:
+            return list(actionTable[x_int][y_int])
 
+        possible = []
         for dir, vec in Actions._directionsAsList:
             dx, dy = vec
             next_y = y_int + dy
             next_x = x_int + dx
             if not walls[next_x][next_y]:
-                possible.append(dir)
+                possible.append(Directions.CODES[dir])
 
         return possible
+    getPossibleActionCodes = staticmethod(getPossibleActionCodes)
 
-    getPossibleActions = staticmethod(getPossibleActions)
+    def makeActionTable(walls):
+        """
+        Returns a table of the actions possible at each grid point, indexed
+        like the walls, i.e. table[x][y] is a tuple of direction codes.  Walls
+        on the border of the grid are assumed, as in every layout.
+        """
+        table = [[() for y in range(walls.height)] for x in range(walls.width)]
+        for x in range(1, walls.width - 1):
+            for y in range(1, walls.height - 1):
+                if not walls[x][y]:
+                    table[x][y] = tuple(Directions.CODES[dir] for dir, (dx, dy) in Actions._directionsAsList
+                                        if not walls[x + dx][y + dy])
+        return table
+    makeActionTable = staticmethod(makeActionTable)
 
     def getLegalNeighbors(position, walls):
         x, y = position
@@ -426,10 +782,8 @@ class GameStateData:
         return state
 
     def copyAgentStates(self, agentStates):
-        copiedStates = []
-        for agentState in agentStates:
-            copiedStates.append(agentState.copy())
-        return copiedStates
+        # AgentStates are immutable, so they are shared
+        return agentStates[:]
 
     def __eq__(self, other):
         """
@@ -475,7 +829,7 @@ class GameStateData:
                 continue
             if agentState.configuration == None:
                 continue
-            x, y = [int(i) for i in nearestPoint(agentState.configuration.pos)]
+            x, y = [(i + 1) >> 1 for i in agentState.configuration.pos2]
             agent_dir = agentState.configuration.direction
             if agentState.isPacman:
                 map[x][y] = self._pacStr(agent_dir)
@@ -538,6 +892,142 @@ class GameStateData:
         self._eaten = [False for a in self.agentStates]
 
 
+class ReadOnlyGameStateData(GameStateData):
+    """
+    A read-only view of a GameStateData.  Food, capsules and the list of agent
+    states are wrapped in read-only views that share storage with the wrapped
+    data, so no defensive copy is made.  The layout is wrapped in a
+    ReadOnlyLayout, and the (immutable) agent states are shared as is.
+    Setting an attribute raises an AttributeError.
+    """
+
+    def __init__(self, data):
+        setattr_ = object.__setattr__
+        setattr_(self, '_data', data)
+        setattr_(self, 'food', ReadOnlyGrid(data.food))
+        setattr_(self, 'capsules', ReadOnlyList(data.capsules))
+        setattr_(self, 'agentStates', ReadOnlyList(data.agentStates))
+        setattr_(self, 'layout', readOnlyLayout(data.layout))
+        setattr_(self, '_eaten', ReadOnlyList(data._eaten))
+        setattr_(self, 'score', data.score)
+        setattr_(self, '_foodEaten', data._foodEaten)
+        setattr_(self, '_foodAdded', data._foodAdded)
+        setattr_(self, '_capsuleEaten', data._capsuleEaten)
+        setattr_(self, '_agentMoved', data._agentMoved)
+        setattr_(self, '_lose', data._lose)
+        setattr_(self, '_win', data._win)
+        setattr_(self, 'scoreChange', data.scoreChange)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute '%s' of a read-only GameStateData" % name)
+
+    def deepCopy(self):
+        return self._data.deepCopy()
+
+
+class MoveHistory:
+    """
+    The moves of a game, as (agentIndex, action) pairs.  It behaves like a
+    list of pairs, but stores each move in one byte: the agent index in the
+    high bits and the direction code in the low three bits, which limits it
+    to 32 agents.  Slicing returns a MoveHistory.
+    """
+
+    def __init__(self, moves=()):
+        self.data = bytearray()
+        for move in moves:
+            self.append(move)
+
+    def append(self, move):
+        agentIndex, action = move
+        self.data.append(agentIndex << 3 | Directions.CODES[action])
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        names = Directions.NAMES
+        for b in self.data:
+            yield (b >> 3, names[b & 7])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            moves = MoveHistory()
+            moves.data = self.data[i]
+            return moves
+        b = self.data[i]
+        return (b >> 3, Directions.NAMES[b & 7])
+
+    def __delitem__(self, i):
+        del self.data[i]
+
+    def __eq__(self, other):
+        if isinstance(other, MoveHistory):
+            return self.data == other.data
+        return list(self) == list(other)
+
+    def __str__(self):
+        return str(list(self))
+
+    def copy(self):
+        return self[:]
+
+
+class SharedMoveHistory(MoveHistory):
+    """
+    A MoveHistory made of the first length moves of a buffer that other
+    histories may share, so that a history can be saved and restored in
+    constant time, as PacmanEnv.clone_state and restore_state do.
+
+    Moves are only ever appended to a shared buffer, which leaves the prefix
+    each history sees intact.  A history that appends a move which differs
+    from the one already in the buffer at that point copies its prefix first.
+    """
+
+    def __init__(self, buffer=None, length=None):
+        self._buffer = bytearray() if buffer is None else buffer
+        self._length = len(self._buffer) if length is None else length
+
+    @property
+    def data(self):
+        if len(self._buffer) != self._length:
+            self._buffer = self._buffer[:self._length]
+        return self._buffer
+
+    @data.setter
+    def data(self, data):
+        self._buffer = data
+        self._length = len(data)
+
+    def share(self):
+        "Returns a SharedMoveHistory of the moves so far, in constant time"
+        return SharedMoveHistory(self._buffer, self._length)
+
+    def append(self, move):
+        agentIndex, action = move
+        b = agentIndex << 3 | Directions.CODES[action]
+        buffer, length = self._buffer, self._length
+        if len(buffer) == length:
+            buffer.append(b)
+        elif buffer[length] != b:
+            self._buffer = buffer[:length]
+            self._buffer.append(b)
+        self._length = length + 1
+
+    def __len__(self):
+        return self._length
+
+    def __delitem__(self, i):
+        del self.data[i]
+        self._length = len(self._buffer)
+
+
+def _addPhaseTime(timer, phase, agentIndex, start, end):
+    "Adds the time from start to end to a phase, and returns end"
+    timer.add(phase, agentIndex, end - start)
+    return end
+
+
 try:
     import boinc
     _BOINC_ENABLED = True
@@ -550,21 +1040,46 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False):
+    def __init__(self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False,
+                 watchdog=None, fast=False, timer=None, keyframeInterval=0):
+        """
+        With catchExceptions, the time agents take is checked against the
+        limits of the rules after each call.  Pass a util.Watchdog to also
+        interrupt calls which run past their time limit.
+
+        With fast, agents are handed read-only views of the state (see
+        GameState.readOnly) instead of deep copies, and their output is not
+        redirected even if muteAgents is set.
+
+        Pass a util.PhaseTimes as timer to record the time each agent's
+        moves spend in the phases of the game: 'observation' (copying the
+        state and observationFunction), 'getAction', 'generateSuccessor',
+        'display' and 'process' (the rules).
+
+        With a keyframeInterval, the states after every keyframeInterval
+        moves are kept in keyframes, as (number of moves, GameState) pairs,
+        for recording.RecordingWriter to store with the game.
+        """
         self.agentCrashed = False
         self.agents = agents
         self.display = display
         self.rules = rules
         self.startingIndex = startingIndex
         self.gameOver = False
-        self.muteAgents = muteAgents
+        self.fast = fast
+        self.muteAgents = muteAgents and not fast
         self.catchExceptions = catchExceptions
-        self.moveHistory = []
+        self.watchdog = watchdog
+        self.timer = timer
+        self.moveHistory = MoveHistory()
+        self.keyframeInterval = keyframeInterval
+        self.keyframes = ()
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
         import io
         self.agentOutput = [io.StringIO() for agent in agents]
+        self._mutedOutput = None
 
     def getProgress(self):
         if self.gameOver:
@@ -580,26 +1095,42 @@ class Game:
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
-    OLD_STDOUT = None
-    OLD_STDERR = None
+    def recordMove(self, agentIndex, action):
+        """
+        Appends a move, which led to the current state, to the move history,
+        and keeps the state as a keyframe every keyframeInterval moves.
+        """
+        self.moveHistory.append((agentIndex, action))
+        if self.keyframeInterval and len(self.moveHistory) % self.keyframeInterval == 0:
+            # A new tuple, so that the keyframes saved with a snapshot of a
+            # PacmanEnv are never modified
+            self.keyframes += ((len(self.moveHistory), self.state),)
 
     def mute(self, agentIndex):
+        """
+        Sends the output of the current thread to the agent's output buffer.
+        Other threads, e.g. running other games, are not affected.
+        """
         if not self.muteAgents:
             return
-        global OLD_STDOUT, OLD_STDERR
-        import io
-        OLD_STDOUT = sys.stdout
-        OLD_STDERR = sys.stderr
-        sys.stdout = self.agentOutput[agentIndex]
-        sys.stderr = self.agentOutput[agentIndex]
+        self.unmute()
+        self._mutedOutput = redirectOutput(self.agentOutput[agentIndex])
 
     def unmute(self):
-        if not self.muteAgents:
+        if not self.muteAgents or self._mutedOutput is None:
             return
-        global OLD_STDOUT, OLD_STDERR
         # Revert stdout/stderr to originals
-        sys.stdout = OLD_STDOUT
-        sys.stderr = OLD_STDERR
+        restoreOutput(self._mutedOutput)
+        self._mutedOutput = None
+
+    def observe(self):
+        """
+        The state handed to the agents: a read-only view in fast mode,
+        otherwise a deep copy.
+        """
+        if self.fast:
+            return self.state.readOnly()
+        return self.state.deepCopy()
 
     def run(self):
         """
@@ -624,13 +1155,11 @@ class Game:
                 self.mute(i)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(
-                            agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
+                        timed_func = TimedCall(
+                            agent.registerInitialState, self.rules.getMaxStartupTime(i), self.watchdog)
                         try:
-                            start_time = time.time()
-                            timed_func(self.state.deepCopy())
-                            time_taken = time.time() - start_time
-                            self.totalAgentTimes[i] += time_taken
+                            timed_func(self.observe())
+                            self.totalAgentTimes[i] += timed_func.timeTaken
                         except TimeoutFunctionException:
                             print("Agent %d ran out of time on startup!" %
                                   i, file=sys.stderr)
@@ -643,52 +1172,57 @@ class Game:
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    agent.registerInitialState(self.observe())
                 # TODO: could this exceed the total time
                 self.unmute()
 
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
+        # Agents do not change their methods during a game
+        observers = ['observationFunction' in dir(agent) for agent in self.agents]
+        timer = self.timer
+        clock = time.perf_counter
 
         while not self.gameOver:
             # Fetch the next agent
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
+            if timer is not None:
+                start = clock()
             # Generate an observation of the state
-            if 'observationFunction' in dir(agent):
+            if observers[agentIndex]:
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(
-                            self.rules.getMoveTimeout(agentIndex)))
+                        timed_func = TimedCall(agent.observationFunction,
+                                               self.rules.getMoveTimeout(agentIndex), self.watchdog)
                         try:
-                            start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
+                            observation = timed_func(self.observe())
                         except TimeoutFunctionException:
                             skip_action = True
-                        move_time += time.time() - start_time
+                        move_time += timed_func.timeTaken
                         self.unmute()
                     except Exception as data:
                         self._agentCrash(agentIndex, quiet=False)
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(
-                        self.state.deepCopy())
+                    observation = agent.observationFunction(self.observe())
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.observe()
+            if timer is not None:
+                start = _addPhaseTime(timer, 'observation', agentIndex, start, clock())
 
             # Solicit an action
             action = None
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(
-                        self.rules.getMoveTimeout(agentIndex)) - int(move_time))
+                    timed_func = TimedCall(agent.getAction,
+                                           self.rules.getMoveTimeout(agentIndex) - move_time, self.watchdog)
                     try:
-                        start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
                         action = timed_func(observation)
@@ -700,7 +1234,7 @@ class Game:
                         self.unmute()
                         return
 
-                    move_time += time.time() - start_time
+                    move_time += timed_func.timeTaken
 
                     if move_time > self.rules.getMoveWarningTime(agentIndex):
                         self.totalAgentTimeWarnings[agentIndex] += 1
@@ -731,9 +1265,10 @@ class Game:
             else:
                 action = agent.getAction(observation)
             self.unmute()
+            if timer is not None:
+                start = _addPhaseTime(timer, 'getAction', agentIndex, start, clock())
 
             # Execute the action
-            self.moveHistory.append((agentIndex, action))
             if self.catchExceptions:
                 try:
                     self.state = self.state.generateSuccessor(
@@ -745,14 +1280,21 @@ class Game:
                     return
             else:
                 self.state = self.state.generateSuccessor(agentIndex, action)
+            self.recordMove(agentIndex, action)
+            if timer is not None:
+                start = _addPhaseTime(timer, 'generateSuccessor', agentIndex, start, clock())
 
             # Change the display
             self.display.update(self.state.data)
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
+            if timer is not None:
+                start = _addPhaseTime(timer, 'display', agentIndex, start, clock())
 
             # Allow for game specific conditions (winning, losing, etc.)
             self.rules.process(self.state, self)
+            if timer is not None:
+                _addPhaseTime(timer, 'process', agentIndex, start, clock())
             # Track progress
             if agentIndex == numAgents + 1:
                 self.numMoves += 1
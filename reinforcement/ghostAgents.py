@@ -21,15 +21,23 @@ from . import util
 
 
 class GhostAgent(Agent):
-    def __init__(self, index):
+    """
+    rng is the random.Random the ghost draws its actions from, by default
+    the random module.
+    """
+    rng = random
+
+    def __init__(self, index, rng=None):
         self.index = index
+        if rng is not None:
+            self.rng = rng
 
     def getAction(self, state):
         dist = self.getDistribution(state)
         if len(dist) == 0:
             return Directions.STOP
         else:
-            return util.chooseFromDistribution(dist)
+            return util.chooseFromDistribution(dist, self.rng)
 
     def getDistribution(self, state):
         "Returns a Counter encoding a distribution over actions from the provided state."
@@ -50,8 +58,8 @@ class RandomGhost(GhostAgent):
 class DirectionalGhost(GhostAgent):
     "A ghost that prefers to rush Pacman, or flee when scared."
 
-    def __init__(self, index, prob_attack=0.8, prob_scaredFlee=0.8):
-        self.index = index
+    def __init__(self, index, prob_attack=0.8, prob_scaredFlee=0.8, rng=None):
+        GhostAgent.__init__(self, index, rng)
         self.prob_attack = prob_attack
         self.prob_scaredFlee = prob_scaredFlee
 
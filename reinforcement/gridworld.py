@@ -178,8 +178,13 @@ class Gridworld(mdp.MarkovDecisionProcess):
 
 class GridworldEnvironment(environment.Environment):
 
-    def __init__(self, gridWorld):
+    def __init__(self, gridWorld, randObj=None):
+        """
+        randObj is the random.Random transitions are sampled with, by default
+        the random module.
+        """
         self.gridWorld = gridWorld
+        self.randObj = randObj
         self.reset()
 
     def getCurrentState(self):
@@ -190,7 +195,7 @@ class GridworldEnvironment(environment.Environment):
 
     def doAction(self, action):
         state = self.getCurrentState()
-        (nextState, reward) = self.getRandomNextState(state, action)
+        (nextState, reward) = self.getRandomNextState(state, action, self.randObj)
         self.state = nextState
         return (nextState, reward)
 
@@ -338,11 +343,17 @@ def getUserAction(state, actionFunction):
 def printString(x): print(x)
 
 def runEpisode(agent, environment, discount, decision, display, message, pause, episode):
+    """
+    Runs an episode, returning its discounted return.  message is called
+    with a description of each step, unless it is None, in which case the
+    descriptions are not built at all.
+    """
     returns = 0
     totalDiscount = 1.0
     environment.reset()
     if 'startEpisode' in dir(agent): agent.startEpisode()
-    message("BEGINNING EPISODE: "+str(episode)+"\n")
+    if message is not None:
+        message("BEGINNING EPISODE: "+str(episode)+"\n")
     while True:
 
         # DISPLAY CURRENT STATE
@@ -353,7 +364,8 @@ def runEpisode(agent, environment, discount, decision, display, message, pause,
         # END IF IN A TERMINAL STATE
         actions = environment.getPossibleActions(state)
         if len(actions) == 0:
-            message("EPISODE "+str(episode)+" COMPLETE: RETURN WAS "+str(returns)+"\n")
+            if message is not None:
+                message("EPISODE "+str(episode)+" COMPLETE: RETURN WAS "+str(returns)+"\n")
             return returns
 
         # GET ACTION (USUALLY FROM AGENT)
@@ -363,10 +375,11 @@ def runEpisode(agent, environment, discount, decision, display, message, pause,
 
         # EXECUTE ACTION
         nextState, reward = environment.doAction(action)
-        message("Started in state: "+str(state)+
-                "\nTook action: "+str(action)+
-                "\nEnded in state: "+str(nextState)+
-                "\nGot reward: "+str(reward)+"\n")
+        if message is not None:
+            message("Started in state: "+str(state)+
+                    "\nTook action: "+str(action)+
+                    "\nEnded in state: "+str(nextState)+
+                    "\nGot reward: "+str(reward)+"\n")
         # UPDATE LEARNER
         if 'observeTransition' in dir(agent):
             agent.observeTransition(state, action, nextState, reward)
@@ -551,7 +564,7 @@ if __name__ == '__main__':
 
     messageCallback = lambda x: printString(x)
     if opts.quiet:
-        messageCallback = lambda x: None
+        messageCallback = None # skips building the messages
 
     # FIGURE OUT WHETHER TO WAIT FOR A KEY PRESS AFTER EACH TIME STEP
     pauseCallback = lambda : None
@@ -14,6 +14,7 @@
 
 from .util import manhattanDistance
 from .game import Grid
+from .game import Actions
 import os
 import random
 from functools import reduce
@@ -37,11 +38,22 @@ class Layout:
         self.processLayoutText(layoutText)
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
+        self.actionTable = None
+        self.name = None  # The name it was loaded with by getLayout, if any
         # self.initializeVisibilityMatrix()
 
     def getNumGhosts(self):
         return self.numGhosts
 
+    def getActionTable(self):
+        """
+        Returns the table of the actions possible at each grid point (see
+        Actions.makeActionTable), built the first time it is needed.
+        """
+        if self.actionTable is None:
+            self.actionTable = Actions.makeActionTable(self.walls)
+        return self.actionTable
+
     def initializeVisibilityMatrix(self):
         global VISIBILITY_MATRIX_CACHE
         if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
@@ -70,18 +82,25 @@ class Layout:
         x, col = pos
         return self.walls[x][col]
 
-    def getRandomLegalPosition(self):
-        x = random.choice(list(range(self.width)))
-        y = random.choice(list(range(self.height)))
+    def getRandomLegalPosition(self, rng=None):
+        """
+        rng is the random.Random to draw from, by default the random module.
+        """
+        if rng is None:
+            rng = random
+        x = rng.choice(list(range(self.width)))
+        y = rng.choice(list(range(self.height)))
         while self.isWall((x, y)):
-            x = random.choice(list(range(self.width)))
-            y = random.choice(list(range(self.height)))
+            x = rng.choice(list(range(self.width)))
+            y = rng.choice(list(range(self.height)))
         return (x, y)
 
-    def getRandomCorner(self):
+    def getRandomCorner(self, rng=None):
+        if rng is None:
+            rng = random
         poses = [(1, 1), (1, self.height - 2), (self.width - 2, 1),
                  (self.width - 2, self.height - 2)]
-        return random.choice(poses)
+        return rng.choice(poses)
 
     def getFurthestCorner(self, pacPos):
         poses = [(1, 1), (1, self.height - 2), (self.width - 2, 1),
@@ -97,7 +116,9 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        layout = Layout(self.layoutText[:])
+        layout.name = self.name
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -151,6 +172,8 @@ def getLayout(name, back=2):
         os.chdir('..')
         layout = getLayout(name, back - 1)
         os.chdir(curdir)
+    if layout != None:
+        layout.name = name
     return layout
 
 
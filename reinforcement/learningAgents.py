@@ -131,6 +131,7 @@ class ReinforcementAgent(ValueEstimationAgent):
             NOTE: Do *not* override or call this function
         """
         self.episodeRewards += deltaReward
+        self.episodeLength += 1
         self.update(state,action,nextState,deltaReward)
 
     def startEpisode(self):
@@ -140,11 +141,15 @@ class ReinforcementAgent(ValueEstimationAgent):
         self.lastState = None
         self.lastAction = None
         self.episodeRewards = 0.0
+        self.episodeLength = 0
+        self.episodeStart = time.time()
 
     def stopEpisode(self):
         """
           Called by environment when episode is done
         """
+        if self.metrics is not None:
+            self.metrics.episode(self, self.episodeLength, time.time() - self.episodeStart)
         if self.episodesSoFar < self.numTraining:
             self.accumTrainRewards += self.episodeRewards
         else:
@@ -161,7 +166,7 @@ class ReinforcementAgent(ValueEstimationAgent):
     def isInTesting(self):
         return not self.isInTraining()
 
-    def __init__(self, actionFn = None, numTraining=100, epsilon=0.5, alpha=0.5, gamma=1):
+    def __init__(self, actionFn = None, numTraining=100, epsilon=0.5, alpha=0.5, gamma=1, metrics=None):
         """
         actionFn: Function which takes a state and returns the list of legal actions
 
@@ -169,6 +174,8 @@ class ReinforcementAgent(ValueEstimationAgent):
         epsilon  - exploration rate
         gamma    - discount factor
         numTraining - number of training episodes, i.e. no learning after these many episodes
+        metrics  - a telemetry.MetricsWriter recording each episode, instead of
+                   printing the training status every 100 episodes
         """
         if actionFn == None:
             actionFn = lambda state: state.getLegalActions()
@@ -180,6 +187,10 @@ class ReinforcementAgent(ValueEstimationAgent):
         self.epsilon = float(epsilon)
         self.alpha = float(alpha)
         self.discount = float(gamma)
+        self.metrics = metrics
+        self.episodeRewards = 0.0
+        self.episodeLength = 0
+        self.episodeStart = time.time()
 
     ################################
     # Controls needed for Crawler  #
@@ -216,7 +227,7 @@ class ReinforcementAgent(ValueEstimationAgent):
 
     def registerInitialState(self, state):
         self.startEpisode()
-        if self.episodesSoFar == 0:
+        if self.episodesSoFar == 0 and self.metrics is None:
             print('Beginning %d episodes of Training' % (self.numTraining))
 
     def final(self, state):
@@ -226,6 +237,8 @@ class ReinforcementAgent(ValueEstimationAgent):
         deltaReward = state.getScore() - self.lastState.getScore()
         self.observeTransition(self.lastState, self.lastAction, state, deltaReward)
         self.stopEpisode()
+        if self.metrics is not None:
+            return # the episode was recorded by stopEpisode
 
         # Make sure we have this var
         if not 'episodeStartTime' in self.__dict__:
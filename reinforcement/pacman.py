@@ -40,18 +40,26 @@ To play your first game, type 'python pacman.py' from the command line.
 The keys are 'a', 's', 'd', and 'w' to move (or arrow keys).  Have fun!
 """
 from .game import GameStateData
+from .game import ReadOnlyGameStateData
 from .game import Game
 from .game import Directions
 from .game import Actions
+from .game import Configuration
+from .learningAgents import ReinforcementAgent
 from .util import nearestPoint
 from .util import manhattanDistance
 from . import util
 from . import layout
+from . import profiling
+from . import telemetry
 import sys
 import types
 import time
 import random
 import os
+import io
+import math
+import array
 
 ###################################################
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
@@ -77,15 +85,42 @@ class GameState:
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
-    explored = set()
+    # Tracks the states which have had successors generated (see
+    # ExploredTracker).  Successors inherit the tracker of their parent, and
+    # new games get defaultTracker, which trackExplored sets.
+    exploredTracker = None
+    defaultTracker = None
+
+    def trackExplored(mode='set', limit=100000):
+        """
+        Enables tracking of the explored states of the games started from now
+        on, which is off by default, with a tracker shared by all of them.
+        Pass mode=None to stop tracking.  Prefer setExploredTracker, which
+        tracks one game.
+
+        Returns the tracker, whose count and explored attributes hold the
+        number of successors generated and the states explored.
+        """
+        GameState.defaultTracker = None if mode is None else ExploredTracker(mode, limit)
+        return GameState.defaultTracker
+    trackExplored = staticmethod(trackExplored)
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
-        return tmp
+        """
+        Returns and clears the states explored by the games tracked by trackExplored.
+        """
+        if GameState.defaultTracker is None:
+            return set()
+        return GameState.defaultTracker.getAndReset()
     getAndResetExplored = staticmethod(getAndResetExplored)
 
+    def setExploredTracker(self, tracker):
+        """
+        Tracks the successors of this state, and of its successors, with an
+        ExploredTracker, or stops tracking them if tracker is None.
+        """
+        self.exploredTracker = tracker
+
     def getLegalActions(self, agentIndex=0):
         """
         Returns the legal actions for the agent specified.
@@ -121,7 +156,8 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
         else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+            state.data.agentStates[agentIndex] = GhostRules.decrementTimer(
+                state.data.agentStates[agentIndex])
 
         # Resolve multi-agent effects
         GhostRules.checkDeath(state, agentIndex)
@@ -129,8 +165,8 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if self.exploredTracker is not None:
+            self.exploredTracker.add(self, state)
         return state
 
     def getLegalPacmanActions(self):
@@ -232,8 +268,17 @@ class GameState:
         """
         if prevState != None:  # Initial state
             self.data = GameStateData(prevState.data)
+            self.exploredTracker = prevState.exploredTracker
         else:
             self.data = GameStateData()
+            self.exploredTracker = GameState.defaultTracker
+
+    def readOnly(self):
+        """
+        Returns a read-only view of the state, which is cheaper than a deep copy
+        for agents that only read the state (see ReadOnlyGameState).
+        """
+        return ReadOnlyGameState(self)
 
     def deepCopy(self):
         state = GameState(self)
@@ -262,6 +307,72 @@ class GameState:
         """
         self.data.initialize(layout, numGhostAgents)
 
+
+class ExploredTracker:
+    """
+    Tracks the states explored by generating successors, for the states it
+    is attached to with GameState.setExploredTracker and their successors.
+
+    mode: 'set' to add the parent and child of every successor generated to
+      explored, until it holds limit states (None for no limit); 'count' to
+      only count the successors generated in count.
+    """
+
+    def __init__(self, mode='set', limit=100000):
+        if mode not in ('set', 'count'):
+            raise Exception('Unknown exploration tracking mode: ' + str(mode))
+        self.mode = mode
+        self.limit = limit
+        self.explored = set()
+        self.count = 0
+
+    def add(self, parent, child):
+        self.count += 1
+        if self.mode == 'set':
+            explored, limit = self.explored, self.limit
+            if limit is None or len(explored) < limit:
+                explored.add(parent)
+            if limit is None or len(explored) < limit:
+                explored.add(child)
+
+    def getAndReset(self):
+        """
+        Returns the explored states, and starts over.
+        """
+        explored = self.explored
+        self.explored = set()
+        self.count = 0
+        return explored
+
+
+class ReadOnlyGameState(GameState):
+    """
+    A read-only view of a GameState, for agents that only read the state.
+
+    The view shares storage with the state it wraps instead of making a
+    deep copy, which is safe because successor states never modify their
+    predecessors.  Any attempt to modify the view raises an error.
+    Successors and deep copies of the view are ordinary GameStates.
+    """
+
+    def __init__(self, state):
+        if isinstance(state, ReadOnlyGameState):
+            state = state._state
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, 'data', ReadOnlyGameStateData(state.data))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute '%s' of a ReadOnlyGameState" % name)
+
+    def generateSuccessor(self, agentIndex, action):
+        return self._state.generateSuccessor(agentIndex, action)
+
+    def getPacmanState(self):
+        return self.data.agentStates[0]
+
+    def deepCopy(self):
+        return self._state.deepCopy()
+
 ############################################################################
 #                     THE HIDDEN SECRETS OF PACMAN                         #
 #                                                                          #
@@ -283,11 +394,13 @@ class ClassicGameRules:
     def __init__(self, timeout=30):
         self.timeout = timeout
 
-    def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False):
+    def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False,
+                watchdog=None, fast=False, timer=None, keyframeInterval=0):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize(layout, len(ghostAgents))
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions, watchdog=watchdog,
+                    fast=fast, timer=timer, keyframeInterval=keyframeInterval)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -348,30 +461,39 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(state.getPacmanState().configuration, state.data.layout.walls)
+        names = Directions.NAMES
+        return [names[code] for code in PacmanRules.getLegalActionCodes(state)]
     getLegalActions = staticmethod(getLegalActions)
 
+    def getLegalActionCodes(state):
+        """
+        Returns a list of possible actions, as direction codes.
+        """
+        layout = state.data.layout
+        return Actions.getPossibleActionCodes(state.data.agentStates[0].configuration, layout.walls,
+                                              layout.getActionTable())
+    getLegalActionCodes = staticmethod(getLegalActionCodes)
+
     def applyAction(state, action):
         """
         Edits the state to reflect the results of the action.
         """
-        legal = PacmanRules.getLegalActions(state)
-        if action not in legal:
+        code = Actions.directionToCode(action)
+        if code not in PacmanRules.getLegalActionCodes(state):
             raise Exception("Illegal action " + str(action))
 
         pacmanState = state.data.agentStates[0]
 
         # Update Configuration
-        vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
-        pacmanState.configuration = pacmanState.configuration.generateSuccessor(
-            vector)
-
-        # Eat
-        next = pacmanState.configuration.getPosition()
-        nearest = nearestPoint(next)
-        if manhattanDistance(nearest, next) <= 0.5:
-            # Remove food
-            PacmanRules.consume(nearest, state)
+        configuration = pacmanState.configuration.move(
+            code, int(2 * PacmanRules.PACMAN_SPEED))
+        state.data.agentStates[0] = pacmanState.replace(configuration=configuration)
+
+        # Eat, unless in between grid points on both axes
+        x2, y2 = configuration.pos2
+        if not (x2 & y2 & 1):
+            # Remove food at the nearest grid point
+            PacmanRules.consume(((x2 + 1) >> 1, (y2 + 1) >> 1), state)
     applyAction = staticmethod(applyAction)
 
     def consume(position, state):
@@ -392,8 +514,9 @@ class PacmanRules:
             state.data.capsules.remove(position)
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
-            for index in range(1, len(state.data.agentStates)):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+            agentStates = state.data.agentStates
+            for index in range(1, len(agentStates)):
+                agentStates[index] = agentStates[index].replace(scaredTimer=SCARED_TIME)
     consume = staticmethod(consume)
 
 
@@ -408,60 +531,74 @@ class GhostRules:
         Ghosts cannot stop, and cannot turn around unless they
         reach a dead end, but can turn 90 degrees at intersections.
         """
-        conf = state.getGhostState(ghostIndex).configuration
-        possibleActions = Actions.getPossibleActions(
-            conf, state.data.layout.walls)
-        reverse = Actions.reverseDirection(conf.direction)
-        if Directions.STOP in possibleActions:
-            possibleActions.remove(Directions.STOP)
+        names = Directions.NAMES
+        return [names[code] for code in GhostRules.getLegalActionCodes(state, ghostIndex)]
+    getLegalActions = staticmethod(getLegalActions)
+
+    def getLegalActionCodes(state, ghostIndex):
+        """
+        Returns the legal actions of a ghost, as direction codes.
+        """
+        conf = state.data.agentStates[ghostIndex].configuration
+        layout = state.data.layout
+        possibleActions = Actions.getPossibleActionCodes(
+            conf, layout.walls, layout.getActionTable())
+        reverse = Directions.REVERSE_CODES[conf.dirCode]
+        if Directions.STOP_CODE in possibleActions:
+            possibleActions.remove(Directions.STOP_CODE)
         if reverse in possibleActions and len(possibleActions) > 1:
             possibleActions.remove(reverse)
         return possibleActions
-    getLegalActions = staticmethod(getLegalActions)
+    getLegalActionCodes = staticmethod(getLegalActionCodes)
 
     def applyAction(state, action, ghostIndex):
 
-        legal = GhostRules.getLegalActions(state, ghostIndex)
-        if action not in legal:
+        code = Actions.directionToCode(action)
+        if code not in GhostRules.getLegalActionCodes(state, ghostIndex):
             raise Exception("Illegal ghost action " + str(action))
 
         ghostState = state.data.agentStates[ghostIndex]
-        speed = GhostRules.GHOST_SPEED
+        speed2 = int(2 * GhostRules.GHOST_SPEED)
         if ghostState.scaredTimer > 0:
-            speed /= 2.0
-        vector = Actions.directionToVector(action, speed)
-        ghostState.configuration = ghostState.configuration.generateSuccessor(
-            vector)
+            speed2 //= 2
+        state.data.agentStates[ghostIndex] = ghostState.replace(
+            configuration=ghostState.configuration.move(code, speed2))
     applyAction = staticmethod(applyAction)
 
     def decrementTimer(ghostState):
+        """
+        Returns the ghost state after time passes.
+        """
         timer = ghostState.scaredTimer
+        if timer == 0:
+            return ghostState
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(
-                ghostState.configuration.pos)
-        ghostState.scaredTimer = max(0, timer - 1)
+            # Snap to the nearest grid point
+            config = ghostState.configuration
+            x2, y2 = config.pos2
+            return ghostState.replace(configuration=Configuration.fromPos2(
+                (x2 + (x2 & 1), y2 + (y2 & 1)), config.dirCode), scaredTimer=0)
+        return ghostState.replace(scaredTimer=timer - 1)
     decrementTimer = staticmethod(decrementTimer)
 
     def checkDeath(state, agentIndex):
-        pacmanPosition = state.getPacmanPosition()
+        pacmanPos2 = state.data.agentStates[0].configuration.pos2
         if agentIndex == 0:  # Pacman just moved; Anyone can kill him
             for index in range(1, len(state.data.agentStates)):
                 ghostState = state.data.agentStates[index]
-                ghostPosition = ghostState.configuration.getPosition()
-                if GhostRules.canKill(pacmanPosition, ghostPosition):
+                if GhostRules.canKill2(pacmanPos2, ghostState.configuration.pos2):
                     GhostRules.collide(state, ghostState, index)
         else:
             ghostState = state.data.agentStates[agentIndex]
-            ghostPosition = ghostState.configuration.getPosition()
-            if GhostRules.canKill(pacmanPosition, ghostPosition):
+            if GhostRules.canKill2(pacmanPos2, ghostState.configuration.pos2):
                 GhostRules.collide(state, ghostState, agentIndex)
     checkDeath = staticmethod(checkDeath)
 
     def collide(state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
             state.data.scoreChange += 200
-            GhostRules.placeGhost(state, ghostState)
-            ghostState.scaredTimer = 0
+            state.data.agentStates[agentIndex] = GhostRules.placeGhost(
+                state, ghostState).replace(scaredTimer=0)
             # Added for first-person
             state.data._eaten[agentIndex] = True
         else:
@@ -474,8 +611,19 @@ class GhostRules:
         return manhattanDistance(ghostPosition, pacmanPosition) <= COLLISION_TOLERANCE
     canKill = staticmethod(canKill)
 
+    def canKill2(pacmanPos2, ghostPos2):
+        """
+        Like canKill, for positions in half cells.
+        """
+        return (abs(ghostPos2[0] - pacmanPos2[0]) + abs(ghostPos2[1] - pacmanPos2[1])
+                <= 2 * COLLISION_TOLERANCE)
+    canKill2 = staticmethod(canKill2)
+
     def placeGhost(state, ghostState):
-        ghostState.configuration = ghostState.start
+        """
+        Returns the ghost state with the ghost back at its start.
+        """
+        return ghostState.replace(configuration=ghostState.start)
     placeGhost = staticmethod(placeGhost)
 
 #############################
@@ -543,7 +691,7 @@ def readCommand(argv):
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recorded game file (pickle or --recordFile) to replay', default=None)
     parser.add_option('-a', '--agentArgs', dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -554,6 +702,35 @@ def readCommand(argv):
                       help='Turns on exception handling and timeouts during games', default=False)
     parser.add_option('--timeout', dest='timeout', type='int',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--watchdog', action='store_true', dest='watchdog',
+                      help='Interrupt agent calls which run out of time (with -c), instead of checking after they return', default=False)
+    parser.add_option('--fast', action='store_true', dest='fast',
+                      help='Give agents read-only views of the state instead of copies, and do not mute them', default=False)
+    parser.add_option('--workers', dest='workers', type='int',
+                      help=default('Number of processes playing the games after training (requires -q or -t)'), default=1)
+    parser.add_option('--seed', dest='seed', type='int',
+                      help='Seed game i with SEED + i, to play the same games with any number of workers', default=None)
+    parser.add_option('--replayStart', dest='replayStart', type='int',
+                      help=default('Replay from move START, counting from the end if negative'), default=0)
+    parser.add_option('--recordFile', dest='recordFile',
+                      help='Appends every game to FILE, in a compact format which --replay reads', default=None)
+    parser.add_option('--profile', dest='profile', metavar='PREFIX',
+                      help='Profile the games, writing the profile to files starting with PREFIX', default=None)
+    parser.add_option('--profiler', dest='profiler', type='choice', choices=profiling.MODES,
+                      help=default('How to profile: cprofile writes PREFIX.pstats, sampling writes PREFIX.collapsed for flame graphs'),
+                      default='cprofile')
+    parser.add_option('--profileEvalOnly', action='store_true', dest='profileEvalOnly',
+                      help='Only profile the games after training', default=False)
+    parser.add_option('--metricsFile', dest='metricsFile', metavar='FILE',
+                      help='Write the return, length, epsilon, alpha and time of each episode of a learning agent to FILE (JSON lines, or CSV if FILE ends in .csv) instead of printing its status', default=None)
+    parser.add_option('--memoryLog', dest='memoryLog', metavar='FILE',
+                      help='Trace allocations, logging the memory retained and the sites which grew after each game to FILE', default=None)
+    parser.add_option('--memoryTop', dest='memoryTop', type='int',
+                      help=default('Number of growing allocation sites to log per game'), default=10)
+    parser.add_option('--statsFile', dest='statsFile',
+                      help='Write the score, outcome, moves and time of each game to a CSV file', default=None)
+    parser.add_option('--keepGames', action='store_true', dest='keepGames',
+                      help='Keep the games played after training in the GameStats returned by runGames', default=False)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -578,6 +755,8 @@ def readCommand(argv):
         args['numTraining'] = options.numTraining
         if 'numTraining' not in agentOpts:
             agentOpts['numTraining'] = options.numTraining
+    if options.metricsFile and issubclass(pacmanType, ReinforcementAgent):
+        agentOpts['metrics'] = telemetry.MetricsWriter(options.metricsFile)
     pacman = pacmanType(**agentOpts)  # Instantiate Pacman with agentArgs
     args['pacman'] = pacman
 
@@ -596,8 +775,7 @@ def readCommand(argv):
         args['display'] = textDisplay.NullGraphics()
     elif options.textGraphics:
         import textDisplay
-        textDisplay.SLEEP_TIME = options.frameTime
-        args['display'] = textDisplay.PacmanGraphics()
+        args['display'] = textDisplay.PacmanGraphics(options.frameTime)
     else:
         import graphicsDisplay
         args['display'] = graphicsDisplay.PacmanGraphics(
@@ -606,18 +784,29 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    if options.watchdog:
+        args['watchdog'] = util.Watchdog()
+    args['fast'] = options.fast
+    if options.workers > 1 and not (options.textGraphics or options.quietGraphics):
+        raise Exception('Playing games in several processes requires -q or -t')
+    args['workers'] = options.workers
+    args['seed'] = options.seed
+    args['statsFile'] = options.statsFile
+    args['keepGames'] = options.keepGames
+    args['recordFile'] = options.recordFile
+    if options.profile:
+        args['profiler'] = profiling.Profiler(options.profile, options.profiler)
+        args['profileTraining'] = not options.profileEvalOnly
+    if options.memoryLog:
+        args['memoryLog'] = profiling.MemoryLog(options.memoryLog, options.memoryTop)
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print('Replaying recorded game %s.' % options.gameToReplay)
-        import pickle
-        f = open(options.gameToReplay)
-        try:
-            recorded = pickle.load(f)
-        finally:
-            f.close()
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+        from . import recording
+        for recorded in recording.loadRecordedGames(options.gameToReplay):
+            recorded['display'] = args['display']
+            replayGame(start=options.replayStart, **recorded)
         sys.exit(0)
 
     return args
@@ -651,19 +840,28 @@ def loadAgent(pacman, nographics):
                     ' is not specified in any *Agents.py.')
 
 
-def replayGame(layout, actions, display):
+def replayGame(layout, actions, display, start=0, numAgents=None, keyframes=None):
+    """
+    Shows a recorded game from move start on, counting from the end if it
+    is negative.  keyframes are states of the game (see recording.Replay)
+    from which to find the state at move start.
+    """
     from . import pacmanAgents
     from . import ghostAgents
+    from .recording import Replay
+    if numAgents is None:
+        numAgents = layout.getNumGhosts() + 1
     rules = ClassicGameRules()
     agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1)
-                                             for i in range(layout.getNumGhosts())]
+                                             for i in range(numAgents - 1)]
     game = rules.newGame(layout, agents[0], agents[1:], display)
-    state = game.state
+    replay = Replay(layout, actions, numAgents, keyframes)
+    state = replay.seek(start)
     display.initialize(state.data)
 
-    for action in actions:
+    while replay.position < len(replay):
             # Execute the action
-        state = state.generateSuccessor(*action)
+        state = replay.step()
         # Change the display
         display.update(state.data)
         # Allow for game specific conditions (winning, losing, etc.)
@@ -672,51 +870,308 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
-    import __main__
-    __main__.__dict__['_display'] = display
-
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30,
+             watchdog=None, fast=False, seed=None, workers=1, keepGames=False, statsFile=None,
+             recordFile=None, timer=None, profiler=None, profileTraining=True, memoryLog=None):
+    """
+    Plays numGames games, the first numTraining of which are training games
+    played quietly, and prints a summary of the others.  Returns the
+    GameStats of the games after training, which keep the games themselves
+    only with keepGames.  With statsFile, a CSV row per game is written to
+    that file as the games are played.  With recordFile, every game is
+    appended to that file (see recording.RecordingWriter).  With a
+    util.PhaseTimes as timer, the time spent in each phase of the games
+    played in this process is added to it (see Game).  A
+    profiling.Profiler profiles the games played in this process, only
+    those after training unless profileTraining, and is saved at the end.
+    A profiling.MemoryLog logs the memory retained after each game.
+
+    seed: seeds the random module with seed + i before game i, so that each
+      game can be replayed on its own.
+    workers: the number of processes playing the games after the training
+      games, which are always played here.  The workers are forked (see
+      playGamesInPool), and each plays with its own copy of the agents and
+      the display.  The games are seeded as with seed, drawn from the random
+      module if it is None.  What the games print is collected and printed
+      in order, so the output is the same as when playing with the same seed
+      in one process, as long as the agents do not learn or count episodes
+      after training: the status that learning agents print is counted by
+      each worker's copy of the agent, from the end of training.  The
+      metrics rows of the agents are sent back and written here, numbered by
+      game (see telemetry.bufferMetrics).  The games are then kept as
+      GameResults.
+    """
     rules = ClassicGameRules(timeout)
-    games = []
-
-    for i in range(numGames):
+    rows = open(statsFile, 'w') if statsFile else None
+    stats = GameStats(rows, keepGames)
+    recorder = None
+    keyframeInterval = 0
+    if recordFile:
+        from .recording import RecordingWriter
+        recorder = RecordingWriter(recordFile)
+        keyframeInterval = recorder.keyframeInterval
+    if workers > 1 and seed is None:
+        seed = random.randrange(2 ** 32)
+
+    numSerialGames = numGames if workers <= 1 else min(numTraining, numGames)
+    if memoryLog is not None:
+        memoryLog.start()
+    if profiler is not None and (profileTraining or numTraining == 0):
+        profiler.start()
+    for i in range(numSerialGames):
+        if profiler is not None and i == numTraining:
+            profiler.start()
+        if seed is not None:
+            random.seed(seed + i)
         beQuiet = i < numTraining
         if beQuiet:
                 # Suppress output and graphics
-            import textDisplay
+            from . import textDisplay
             gameDisplay = textDisplay.NullGraphics()
             rules.quiet = True
         else:
             gameDisplay = display
             rules.quiet = False
-        game = rules.newGame(layout, pacman, ghosts,
-                             gameDisplay, beQuiet, catchExceptions)
+        game = rules.newGame(layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions,
+                             watchdog, fast, timer, keyframeInterval)
+        startTime = time.time()
         game.run()
         if not beQuiet:
-            games.append(game)
+            stats.add(game, time.time() - startTime)
 
         if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
-
-    if (numGames-numTraining) > 0:
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        print('Average Score:', sum(scores) / float(len(scores)))
-        print('Scores:       ', ', '.join([str(score) for score in scores]))
+            recordGame(layout, game.moveHistory, i)
+        if recorder is not None:
+            recorder.writeGame(game, layout, None if seed is None else seed + i)
+        if memoryLog is not None:
+            memoryLog.episode('game %d' % (i + 1))
+
+    if numSerialGames < numGames:
+        if profiler is not None:
+            profiler.start()
+        gameArgs = (layout, pacman, ghosts, display, catchExceptions, timeout, watchdog is not None, fast,
+                    keyframeInterval)
+        seeds = [seed + i for i in range(numSerialGames, numGames)]
+        for i, result in enumerate(playGamesInPool(workers, gameArgs, seeds), numSerialGames):
+            sys.stdout.write(result.output)
+            telemetry.writeBufferedRows([pacman] + ghosts, result.metrics, i + 1)
+            stats.add(result, result.time)
+            if record:
+                recordGame(layout, result.moveHistory, i)
+            if recorder is not None:
+                recorder.writeGame(result, layout, seed + i)
+            if memoryLog is not None:
+                memoryLog.episode('game %d' % (i + 1))
+
+    if rows is not None:
+        rows.close()
+    if recorder is not None:
+        recorder.close()
+    if profiler is not None:
+        print('Profile written to', profiler.save(), file=sys.stderr)
+    if memoryLog is not None:
+        memoryLog.close()
+    if stats.count > 0:
+        stats.printSummary()
+
+    return stats
+
+
+def recordGame(layout, moveHistory, i):
+    """
+    Saves the moves of game i to a file named by the time it was played,
+    which can be replayed with --replay.
+    """
+    import pickle
+    fname = ('recorded-game-%d' % (i + 1)) + \
+        '-'.join([str(t) for t in time.localtime()[1:6]])
+    with open(fname, 'wb') as f:
+        components = {'layout': layout, 'actions': moveHistory}
+        pickle.dump(components, f)
+
+
+class GameResult:
+    """
+    What is kept of a game played in a worker process: the final state,
+    the moves and keyframes, the time the game took, what it printed and
+    the metrics rows of the agents, as {agentIndex: rows}.
+    """
+
+    def __init__(self, game, time, output='', metrics=None):
+        self.state = game.state
+        self.moveHistory = game.moveHistory
+        self.keyframes = game.keyframes
+        self.agentCrashed = game.agentCrashed
+        self.agentTimeout = game.agentTimeout
+        self.time = time
+        self.output = output
+        self.metrics = metrics or {}
+
+    def getScore(self):
+        return self.state.getScore()
+
+    def isWin(self):
+        return self.state.isWin()
+
+    def getNumMoves(self):
+        return len(self.moveHistory)
+
+
+class GameStats:
+    """
+    Aggregates the results of games as they are added, in constant memory:
+    a running total, mean and variance of the scores, counts of wins,
+    timeouts and crashes, and a uniform sample of at most sampleSize scores
+    (reservoir sampling) for the quantiles, which are exact until more games
+    than that have been added.
+
+    rows: a file to write a CSV row to for each game.
+    keepGames: also keep the games (or GameResults) in games.
+    keepScores: also keep the score and outcome of every game, in the
+      compact arrays scores and outcomes, for the summary to list them.
+      Implied by rows or keepGames.
+    """
+
+    def __init__(self, rows=None, keepGames=False, keepScores=False, sampleSize=10000):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.wins = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.sampleSize = sampleSize
+        self._sample = array.array('d')
+        self._rng = random.Random(0) # not the random module, which seeds the games
+        keepScores = keepScores or keepGames or rows is not None
+        self.scores = array.array('d') if keepScores else None
+        self.outcomes = bytearray() if keepScores else None
+        self.games = [] if keepGames else None
+        self.rows = rows
+        if rows is not None:
+            rows.write('game,score,win,moves,time\n')
+
+    def add(self, game, time=0.0):
+        """
+        Adds the result of a Game or GameResult, which took time seconds.
+        """
+        score = game.state.getScore()
+        win = game.state.isWin()
+        self.count += 1
+        self.total += score
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (score - self.mean)
+        self.wins += win
+        self.timeouts += game.agentTimeout
+        self.crashes += game.agentCrashed
+        if len(self._sample) < self.sampleSize:
+            self._sample.append(score)
+        else:
+            i = self._rng.randrange(self.count)
+            if i < self.sampleSize:
+                self._sample[i] = score
+        if self.scores is not None:
+            self.scores.append(score)
+            self.outcomes.append(win)
+        if self.rows is not None:
+            self.rows.write('%d,%s,%d,%d,%.6f\n' % (self.count, score, win, len(game.moveHistory), time))
+        if self.games is not None:
+            self.games.append(game)
+
+    def variance(self, sample=True):
+        """
+        Variance of the scores: the sample variance, or the population
+        variance if not sample.
+        """
+        if not sample:
+            return self._m2 / self.count if self.count else 0.0
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    def stdDev(self):
+        return math.sqrt(self.variance())
+
+    def winRate(self):
+        return self.wins / float(self.count)
+
+    def quantile(self, q):
+        """
+        The q-quantile of the scores, 0 <= q <= 1, interpolating linearly
+        between scores.  Estimated from the sample of the scores once more
+        than sampleSize games have been added.
+        """
+        scores = sorted(self._sample)
+        position = q * (len(scores) - 1)
+        i = int(position)
+        if i + 1 == len(scores):
+            return scores[i]
+        return scores[i] + (scores[i + 1] - scores[i]) * (position - i)
+
+    def printSummary(self):
+        print('Average Score:', self.total / float(self.count))
+        if self.scores is not None:
+            print('Scores:       ', ', '.join([str(score) for score in self.scores]))
         print('Win Rate:      %d/%d (%.2f)' %
-              (wins.count(True), len(wins), winRate))
-        print('Record:       ', ', '.join(
-            [['Loss', 'Win'][int(w)] for w in wins]))
+              (self.wins, self.count, self.winRate()))
+        if self.outcomes is not None:
+            print('Record:       ', ', '.join(
+                [['Loss', 'Win'][w] for w in self.outcomes]))
+
 
-    return games
+def playGamesInPool(workers, gameArgs, seeds, initializer=None, playGame=None):
+    """
+    Plays one game per seed in a pool of worker processes, and yields the
+    GameResults in the order of the seeds as they come in.
+
+    gameArgs are passed once to initializer in each worker, and each seed
+    to playGame, which returns a GameResult.  By default the games are
+    played by ClassicGameRules with the gameArgs of runGames.
+
+    The workers are forked, so that they inherit the gameArgs, e.g. trained
+    agents holding closures, instead of unpickling them; platforms without
+    fork (Windows) can only play games in one process.
+    """
+    import multiprocessing
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise Exception('Playing games in several processes requires the fork start method, '
+                        'which this platform does not have')
+    chunksize = max(1, len(seeds) // (workers * 16))
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers, initializer or _initWorker, gameArgs) as pool:
+        for result in pool.imap(playGame or _playGame, seeds, chunksize):
+            yield result
+
+
+_workerGameArgs = None
+
+
+def _initWorker(layout, pacman, ghosts, display, catchExceptions, timeout, useWatchdog, fast,
+                keyframeInterval):
+    global _workerGameArgs
+    watchdog = util.Watchdog() if useWatchdog else None
+    metrics = telemetry.bufferMetrics([pacman] + ghosts)
+    _workerGameArgs = (layout, pacman, ghosts, display, catchExceptions, timeout, watchdog, fast,
+                       keyframeInterval, metrics)
+
+
+def _playGame(seed):
+    (layout, pacman, ghosts, display, catchExceptions, timeout, watchdog, fast, keyframeInterval,
+     metrics) = _workerGameArgs
+    random.seed(seed)
+    output = io.StringIO()
+    proxies = util.redirectOutput(output, stderr=False)
+    try:
+        startTime = time.time()
+        rules = ClassicGameRules(timeout)
+        rules.quiet = False
+        game = rules.newGame(layout, pacman, ghosts, display, False, catchExceptions, watchdog, fast,
+                             keyframeInterval=keyframeInterval)
+        game.run()
+    finally:
+        util.restoreOutput(proxies)
+    return GameResult(game, time.time() - startTime, output.getvalue(), telemetry.takeBufferedRows(metrics))
 
 
 if __name__ == '__main__':
@@ -731,8 +1186,5 @@ if __name__ == '__main__':
     > python pacman.py --help
     """
     args = readCommand(sys.argv[1:])  # Get game components based on input
-    runGames(**args)
-
-    # import cProfile
-    # cProfile.run("runGames( **args )")
+    runGames(**args)  # --profile to profile the games
     pass
@@ -0,0 +1,208 @@
+# profiling.py
+# ------------
+
+"""
+Profiling for the command line programs, which take
+
+  --profile PREFIX      profile the run, writing to files starting with PREFIX
+  --profiler MODE       'cprofile' (the default) or 'sampling'
+
+'cprofile' profiles every function call with cProfile and writes
+PREFIX.pstats, which pstats, snakeviz and gprof2dot read.  'sampling'
+samples the stack of the profiled thread every few milliseconds instead,
+which slows the program down much less, and writes PREFIX.collapsed: one
+line per stack, the frames separated by semicolons and followed by the
+number of samples, as read by flamegraph.pl, speedscope or inferno.
+
+They also take
+
+  --memoryLog FILE      log the memory retained after each game or episode
+
+which traces allocations with tracemalloc (see MemoryLog).
+"""
+
+import collections
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+
+MODES = ('cprofile', 'sampling')
+
+
+class Profiler:
+    """
+    Profiles the thread which calls start() until it calls stop(), and
+    writes the profile with save().  Profiling can be started and stopped
+    several times, e.g. around the evaluation games only, and the profiles
+    add up.
+    """
+
+    def __init__(self, prefix, mode='cprofile', interval=0.005):
+        if mode not in MODES:
+            raise Exception('Unknown profiler: ' + mode)
+        self.prefix = prefix
+        self.mode = mode
+        self.interval = interval
+        self.running = False
+        if mode == 'cprofile':
+            import cProfile
+            self.profile = cProfile.Profile()
+        else:
+            self.stacks = collections.Counter()
+            self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        if self.mode == 'cprofile':
+            self.profile.enable()
+        else:
+            self._stopSampling = threading.Event()
+            self.thread = threading.Thread(target=self._sample, args=(threading.get_ident(),),
+                                           daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self.mode == 'cprofile':
+            self.profile.disable()
+        else:
+            self._stopSampling.set()
+            self.thread.join()
+
+    def save(self):
+        """
+        Stops profiling and writes the profile.  Returns the path written.
+        """
+        self.stop()
+        if self.mode == 'cprofile':
+            path = self.prefix + '.pstats'
+            self.profile.dump_stats(path)
+        else:
+            path = self.prefix + '.collapsed'
+            with open(path, 'w') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write('%s %d\n' % (stack, count))
+        return path
+
+    def _sample(self, ident):
+        while not self._stopSampling.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename),
+                                              code.co_firstlineno))
+                frame = frame.f_back
+            frames.reverse()  # root first
+            self.stacks[';'.join(frames)] += 1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *excinfo):
+        path = self.save()
+        print('Profile written to', path, file=sys.stderr)
+
+
+class MemoryLog:
+    """
+    Traces allocations with tracemalloc and, at the end of each episode
+    (a game or a gridworld episode), writes to a log file the bytes still
+    allocated and the allocation sites which grew most since the previous
+    episode.  Sites that keep growing episode after episode are leaks:
+
+      episode 12: 1834208 bytes retained (+20816), 20931 blocks, peak 2101744
+           +18432 B     +96 blocks  reinforcement/pacman.py:241
+      ...
+
+    Garbage is collected before each snapshot, so only memory that is still
+    reachable is reported.  Tracing slows the program down several times.
+    """
+
+    def __init__(self, path, top=10, frames=1):
+        self.path = path
+        self.top = top
+        self.frames = frames
+        self.episodes = 0
+        self.snapshot = None
+        self.out = None
+        self.startedTracing = False
+
+    def start(self):
+        if self.out is not None:
+            return
+        self.out = open(self.path, 'w')
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.startedTracing = True
+        self._takeSnapshot().compare_to(self._takeSnapshot(), 'lineno') # fills the caches they use
+        self.snapshot = self._takeSnapshot()
+        self.retained = self._size(self.snapshot)
+        self.out.write('start: %d bytes retained\n' % self.retained)
+        self.out.flush()
+
+    def episode(self, label=None):
+        """
+        Snapshots the memory at the end of an episode and logs its growth.
+        """
+        self.start()
+        self.episodes += 1
+        peak = tracemalloc.get_traced_memory()[1]
+        snapshot = self._takeSnapshot()
+        stats = snapshot.compare_to(self.snapshot, 'traceback' if self.frames > 1 else 'lineno')
+        retained = self._size(snapshot)
+        blocks = len(snapshot.traces)
+        self.out.write('%s: %d bytes retained (%+d), %d blocks, peak %d\n' % (
+            label or 'episode %d' % self.episodes, retained, retained - self.retained, blocks, peak))
+        growing = [stat for stat in stats if stat.size_diff > 0][:self.top]
+        for stat in growing:
+            frames = list(stat.traceback)[::-1] # most recent first
+            self.out.write('  %+10d B %+7d blocks  %s\n' % (
+                stat.size_diff, stat.count_diff, self._site(frames[0])))
+            for frame in frames[1:]:
+                self.out.write('  %28s%s\n' % ('', self._site(frame)))
+        self.out.flush()
+        self.snapshot = snapshot
+        self.retained = retained
+        tracemalloc.reset_peak()
+
+    def close(self):
+        if self.out is None:
+            return
+        self.out.close()
+        self.out = None
+        self.snapshot = None
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+
+    def _takeSnapshot(self):
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def _size(self, snapshot):
+        return sum(trace.size for trace in snapshot.traces)
+
+    def _site(self, frame):
+        return '%s:%d' % (os.path.relpath(frame.filename) if os.path.isabs(frame.filename)
+                          else frame.filename, frame.lineno)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
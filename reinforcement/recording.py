@@ -0,0 +1,375 @@
+# recording.py
+# ------------
+
+"""
+A compact binary format for recorded games, which keeps many games in one
+append-only file.
+
+The file starts with MAGIC, followed by one record per game:
+
+  u32     length of the rest of the record
+  u8      flags: HAS_SEED, WIN, LOSE, HAS_LAYOUT_TEXT, HAS_KEYFRAMES
+  20s     SHA-1 of the layout text
+  f64     final score
+  i64     seed of the game (0 without HAS_SEED)
+  u8      number of agents
+  u16     length of the layout name, then the name in UTF-8
+  u32     length of the layout text, then the text (with HAS_LAYOUT_TEXT)
+  u32     number of moves, then one byte per move (see game.MoveHistory)
+  u32     number of keyframes (with HAS_KEYFRAMES), then for each one
+          u32 move index, u32 length and the state (see encodeState)
+
+Integers are little-endian.  Layouts are referenced by the name given to
+layout.getLayout and checked against the hash when the game is read, so a
+record costs a few dozen bytes plus one byte per move, and about a hundred
+bytes per keyframe.  Layouts which were not loaded by name are stored in
+full.  A record cut short, e.g. by a crash while writing, ends the file
+for the reader.
+
+Keyframes are the states of the game every KEYFRAME_INTERVAL moves, from
+which a Replay can seek to any move without replaying the moves before.
+"""
+
+import bisect
+import hashlib
+import pickle
+import struct
+
+from . import layout as layoutModule
+from .game import MoveHistory, Configuration, AgentState, Directions, reconstituteGrid
+
+MAGIC = b'PACREC\x02'
+_ACTIONS = Directions.NAMES
+
+HAS_SEED = 1
+WIN = 2
+LOSE = 4
+HAS_LAYOUT_TEXT = 8
+HAS_KEYFRAMES = 16
+
+KEYFRAME_INTERVAL = 256
+
+_LENGTH = struct.Struct('<I')
+_HEADER = struct.Struct('<B20sdqB')
+_NAME_LENGTH = struct.Struct('<H')
+_STATE = struct.Struct('<dBBBH')
+_AGENT = struct.Struct('<hhBhhBBHHH')
+_CAPSULE = struct.Struct('<HH')
+
+
+def layoutHash(layout):
+    "The SHA-1 digest of the text of a layout"
+    return hashlib.sha1('\n'.join(layout.layoutText).encode()).digest()
+
+
+def encodeState(state):
+    """
+    Encodes everything about a GameState but its layout in a few dozen
+    bytes: the score and outcome, the agent states, the capsules and the
+    food, as packed by Grid.packBits.
+    """
+    data = state.data
+    food = data.food.packBits()
+    parts = [_STATE.pack(data.score, data._win | data._lose << 1, len(data.agentStates),
+                         len(data.capsules), len(food))]
+    for agentState in data.agentStates:
+        start, config = agentState.start, agentState.configuration
+        parts.append(_AGENT.pack(start.pos2[0], start.pos2[1], start.dirCode,
+                                 config.pos2[0], config.pos2[1], config.dirCode,
+                                 agentState.isPacman, agentState.scaredTimer,
+                                 agentState.numCarrying, agentState.numReturned))
+    parts += [_CAPSULE.pack(x, y) for x, y in data.capsules]
+    parts.append(struct.pack('<%dI' % len(food), *food))
+    return b''.join(parts)
+
+
+def decodeState(encoded, layout):
+    """
+    Makes the GameState encoded by encodeState, played on layout.
+    """
+    from .pacman import GameState
+    score, outcome, numAgents, numCapsules, foodLength = _STATE.unpack_from(encoded)
+    offset = _STATE.size
+    agentStates = []
+    for i in range(numAgents):
+        (startX, startY, startDir, x, y, dirCode, isPacman, scaredTimer,
+         numCarrying, numReturned) = _AGENT.unpack_from(encoded, offset)
+        offset += _AGENT.size
+        agentState = AgentState(Configuration.fromPos2((startX, startY), startDir), bool(isPacman))
+        agentStates.append(agentState.replace(Configuration.fromPos2((x, y), dirCode),
+                                              scaredTimer, numCarrying, numReturned))
+    capsules = []
+    for i in range(numCapsules):
+        capsules.append(_CAPSULE.unpack_from(encoded, offset))
+        offset += _CAPSULE.size
+    food = struct.unpack_from('<%dI' % foodLength, encoded, offset)
+
+    state = GameState()
+    data = state.data
+    data.layout = layout
+    data.score = score
+    data._win = bool(outcome & 1)
+    data._lose = bool(outcome & 2)
+    data.agentStates = agentStates
+    data.capsules = capsules
+    data.food = reconstituteGrid(food)
+    data._eaten = [False for a in agentStates]
+    return state
+
+
+class Replay:
+    """
+    Random access to the states of a recorded game.  seek(k) returns the
+    state after the first k moves, by replaying the moves from the nearest
+    keyframe before move k (or from the current state, if it is nearer).
+
+    keyframes: the states after some moves, as a dict from the number of
+      moves to a GameState or its encoding (decoded when first needed).
+      The initial state is always a keyframe.
+    keyframeInterval: while replaying, the states after every
+      keyframeInterval moves are kept as keyframes, so seeking back costs
+      at most that many moves.  0 keeps no new keyframes.
+    """
+
+    def __init__(self, layout, moves, numAgents=None, keyframes=None,
+                 keyframeInterval=KEYFRAME_INTERVAL):
+        from .pacman import GameState
+        if not isinstance(moves, MoveHistory):
+            moves = MoveHistory(moves)
+        self.layout = layout
+        self.moves = moves
+        self.keyframeInterval = keyframeInterval
+        initialState = GameState()
+        numGhosts = layout.getNumGhosts() if numAgents is None else numAgents - 1
+        initialState.initialize(layout, numGhosts)
+        self.keyframes = dict(keyframes or {})
+        self.keyframes[0] = initialState
+        self._keyframeIndices = sorted(self.keyframes)
+        self.position = 0
+        self.state = initialState
+
+    def __len__(self):
+        return len(self.moves)
+
+    def seek(self, k):
+        """
+        Moves to the state after the first k moves, counting from the end
+        if k is negative, and returns it.
+        """
+        if k < 0:
+            k += len(self.moves)
+        k = max(0, min(k, len(self.moves)))
+        i = self._keyframeIndices[bisect.bisect_right(self._keyframeIndices, k) - 1]
+        if not i <= self.position <= k:
+            self.position, self.state = i, self._keyframe(i)
+        moves = self.moves.data
+        while self.position < k:
+            move = moves[self.position]
+            self.state = self.state.generateSuccessor(move >> 3, _ACTIONS[move & 7])
+            self.position += 1
+            if self.keyframeInterval and self.position % self.keyframeInterval == 0:
+                self._addKeyframe(self.position, self.state)
+        return self.state
+
+    def step(self):
+        "Moves one move forward"
+        return self.seek(self.position + 1)
+
+    def back(self):
+        "Moves one move back"
+        return self.seek(self.position - 1)
+
+    def end(self):
+        "Moves to the final state"
+        return self.seek(len(self.moves))
+
+    def _keyframe(self, i):
+        state = self.keyframes[i]
+        if isinstance(state, bytes):
+            state = self.keyframes[i] = decodeState(state, self.layout)
+        return state
+
+    def _addKeyframe(self, i, state):
+        if i not in self.keyframes:
+            self.keyframes[i] = state
+            bisect.insort(self._keyframeIndices, i)
+
+
+class Recording:
+    """
+    A recorded game: the layout it was played on, its moves as a
+    MoveHistory, its seed (or None), final score and outcome, number of
+    agents and keyframes (see Replay).
+    """
+
+    def __init__(self, layoutName, layoutHash, moves, seed=None, score=0.0, win=False, lose=False,
+                 layoutText=None, numAgents=None, keyframes=None):
+        self.layoutName = layoutName
+        self.layoutHash = layoutHash
+        self.moves = moves
+        self.seed = seed
+        self.score = score
+        self.win = win
+        self.lose = lose
+        self.layoutText = layoutText
+        self.numAgents = numAgents
+        self.keyframes = keyframes or {}
+
+    def replay(self):
+        "Returns a Replay of the game"
+        return Replay(self.getLayout(), self.moves, self.numAgents, self.keyframes)
+
+    def getLayout(self):
+        """
+        Loads the layout of the game, and checks that it is the one the
+        game was played on.
+        """
+        if self.layoutText is not None:
+            layout = layoutModule.Layout(self.layoutText)
+        else:
+            layout = layoutModule.getLayout(self.layoutName)
+            if layout is None:
+                raise Exception("The layout " + self.layoutName + " cannot be found")
+        if layoutHash(layout) != self.layoutHash:
+            raise Exception("The layout " + str(self.layoutName) + " is not the one the game was recorded on")
+        return layout
+
+
+class RecordingWriter:
+    """
+    Appends recorded games to a file, creating it if needed.  Records are
+    written as games end, so a file can be read while games are still
+    being added to it.
+
+    keyframeInterval: the interval at which the games written should keep
+      keyframes while they are played (see Game), e.g. to pass to
+      ClassicGameRules.newGame.  The writer stores the keyframes a game kept.
+    """
+
+    def __init__(self, path, keyframeInterval=KEYFRAME_INTERVAL):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.keyframeInterval = keyframeInterval
+        self._layoutRefs = {}
+
+    def write(self, layout, moves, seed=None, score=0.0, win=False, lose=False, numAgents=None,
+              keyframes=()):
+        """
+        Appends a game.  moves are a MoveHistory or (agentIndex, action)
+        pairs.  numAgents defaults to all the agents of the layout.
+        keyframes are (number of moves, GameState) pairs, kept while the
+        game was played.
+        """
+        if not isinstance(moves, MoveHistory):
+            moves = MoveHistory(moves)
+        if numAgents is None:
+            numAgents = layout.getNumGhosts() + 1
+        name, digest, text = self._layoutRef(layout)
+        keyframes = [(i, encodeState(state)) for i, state in keyframes if 0 < i <= len(moves)]
+        flags = ((HAS_SEED if seed is not None else 0) | (WIN if win else 0) |
+                 (LOSE if lose else 0) | (HAS_LAYOUT_TEXT if text is not None else 0) |
+                 (HAS_KEYFRAMES if keyframes else 0))
+        parts = [_HEADER.pack(flags, digest, score, seed or 0, numAgents),
+                 _NAME_LENGTH.pack(len(name)), name]
+        if text is not None:
+            parts += [_LENGTH.pack(len(text)), text]
+        parts += [_LENGTH.pack(len(moves)), bytes(moves.data)]
+        if keyframes:
+            parts.append(_LENGTH.pack(len(keyframes)))
+            for i, encoded in keyframes:
+                parts += [_LENGTH.pack(i), _LENGTH.pack(len(encoded)), encoded]
+        record = b''.join(parts)
+        self.file.write(_LENGTH.pack(len(record)) + record)
+        self.file.flush()
+
+    def writeGame(self, game, layout, seed=None):
+        "Appends a Game or GameResult played on layout, with the keyframes it kept"
+        state = game.state
+        self.write(layout, game.moveHistory, seed, state.getScore(), state.isWin(), state.isLose(),
+                   state.getNumAgents(), game.keyframes)
+
+    def _layoutRef(self, layout):
+        ref = self._layoutRefs.get(id(layout))
+        if ref is None or ref[0] is not layout:
+            name = getattr(layout, 'name', None)
+            text = None if name is not None else '\n'.join(layout.layoutText).encode()
+            ref = (layout, (name or '').encode(), layoutHash(layout), text)
+            self._layoutRefs[id(layout)] = ref
+        return ref[1:]
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
+
+
+def readRecordings(path):
+    """
+    Yields the Recordings in a file written by RecordingWriter.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise Exception(path + " is not a recorded games file")
+        while True:
+            length = f.read(_LENGTH.size)
+            if len(length) < _LENGTH.size:
+                return
+            record = f.read(_LENGTH.unpack(length)[0])
+            if len(record) < _LENGTH.unpack(length)[0]:
+                return
+            yield _parseRecord(record)
+
+
+def _parseRecord(record):
+    flags, digest, score, seed, numAgents = _HEADER.unpack_from(record)
+    offset = _HEADER.size
+    nameLength, = _NAME_LENGTH.unpack_from(record, offset)
+    offset += _NAME_LENGTH.size
+    name = record[offset:offset + nameLength].decode() or None
+    offset += nameLength
+    text = None
+    if flags & HAS_LAYOUT_TEXT:
+        textLength, = _LENGTH.unpack_from(record, offset)
+        offset += _LENGTH.size
+        text = record[offset:offset + textLength].decode().split('\n')
+        offset += textLength
+    numMoves, = _LENGTH.unpack_from(record, offset)
+    offset += _LENGTH.size
+    moves = MoveHistory()
+    moves.data = bytearray(record[offset:offset + numMoves])
+    offset += numMoves
+    keyframes = {}
+    if flags & HAS_KEYFRAMES:
+        numKeyframes, = _LENGTH.unpack_from(record, offset)
+        offset += _LENGTH.size
+        for k in range(numKeyframes):
+            i, length = struct.unpack_from('<II', record, offset)
+            offset += 8
+            keyframes[i] = record[offset:offset + length]
+            offset += length
+    return Recording(name, digest, moves, seed if flags & HAS_SEED else None, score,
+                     bool(flags & WIN), bool(flags & LOSE), text, numAgents, keyframes)
+
+
+def isRecordingFile(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def loadRecordedGames(path):
+    """
+    Returns the games recorded in a file as a list of dicts with the
+    arguments of pacman.replayGame for each game.  Reads both recording
+    files and the pickles of a single game written by pacman.recordGame.
+    """
+    if isRecordingFile(path):
+        return [{'layout': recording.getLayout(), 'actions': recording.moves,
+                 'numAgents': recording.numAgents, 'keyframes': recording.keyframes}
+                for recording in readRecordings(path)]
+    with open(path, 'rb') as f:
+        return [pickle.load(f)]
@@ -0,0 +1,158 @@
+# telemetry.py
+# ------------
+
+"""
+Structured training metrics.  A learning agent given a MetricsWriter (the
+metrics argument of ReinforcementAgent) records one row per episode instead
+of printing its status: the episode number, whether it was a training
+episode, the return, the number of transitions, epsilon and alpha during the
+episode and its wall time in seconds.
+
+Rows are put on a bounded queue and written by a background thread, so
+recording never blocks the learner on file output.  If the writer falls
+behind and the queue fills up, rows are dropped and counted in `dropped`.
+The file is JSON lines, or CSV if its name ends in .csv.  Writers still
+open when the program exits are closed then, so no rows are lost.
+
+Agents playing games in worker processes record their rows in a
+MetricsBuffer instead (see bufferMetrics), and the rows are sent back with
+the results of the games, to be written by the writer in the main process.
+"""
+
+import atexit
+import csv
+import json
+import queue
+import sys
+import threading
+
+FIELDS = ('episode', 'training', 'return', 'length', 'epsilon', 'alpha', 'time')
+
+
+class MetricsWriter:
+
+    def __init__(self, path, maxQueue=10000):
+        self.path = path
+        self.csv = path.endswith('.csv')
+        self.dropped = 0
+        self.queue = queue.Queue(maxQueue)
+        self.out = open(path, 'w', newline='' if self.csv else None)
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def emit(self, **row):
+        """
+        Queues a row, whose keys are among FIELDS, without waiting.
+        """
+        if self.queue is None:
+            return
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def episode(self, agent, length, time):
+        """
+        Queues the row of the episode a ReinforcementAgent just finished.
+        """
+        self.emit(**dict(zip(FIELDS, (agent.episodesSoFar + 1, agent.isInTraining(), agent.episodeRewards,
+                                      length, agent.epsilon, agent.alpha, time))))
+
+    def close(self):
+        """
+        Writes the queued rows and closes the file.
+        """
+        if self.queue is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.queue = None
+        self.out.close()
+        if self.dropped:
+            print('%d metrics rows dropped from %s' % (self.dropped, self.path), file=sys.stderr)
+
+    def _write(self):
+        if self.csv:
+            writer = csv.DictWriter(self.out, FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            write = lambda row: self.out.write(json.dumps(row) + '\n')
+        while True:
+            row = self.queue.get()
+            if row is None:
+                break
+            write(row)
+            if self.queue.empty():
+                self.out.flush()
+
+    def __getstate__(self):
+        # Copies sent to other processes drop their rows: worker pools
+        # replace the writer with a MetricsBuffer (see bufferMetrics)
+        return {'path': self.path, 'csv': self.csv, 'dropped': 0, 'queue': None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excinfo):
+        self.close()
+
+
+class MetricsBuffer(MetricsWriter):
+    """
+    Keeps the rows of a MetricsWriter in a list, e.g. in a worker process
+    whose rows are written by the writer of the main process.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = []
+
+    def emit(self, **row):
+        self.rows.append(row)
+
+    def takeRows(self):
+        "Returns the rows kept so far, and starts over"
+        rows = self.rows
+        self.rows = []
+        return rows
+
+    def close(self):
+        pass
+
+
+def bufferMetrics(agents):
+    """
+    Replaces the MetricsWriters of agents with MetricsBuffers, in a worker
+    process whose writers are copies of those of the main process, which
+    no thread is writing.  Returns {agentIndex: buffer}.
+    """
+    buffers = {}
+    for agentIndex, agent in enumerate(agents):
+        metrics = getattr(agent, 'metrics', None)
+        if isinstance(metrics, MetricsWriter):
+            agent.metrics = buffers[agentIndex] = MetricsBuffer(metrics.path)
+    return buffers
+
+
+def takeBufferedRows(buffers):
+    "Returns {agentIndex: rows} for the buffers returned by bufferMetrics"
+    return dict((agentIndex, buffer.takeRows()) for agentIndex, buffer in buffers.items())
+
+
+def writeBufferedRows(agents, rows, episode=None):
+    """
+    Writes rows sent back from a worker, as {agentIndex: rows}, with the
+    writers of agents in this process.  Each worker counts episodes from
+    where its copy of the agent started, so episode, if given, replaces
+    the episode number of the rows.
+    """
+    for agentIndex, agentRows in rows.items():
+        metrics = getattr(agents[agentIndex], 'metrics', None)
+        if metrics is None:
+            continue
+        for row in agentRows:
+            if episode is not None:
+                row['episode'] = episode
+            metrics.emit(**row)
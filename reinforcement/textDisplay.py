@@ -49,9 +49,8 @@ class NullGraphics:
 
 class PacmanGraphics:
     def __init__(self, speed=None):
-        if speed != None:
-            global SLEEP_TIME
-            SLEEP_TIME = speed
+        # Per display, so that displays with different speeds can coexist
+        self.sleepTime = SLEEP_TIME if speed == None else speed
 
     def initialize(self, state, isBlue=False):
         self.draw(state)
@@ -76,7 +75,7 @@ class PacmanGraphics:
             self.draw(state)
 
     def pause(self):
-        time.sleep(SLEEP_TIME)
+        time.sleep(self.sleepTime)
 
     def draw(self, state):
         print(state)
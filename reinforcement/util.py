@@ -29,6 +29,7 @@
 
 import sys
 import inspect
+import threading
 import heapq
 import random
 import io
@@ -521,10 +522,12 @@ def normalize(vectorOrCounter):
         return [el / s for el in vector]
 
 
-def nSample(distribution, values, n):
+def nSample(distribution, values, n, rng=None):
+    if rng is None:
+        rng = random
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    rand = [random.random() for i in range(n)]
+    rand = [rng.random() for i in range(n)]
     rand.sort()
     samples = []
     samplePos, distPos, cdf = 0, 0, distribution[0]
@@ -538,14 +541,20 @@ def nSample(distribution, values, n):
     return samples
 
 
-def sample(distribution, values=None):
+def sample(distribution, values=None, rng=None):
+    """
+    Samples a value.  rng is the random.Random to draw from, by default the
+    random module.  The same goes for the other sampling functions.
+    """
+    if rng is None:
+        rng = random
     if type(distribution) == Counter:
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = rng.random()
     i, total = 0, distribution[0]
     while choice > total:
         i += 1
@@ -553,9 +562,9 @@ def sample(distribution, values=None):
     return values[i]
 
 
-def sampleFromCounter(ctr):
+def sampleFromCounter(ctr, rng=None):
     items = sorted(ctr.items())
-    return sample([v for k, v in items], [k for k, v in items])
+    return sample([v for k, v in items], [k for k, v in items], rng)
 
 
 def getProbability(value, distribution, values):
@@ -570,16 +579,20 @@ def getProbability(value, distribution, values):
     return total
 
 
-def flipCoin(p):
-    r = random.random()
+def flipCoin(p, rng=None):
+    if rng is None:
+        rng = random
+    r = rng.random()
     return r < p
 
 
-def chooseFromDistribution(distribution):
+def chooseFromDistribution(distribution, rng=None):
     "Takes either a counter or a list of (prob, key) pairs and samples"
+    if rng is None:
+        rng = random
     if type(distribution) == dict or type(distribution) == Counter:
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, rng=rng)
+    r = rng.random()
     base = 0.0
     for prob, element in distribution:
         base += prob
@@ -711,33 +724,283 @@ class TimeoutFunction:
         return result
 
 
-_ORIGINAL_STDOUT = None
-_ORIGINAL_STDERR = None
-_MUTED = False
+class PhaseTimes:
+    """
+    Records the time spent in the phases of a game (e.g. 'getAction' or
+    'generateSuccessor') per agent: call counts, total times and a
+    histogram of the durations.  Histogram bucket b counts the calls which
+    took less than 2**b microseconds, and at least 2**(b-1).
+
+    Time a phase with
+
+      start = time.perf_counter()
+      ...
+      phaseTimes.add('getAction', agentIndex, time.perf_counter() - start)
+    """
+    NUM_BUCKETS = 32
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, phase, agentIndex, seconds):
+        times = self.phases.get((phase, agentIndex))
+        if times is None:
+            times = self.phases[(phase, agentIndex)] = [0, 0.0, [0] * self.NUM_BUCKETS]
+        times[0] += 1
+        times[1] += seconds
+        times[2][min(int(seconds * 1e6).bit_length(), self.NUM_BUCKETS - 1)] += 1
+
+    def _select(self, phase, agentIndex):
+        return [times for (p, i), times in self.phases.items()
+                if p == phase and (agentIndex is None or i == agentIndex)]
+
+    def count(self, phase, agentIndex=None):
+        "The number of calls to a phase, by one agent or by all of them"
+        return sum([times[0] for times in self._select(phase, agentIndex)])
+
+    def total(self, phase, agentIndex=None):
+        "The time spent in a phase in seconds, by one agent or by all of them"
+        return sum([times[1] for times in self._select(phase, agentIndex)])
+
+    def histogram(self, phase, agentIndex=None):
+        "The histogram of the durations of a phase, by one agent or by all of them"
+        histogram = [0] * self.NUM_BUCKETS
+        for times in self._select(phase, agentIndex):
+            histogram = [a + b for a, b in zip(histogram, times[2])]
+        return histogram
+
+    def summary(self):
+        """
+        Returns {phase: {agentIndex: {'count', 'total', 'mean', 'histogram'}}},
+        with the times in seconds and histograms without trailing zeros.
+        """
+        summary = {}
+        for (phase, agentIndex), (count, total, histogram) in sorted(self.phases.items()):
+            end = max([b + 1 for b, n in enumerate(histogram) if n] or [0])
+            summary.setdefault(phase, {})[agentIndex] = {
+                'count': count, 'total': total, 'mean': total / count, 'histogram': histogram[:end]}
+        return summary
+
+    def reset(self):
+        self.phases = {}
+
+    def __str__(self):
+        lines = ['%-18s %5s %9s %11s %11s' % ('phase', 'agent', 'calls', 'total (s)', 'mean (us)')]
+        for phase, agents in self.summary().items():
+            for agentIndex, times in agents.items():
+                lines.append('%-18s %5d %9d %11.4f %11.1f' % (
+                    phase, agentIndex, times['count'], times['total'], times['mean'] * 1e6))
+        return '\n'.join(lines)
+
+
+class TimedCall:
+    """
+    Times a call with the monotonic clock.  Unlike TimeoutFunction it needs
+    no signal handler, so it works in any thread and costs two clock reads,
+    but the time limit is only checked after the function returns: a call
+    which never returns can only be interrupted by a Watchdog.
+    """
+
+    def __init__(self, function, timeout, watchdog=None):
+        self.function = function
+        self.timeout = timeout
+        self.watchdog = watchdog
+        self.timeTaken = 0
+
+    def __call__(self, *args, **keyArgs):
+        # No time left, e.g. after a slow observationFunction: time out
+        # without calling the function
+        if self.timeout <= 0:
+            self.timeTaken = 0
+            raise TimeoutFunctionException()
+        startTime = time.monotonic()
+        try:
+            if self.watchdog is None:
+                result = self.function(*args, **keyArgs)
+            else:
+                result = self.watchdog.call(self.timeout, self.function, *args, **keyArgs)
+        finally:
+            self.timeTaken = time.monotonic() - startTime
+        if self.timeTaken > self.timeout:
+            raise TimeoutFunctionException()
+        return result
+
+
+class Watchdog:
+    """
+    A daemon thread which interrupts calls that run past their deadline, by
+    raising a TimeoutFunctionException in the thread making the call.  One
+    watchdog can serve any number of threads.  The exception is raised
+    between two Python bytecodes, so a call blocked in C code (e.g. sleeping
+    or waiting for I/O) is only interrupted when it returns to Python.
+    Requires CPython.
+    """
+
+    def __init__(self):
+        self.deadlines = {}
+        self.fired = set()
+        # disarm holds the lock itself, whose release is not Python code,
+        # so a timeout raised in disarm cannot leave it locked
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.thread = None
+
+    def call(self, timeout, function, *args, **keyArgs):
+        self.arm(timeout)
+        try:
+            return function(*args, **keyArgs)
+        finally:
+            self.disarm()
+
+    def arm(self, timeout):
+        "Interrupt the current thread if it does not disarm within timeout seconds"
+        ident = threading.get_ident()
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._watch, daemon=True)
+                self.thread.start()
+            # A timeout which fired after the last call ended has been raised
+            # already, or was never delivered: in either case it is over
+            self.fired.discard(ident)
+            self.deadlines[ident] = time.monotonic() + timeout
+            self.condition.notify()
+
+    def disarm(self):
+        """
+        Cancels the deadline of the current thread, and raises a
+        TimeoutFunctionException if it has passed.  A timeout is only ever
+        raised once, whether it arrives in the call or during disarm.
+        """
+        ident = threading.get_ident()
+        timedOut = False
+        while True:
+            try:
+                with self.lock:
+                    self.deadlines.pop(ident, None)
+                    if ident in self.fired:
+                        self.fired.discard(ident)
+                        timedOut = True
+                        # The exception may still be pending: clear it
+                        _setAsyncExc(ident, None)
+                break
+            except TimeoutFunctionException:
+                # It arrived before it could be cleared
+                timedOut = True
+        if timedOut:
+            raise TimeoutFunctionException()
+
+    def _watch(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                for ident, deadline in list(self.deadlines.items()):
+                    if deadline <= now:
+                        del self.deadlines[ident]
+                        self.fired.add(ident)
+                        _setAsyncExc(ident, TimeoutFunctionException)
+                if self.deadlines:
+                    self.condition.wait(min(self.deadlines.values()) - now)
+                else:
+                    self.condition.wait()
+
+
+def _setAsyncExc(ident, exception):
+    import ctypes
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(ident), ctypes.py_object(exception) if exception else None)
 
 
 class WritableNull:
     def write(self, string):
         pass
 
+    def flush(self):
+        pass
+
+
+class ThreadLocalOutput:
+    """
+    Stands in for sys.stdout or sys.stderr, and writes to the stream that
+    output has been redirected to in the current thread (see redirectOutput),
+    or to the original stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def target(self):
+        stack = getattr(self.local, 'stack', None)
+        return stack[-1] if stack else self.stream
+
+    def write(self, string):
+        return self.target().write(string)
+
+    def flush(self):
+        flush = getattr(self.target(), 'flush', None)
+        if flush is not None:
+            flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target(), name)
+
+
+def _outputProxies():
+    """
+    Returns the ThreadLocalOutputs standing in for sys.stdout and sys.stderr,
+    installing them if needed.
+    """
+    if not isinstance(sys.stdout, ThreadLocalOutput):
+        sys.stdout = ThreadLocalOutput(sys.stdout)
+    if not isinstance(sys.stderr, ThreadLocalOutput):
+        sys.stderr = ThreadLocalOutput(sys.stderr)
+    return sys.stdout, sys.stderr
+
+
+def redirectOutput(stream, stderr=True):
+    """
+    Sends the output of the current thread to sys.stdout, and to sys.stderr
+    if stderr is True, to stream until the matching restoreOutput().  Other
+    threads are not affected, and redirections can be nested.
+    """
+    stdout, stderr_ = _outputProxies()
+    stdout.stack().append(stream)
+    stderr_.stack().append(stream if stderr else stderr_.target())
+    return stdout, stderr_
+
+
+def restoreOutput(proxies=None):
+    """
+    Undoes the last redirectOutput() of the current thread.  proxies are the
+    proxies returned by redirectOutput, in case sys.stdout or sys.stderr has
+    been replaced since.
+    """
+    for proxy in proxies or (sys.stdout, sys.stderr):
+        if isinstance(proxy, ThreadLocalOutput) and proxy.stack():
+            proxy.stack().pop()
+
+
+_MUTED = threading.local()
+
 
 def mutePrint():
-    global _ORIGINAL_STDOUT, _ORIGINAL_STDERR, _MUTED
-    if _MUTED:
+    """
+    Discards what the current thread prints, until unmutePrint().
+    """
+    if getattr(_MUTED, 'proxies', None) is not None:
         return
-    _MUTED = True
-
-    _ORIGINAL_STDOUT = sys.stdout
-    #_ORIGINAL_STDERR = sys.stderr
-    sys.stdout = WritableNull()
-    #sys.stderr = WritableNull()
+    _MUTED.proxies = redirectOutput(WritableNull(), stderr=False)
 
 
 def unmutePrint():
-    global _ORIGINAL_STDOUT, _ORIGINAL_STDERR, _MUTED
-    if not _MUTED:
+    proxies = getattr(_MUTED, 'proxies', None)
+    if proxies is None:
         return
-    _MUTED = False
-
-    sys.stdout = _ORIGINAL_STDOUT
-    #sys.stderr = _ORIGINAL_STDERR
+    _MUTED.proxies = None
+    restoreOutput(proxies)
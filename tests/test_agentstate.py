@@ -0,0 +1,30 @@
+import pytest
+
+from reinforcement.game import AgentState, Configuration, Directions
+
+
+def make_agent_state():
+    return AgentState(Configuration((1, 2), Directions.STOP), False)
+
+
+def test_replace_changes_only_the_given_attributes():
+    agentState = make_agent_state()
+    moved = agentState.replace(configuration=Configuration((2, 2), Directions.EAST))
+    assert moved.getPosition() == (2, 2) and moved.scaredTimer == 0
+    assert moved.start is agentState.start and not moved.isPacman
+    scared = moved.replace(scaredTimer=40)
+    assert scared.configuration is moved.configuration and scared.scaredTimer == 40
+    assert agentState.getPosition() == (1, 2)
+
+
+def test_replace_can_take_an_agent_out_of_play():
+    agentState = make_agent_state().replace(scaredTimer=3)
+    removed = agentState.replace(configuration=None)
+    assert removed.configuration is None and removed.getPosition() is None
+    assert removed.scaredTimer == 3
+    assert removed.replace(scaredTimer=0).configuration is None
+
+
+def test_agent_states_are_immutable():
+    with pytest.raises(AttributeError):
+        make_agent_state().scaredTimer = 1
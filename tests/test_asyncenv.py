@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('gym')
+
+from gymberkeleyrl.envs import AsyncEnv, AsyncPacmanEnv, PacmanEnv
+
+ENV_KWARGS = dict(layout='smallClassic', quiet_graphics=True, ghost_agent='RandomGhost')
+
+
+def fail_to_make_env():
+    raise ValueError('no environment')
+
+
+def play(env, call, turns=20):
+    '''
+    Play the first legal action for `turns` turns, with `call(method, *args)`
+    calling the methods of `env` and returning their results.
+    '''
+    call('seed', 3)
+    observation = call('reset')
+    transitions = []
+    for turn in range(turns):
+        action = observation.getLegalActions(0)[0]
+        observation, reward, done, info = call('step', action)
+        transitions.append((observation, reward, done))
+        if done:
+            break
+    return transitions
+
+
+def play_async(env, turns=20):
+    loop = asyncio.new_event_loop()
+    try:
+        return play(env, lambda method, *args: loop.run_until_complete(env.call(method, *args)), turns)
+    finally:
+        loop.close()
+        env.close()
+
+
+def expected_transitions(turns=20):
+    env = PacmanEnv(**ENV_KWARGS)
+    return play(env, lambda method, *args: getattr(env, method)(*args), turns)
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_round_trip_matches_the_environment(processes):
+    transitions = play_async(AsyncPacmanEnv(processes=processes, **ENV_KWARGS))
+    assert transitions == expected_transitions()
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_concurrent_environments(processes):
+    envs = [AsyncPacmanEnv(processes=processes, **ENV_KWARGS) for i in range(2)]
+
+    async def reset_all():
+        return await asyncio.gather(*[env.reset() for env in envs])
+
+    try:
+        first, second = asyncio.run(reset_all())
+        assert first == second
+    finally:
+        for env in envs:
+            env.close()
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_construction_errors_are_raised(processes):
+    with pytest.raises(ValueError, match='no environment'):
+        AsyncEnv(fail_to_make_env, processes=processes)
+    with pytest.raises(Exception, match='cannot be found'):
+        AsyncPacmanEnv(processes=processes, layout='noSuchLayout', quiet_graphics=True)
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_call_errors_are_raised(processes):
+    env = AsyncPacmanEnv(processes=processes, **ENV_KWARGS)
+    try:
+        asyncio.run(env.reset())
+        with pytest.raises(Exception, match='Illegal action'):
+            asyncio.run(env.step('NoSuchAction'))
+        assert asyncio.run(env.reset()) is not None
+    finally:
+        env.close()
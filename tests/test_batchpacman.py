@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('gym')
+
+from reinforcement import layout
+from reinforcement import pacman
+from gymberkeleyrl.envs.batchpacman import ACTION_INDEX, BatchPacmanSimulator
+
+
+def engine_arrays(state, num_agents):
+    pos = [state.data.agentStates[i].configuration.pos2 for i in range(num_agents)]
+    scared = [state.data.agentStates[i].scaredTimer for i in range(num_agents)]
+    return pos, scared
+
+
+@pytest.mark.parametrize('layout_name', ['smallClassic', 'mediumClassic', 'capsuleClassic'])
+def test_batch_matches_game_state(layout_name):
+    batch_size, turns = 16, 300
+    sim = BatchPacmanSimulator(layout_name, batch_size=batch_size)
+    num_agents = sim.num_agents
+    states = []
+    for b in range(batch_size):
+        state = pacman.GameState()
+        state.initialize(layout.getLayout(layout_name), sim.num_ghosts)
+        states.append(state)
+    rng = random.Random(0)
+
+    for turn in range(turns):
+        pacman_actions = np.zeros(batch_size, dtype=np.int64)
+        ghost_actions = np.zeros((batch_size, sim.num_ghosts), dtype=np.int64)
+        for b, state in enumerate(states):
+            for agent in range(num_agents):
+                if state.isWin() or state.isLose():
+                    break
+                action = rng.choice(state.getLegalActions(agent))
+                if agent == 0:
+                    pacman_actions[b] = ACTION_INDEX[action]
+                else:
+                    ghost_actions[b, agent - 1] = ACTION_INDEX[action]
+                state = state.generateSuccessor(agent, action)
+            states[b] = state
+
+        rewards, dones = sim.step(pacman_actions, ghost_actions)
+
+        for b, state in enumerate(states):
+            pos, scared = engine_arrays(state, num_agents)
+            assert sim.pos[b].tolist() == [list(p) for p in pos], (turn, b)
+            assert sim.scared_timer[b, 1:].tolist() == scared[1:], (turn, b)
+            assert sim.score[b] == state.getScore(), (turn, b)
+            assert sim.food[b].tolist() == state.data.food.data, (turn, b)
+            assert sorted(zip(*np.nonzero(sim.capsules[b]))) == sorted(state.getCapsules())
+            assert sim.win[b] == state.isWin() and sim.lose[b] == state.isLose(), (turn, b)
+            assert dones[b] == (state.isWin() or state.isLose())
+        if dones.all():
+            break
+    assert dones.any()
@@ -0,0 +1,77 @@
+import pytest
+
+from reinforcement import layout
+from reinforcement import pacman
+
+
+def make_state(name='smallClassic'):
+    state = pacman.GameState()
+    state.initialize(layout.getLayout(name), 2)
+    return state
+
+
+def expand(state, depth):
+    '''
+    Generate every successor of pacman's moves down to `depth`, and return
+    the number generated.
+    '''
+    if depth == 0 or state.isWin() or state.isLose():
+        return 0
+    count = 0
+    for action in state.getLegalActions(0):
+        successor = state.generateSuccessor(0, action)
+        count += 1 + expand(successor, depth - 1)
+    return count
+
+
+def test_tracking_is_off_by_default():
+    state = make_state()
+    assert state.exploredTracker is None
+    expand(state, 3)
+    assert pacman.GameState.getAndResetExplored() == set()
+
+
+def test_set_mode_keeps_at_most_limit_states():
+    state = make_state()
+    tracker = pacman.ExploredTracker('set', limit=7)
+    state.setExploredTracker(tracker)
+    generated = expand(state, 4)
+    assert tracker.count == generated > 7
+    assert len(tracker.explored) == 7
+    assert state in tracker.explored
+
+
+def test_set_mode_without_limit_keeps_every_state():
+    state = make_state()
+    tracker = pacman.ExploredTracker('set', limit=None)
+    state.setExploredTracker(tracker)
+    generated = expand(state, 3)
+    assert tracker.count == generated
+    assert len(tracker.explored) > 7
+    explored = tracker.getAndReset()
+    assert state in explored and tracker.count == 0 and tracker.explored == set()
+
+
+def test_count_mode_only_counts():
+    state = make_state()
+    tracker = pacman.ExploredTracker('count')
+    state.setExploredTracker(tracker)
+    generated = expand(state, 3)
+    assert tracker.count == generated and tracker.explored == set()
+
+
+def test_track_explored_sets_the_tracker_of_new_games():
+    try:
+        tracker = pacman.GameState.trackExplored('set', limit=3)
+        state = make_state()
+        assert state.exploredTracker is tracker
+        expand(state, 2)
+        assert len(pacman.GameState.getAndResetExplored()) == 3
+    finally:
+        pacman.GameState.trackExplored(None)
+    assert make_state().exploredTracker is None
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(Exception):
+        pacman.ExploredTracker('list')
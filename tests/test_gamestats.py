@@ -0,0 +1,79 @@
+import random
+import statistics
+from types import SimpleNamespace
+
+import pytest
+
+from reinforcement import pacman
+
+
+def make_result(score, win, timeout=False, crashed=False):
+    state = SimpleNamespace(getScore=lambda: score, isWin=lambda: win)
+    return SimpleNamespace(state=state, agentTimeout=timeout, agentCrashed=crashed, moveHistory=())
+
+
+def random_results(count, seed=0):
+    rng = random.Random(seed)
+    return [make_result(rng.gauss(200, 400), rng.random() < 0.3, rng.random() < 0.05,
+                        rng.random() < 0.02) for i in range(count)]
+
+
+def add_all(stats, results):
+    for result in results:
+        stats.add(result)
+    return stats
+
+
+def test_running_mean_and_variance():
+    results = random_results(2000)
+    scores = [result.state.getScore() for result in results]
+    stats = add_all(pacman.GameStats(), results)
+    assert stats.count == len(scores)
+    assert stats.mean == pytest.approx(statistics.mean(scores))
+    assert stats.total / stats.count == pytest.approx(statistics.mean(scores))
+    assert stats.variance(sample=False) == pytest.approx(statistics.pvariance(scores))
+    assert stats.variance() == pytest.approx(statistics.variance(scores))
+
+
+def test_counts():
+    results = random_results(500)
+    stats = add_all(pacman.GameStats(), results)
+    assert stats.wins == sum(result.state.isWin() for result in results)
+    assert stats.timeouts == sum(result.agentTimeout for result in results)
+    assert stats.crashes == sum(result.agentCrashed for result in results)
+    assert stats.winRate() == pytest.approx(stats.wins / 500.0)
+
+
+def test_quantiles_are_exact_below_the_sample_size():
+    results = random_results(999)
+    scores = [result.state.getScore() for result in results]
+    stats = add_all(pacman.GameStats(sampleSize=1000), results)
+    deciles = statistics.quantiles(scores, n=10, method='inclusive')
+    for k, decile in enumerate(deciles, 1):
+        assert stats.quantile(k / 10.0) == pytest.approx(decile)
+    assert stats.quantile(0) == min(scores) and stats.quantile(1) == max(scores)
+
+
+def test_memory_is_bounded_without_per_game_results():
+    results = random_results(20000)
+    scores = sorted(result.state.getScore() for result in results)
+    stats = add_all(pacman.GameStats(sampleSize=1000), results)
+    assert stats.scores is None and stats.outcomes is None and stats.games is None
+    assert len(stats._sample) == 1000
+    for q in (0.1, 0.5, 0.9):
+        rank = sum(score <= stats.quantile(q) for score in scores) / float(len(scores))
+        assert rank == pytest.approx(q, abs=0.05)
+
+
+def test_per_game_results_are_kept_on_request(capsys):
+    results = [make_result(10.0, True), make_result(-5.0, False)]
+    stats = add_all(pacman.GameStats(keepGames=True), results)
+    assert list(stats.scores) == [10.0, -5.0] and list(stats.outcomes) == [1, 0]
+    assert stats.games == results
+    stats.printSummary()
+    out = capsys.readouterr().out
+    assert 'Scores:        10.0, -5.0' in out and 'Record:        Win, Loss' in out
+
+    add_all(pacman.GameStats(), results).printSummary()
+    out = capsys.readouterr().out
+    assert 'Average Score: 2.5' in out and 'Scores' not in out and 'Record' not in out
@@ -0,0 +1,84 @@
+import pytest
+
+from reinforcement import layout
+from reinforcement import pacman
+from reinforcement.game import Configuration, Directions
+from reinforcement.util import nearestPoint
+
+
+def make_state(name='smallClassic'):
+    state = pacman.GameState()
+    state.initialize(layout.getLayout(name), 2)
+    return state
+
+
+def place(state, agentIndex, pos, direction=Directions.STOP, scaredTimer=0):
+    agentState = state.data.agentStates[agentIndex]
+    state.data.agentStates[agentIndex] = agentState.replace(
+        configuration=Configuration(pos, direction), scaredTimer=scaredTimer)
+
+
+def test_positions_are_ints_at_grid_points_and_floats_between():
+    config = Configuration((3, 4), Directions.NORTH)
+    assert config.getPosition() == (3, 4) and type(config.getPosition()[0]) is int
+    assert config.getPosition() == (3.0, 4.0) and hash(config.getPosition()) == hash((3.0, 4.0))
+    moved = config.move(Directions.CODES[Directions.NORTH], 1)
+    assert moved.getPosition() == (3, 4.5) and type(moved.getPosition()[1]) is float
+    assert moved.pos2 == (6, 9)
+
+
+def test_scared_ghosts_move_at_half_speed():
+    state = make_state()
+    ghost = state.data.agentStates[1]
+    state.data.agentStates[1] = ghost.replace(scaredTimer=pacman.SCARED_TIME)
+    x, y = ghost.getPosition()
+    action = pacman.GhostRules.getLegalActions(state, 1)[0]
+    dx, dy = pacman.Actions.directionToVector(action, 0.5)
+    pacman.GhostRules.applyAction(state, action, 1)
+    assert state.data.agentStates[1].getPosition() == (x + dx, y + dy)
+    assert not state.data.agentStates[1].configuration.isInteger()
+
+    state.data.agentStates[1] = state.data.agentStates[1].replace(scaredTimer=0)
+    assert pacman.GhostRules.getLegalActions(state, 1) == [action]
+    pacman.GhostRules.applyAction(state, action, 1)
+    assert state.data.agentStates[1].getPosition() == (x + 3 * dx, y + 3 * dy)
+
+
+@pytest.mark.parametrize('pos', [(3.5, 5), (3, 5.5), (3, 5)])
+def test_ghosts_snap_to_the_grid_when_no_longer_scared(pos):
+    state = make_state()
+    place(state, 1, pos, Directions.EAST, scaredTimer=1)
+    ghost = pacman.GhostRules.decrementTimer(state.data.agentStates[1])
+    assert ghost.scaredTimer == 0
+    assert ghost.getPosition() == nearestPoint(pos)
+    assert ghost.configuration.isInteger()
+    assert ghost.getDirection() == Directions.EAST
+
+
+def test_timer_counts_down_without_moving_the_ghost():
+    state = make_state()
+    place(state, 1, (3.5, 5), scaredTimer=2)
+    ghost = pacman.GhostRules.decrementTimer(state.data.agentStates[1])
+    assert ghost.scaredTimer == 1 and ghost.getPosition() == (3.5, 5)
+
+
+def test_eating_a_scared_ghost_sends_it_home():
+    state = make_state()
+    pacmanPos = state.getPacmanPosition()
+    place(state, 1, (pacmanPos[0] + 0.5, pacmanPos[1]), scaredTimer=10)
+    pacman.GhostRules.checkDeath(state, 0)
+    ghost = state.data.agentStates[1]
+    assert state.data.scoreChange == 200
+    assert ghost.configuration == ghost.start and ghost.scaredTimer == 0
+    assert state.data._eaten[1] and not state.isLose()
+
+
+def test_a_ghost_catches_pacman_within_the_tolerance():
+    state = make_state()
+    x, y = state.getPacmanPosition()
+    place(state, 1, (x + 1, y))
+    pacman.GhostRules.checkDeath(state, 1)
+    assert not state.isLose()
+    place(state, 1, (x + 0.5, y))
+    pacman.GhostRules.checkDeath(state, 1)
+    assert state.isLose() and state.data.scoreChange == -500
@@ -0,0 +1,36 @@
+import sys
+
+import pytest
+
+import gridworldapp
+
+
+def run(monkeypatch, tmp_path, *argv):
+    curve_file = tmp_path / ('curves-%d.csv' % len(list(tmp_path.iterdir())))
+    monkeypatch.setattr(sys, 'argv', ['gridworldapp.py', '--batch', '-q', '--curveFile', str(curve_file)]
+                        + list(argv))
+    curves = gridworldapp.main()
+    return curves, curve_file.read_text()
+
+
+BATCH = ('-a', 'random', '-g', 'CliffGrid', '-k', '20', '--seeds', '3', '-n', '0.2')
+
+
+def test_batch_mode_is_reproducible(monkeypatch, tmp_path):
+    curves, rows = run(monkeypatch, tmp_path, *BATCH)
+    assert sorted(curves) == [0, 1, 2] and all(len(returns) == 20 for returns in curves.values())
+    assert rows.splitlines()[0] == 'seed,episode,return,length'
+    assert len(rows.splitlines()) == 1 + 3 * 20
+    assert run(monkeypatch, tmp_path, *BATCH) == (curves, rows)
+    assert run(monkeypatch, tmp_path, *(BATCH + ('--workers', '2'))) == (curves, rows)
+    assert run(monkeypatch, tmp_path, *(BATCH + ('--seed', '1')))[0][1] == curves[1]
+    assert run(monkeypatch, tmp_path, *(BATCH + ('--seed', '3')))[0][3] != curves[0]
+
+
+@pytest.mark.parametrize('flag', ['--metricsFile', '--memoryLog'])
+def test_batch_mode_rejects_per_episode_logs(monkeypatch, tmp_path, capsys, flag):
+    with pytest.raises(SystemExit) as exit:
+        run(monkeypatch, tmp_path, *(BATCH + (flag, str(tmp_path / 'log'))))
+    assert exit.value.code == 2
+    assert flag in capsys.readouterr().err
+    assert not (tmp_path / 'log').exists()
@@ -0,0 +1,60 @@
+from reinforcement.game import Directions, MoveHistory, SharedMoveHistory
+
+
+def test_shared_history_keeps_prefix_of_branches():
+    history = SharedMoveHistory()
+    history.append((0, Directions.NORTH))
+    history.append((1, Directions.WEST))
+    saved = history.share()
+
+    history.append((0, Directions.EAST))
+    branch = saved.share()
+    branch.append((0, Directions.SOUTH))
+    branch.append((1, Directions.STOP))
+
+    assert list(saved) == [(0, Directions.NORTH), (1, Directions.WEST)]
+    assert list(history) == [(0, Directions.NORTH), (1, Directions.WEST), (0, Directions.EAST)]
+    assert list(branch) == [(0, Directions.NORTH), (1, Directions.WEST),
+                            (0, Directions.SOUTH), (1, Directions.STOP)]
+    assert history[-1] == (0, Directions.EAST)
+    assert len(saved) == 2 and len(branch) == 4
+
+
+def test_shared_history_shares_buffer_until_it_diverges():
+    history = SharedMoveHistory()
+    history.append((0, Directions.NORTH))
+    saved = history.share()
+    history.append((0, Directions.EAST))
+
+    same = saved.share()
+    same.append((0, Directions.EAST))
+    assert same._buffer is history._buffer
+
+    other = saved.share()
+    other.append((0, Directions.WEST))
+    assert other._buffer is not history._buffer
+    assert history == MoveHistory([(0, Directions.NORTH), (0, Directions.EAST)])
+
+
+def test_move_history_round_trips_every_agent_and_direction():
+    moves = [(agent, action) for agent in range(32) for action in Directions.NAMES]
+    history = MoveHistory(moves)
+    assert len(history) == len(moves)
+    assert list(history) == moves
+    assert [history[i] for i in range(len(moves))] == moves
+    assert history[-1] == moves[-1]
+    assert list(history[5:10]) == moves[5:10]
+    assert isinstance(history[5:10], MoveHistory)
+
+    decoded = MoveHistory()
+    decoded.data = bytearray(bytes(history.data))
+    assert decoded == history and decoded == moves
+
+
+def test_move_history_stores_one_byte_per_move():
+    history = MoveHistory([(0, Directions.NORTH), (3, Directions.STOP)])
+    assert len(history.data) == 2
+    assert history.data[1] >> 3 == 3
+    assert Directions.NAMES[history.data[1] & 7] == Directions.STOP
+    del history[0]
+    assert list(history) == [(3, Directions.STOP)]
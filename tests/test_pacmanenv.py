@@ -0,0 +1,175 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('gym')
+
+from gymberkeleyrl.envs import PacmanEnv
+
+
+def make_env(**kwargs):
+    kwargs.setdefault('layout', 'smallClassic')
+    kwargs.setdefault('quiet_graphics', True)
+    return PacmanEnv(**kwargs)
+
+
+def first_action(env, observation):
+    return env.getPossibleActions(observation, 0)[0]
+
+
+def play(env, seed=3, turns=30):
+    env.seed(seed)
+    observation = env.reset()
+    transitions = []
+    for turn in range(turns):
+        observation, reward, done, info = env.step(first_action(env, observation))
+        transitions.append((observation, reward, done))
+        if done:
+            break
+    return transitions
+
+
+def test_single_agent_mode_moves_the_ghosts():
+    env = make_env(ghost_agent='RandomGhost')
+    env.seed(3)
+    observation = env.reset()
+    ghosts = [observation.getGhostPosition(i) for i in range(1, env.num_agents)]
+    observation, reward, done, info = env.step(first_action(env, observation))
+    assert env.agent_idx == 0
+    assert len(env.game.moveHistory) == env.num_agents
+    assert [agent for agent, action in env.game.moveHistory] == list(range(env.num_agents))
+    assert [observation.getGhostPosition(i) for i in range(1, env.num_agents)] != ghosts
+
+
+def test_single_agent_mode_is_seeded_by_the_environment():
+    assert play(make_env(ghost_agent='RandomGhost')) == play(make_env(ghost_agent='RandomGhost'))
+    assert play(make_env(ghost_agent='RandomGhost'), seed=4) != play(make_env(ghost_agent='RandomGhost'))
+
+
+def test_single_agent_reward_sums_the_turn():
+    env = make_env(ghost_agent='DirectionalGhost')
+    env.seed(0)
+    observation = env.reset()
+    total = 0
+    done = False
+    while not done:
+        observation, reward, done, info = env.step(first_action(env, observation))
+        total += reward
+    assert total == observation.getScore()
+    assert 'game' in info
+
+
+def legal_plan(seed=3, turns=40, **kwargs):
+    '''
+    The actions of the first `turns` steps of a seeded game playing the first
+    legal action of the agent to move, and the transitions they led to.
+    '''
+    env = make_env(**kwargs)
+    env.seed(seed)
+    env.reset()
+    actions, transitions = [], []
+    for turn in range(turns):
+        action = env.getPossibleActions()[0]
+        observation, reward, done, info = env.step(action)
+        actions.append(action)
+        transitions.append((observation, reward, done))
+        if done:
+            break
+    return actions, transitions
+
+
+@pytest.mark.parametrize('kwargs', [dict(ghost_agent='RandomGhost'), dict()])
+def test_step_many_matches_repeated_step(kwargs):
+    actions, transitions = legal_plan(**kwargs)
+    env = make_env(**kwargs)
+    env.seed(3)
+    env.reset()
+    observation, rewards, dones, info = env.step_many(actions)
+    assert list(rewards) == [reward for _, reward, _ in transitions]
+    assert list(dones) == [done for _, _, done in transitions]
+    assert observation == transitions[-1][0]
+
+
+def test_step_many_stops_when_the_game_ends():
+    actions, transitions = legal_plan(ghost_agent='DirectionalGhost', turns=500)
+    assert transitions[-1][2]
+    env = make_env(ghost_agent='DirectionalGhost')
+    env.seed(3)
+    env.reset()
+    observation, rewards, dones, info = env.step_many(actions + actions[-1:] * 5)
+    assert len(rewards) == len(actions) and dones[-1]
+    assert 'game' in info
+
+
+def play_on(env, turns=20):
+    transitions = []
+    for turn in range(turns):
+        observation, reward, done, info = env.step(env.getPossibleActions()[0])
+        transitions.append((observation, reward, done))
+        if done:
+            break
+    return transitions
+
+
+def test_restore_state_replays_the_same_trajectory():
+    env = make_env(ghost_agent='RandomGhost')
+    env.seed(3)
+    env.reset()
+    play_on(env, 10)
+    snapshot = env.clone_state()
+    moves = list(env.game.moveHistory)
+    first = play_on(env)
+    final_moves = list(env.game.moveHistory)
+    env.restore_state(snapshot)
+    assert list(env.game.moveHistory) == moves
+    assert play_on(env) == first
+    assert list(env.game.moveHistory) == final_moves
+
+
+def test_restore_state_undoes_a_branch():
+    env = make_env(ghost_agent='RandomGhost')
+    env.seed(3)
+    observation = env.reset()
+    snapshot = env.clone_state()
+    actions = env.getPossibleActions()
+    env.step(actions[-1])
+    env.restore_state(snapshot)
+    assert env.game.state == observation and len(env.game.moveHistory) == 0
+    branch = play_on(env, 5)
+    env.restore_state(snapshot)
+    assert play_on(env, 5) == branch
+
+
+def test_timing_holds_the_times_of_each_step():
+    env = make_env(ghost_agent='RandomGhost', timing=True)
+    env.seed(3)
+    env.reset()
+    timings = []
+    for turn in range(3):
+        observation, reward, done, info = env.step(env.getPossibleActions()[0])
+        timings.append(info['timing'])
+    assert timings[0] is not timings[1]
+    for timing in timings:
+        assert timing.count('generateSuccessor') == env.num_agents
+        assert timing.count('generateSuccessor', 0) == 1
+        assert timing.count('getAction') == env.num_agents - 1
+        assert timing.count('observation', 0) == 1
+        assert 0 < timing.total('generateSuccessor') <= env.timer.total('generateSuccessor')
+    assert env.timer.count('generateSuccessor') == 3 * env.num_agents
+    assert env.timer.total('process') == pytest.approx(sum(t.total('process') for t in timings))
+
+
+def test_timing_of_step_many_covers_every_step():
+    env = make_env(ghost_agent='RandomGhost', timing=True)
+    env.seed(3)
+    env.reset()
+    actions, transitions = legal_plan(ghost_agent='RandomGhost', turns=4)
+    observation, rewards, dones, info = env.step_many(actions)
+    assert info['timing'].count('generateSuccessor', 0) == len(rewards)
+    assert info['timing'].count('observation', 0) == 1
+
+
+def test_timing_is_off_by_default():
+    env = make_env(ghost_agent='RandomGhost')
+    env.reset()
+    observation, reward, done, info = env.step(env.getPossibleActions()[0])
+    assert 'timing' not in info and env.timer is None
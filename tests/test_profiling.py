@@ -0,0 +1,78 @@
+import pstats
+import time
+
+import pytest
+
+from reinforcement import profiling
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path):
+    profiler = profiling.Profiler(str(tmp_path / 'run'), 'sampling', interval=0.001)
+    profiler.start()
+    busy_loop(0.2)
+    profiler.stop()
+    profiler.start()  # profiles add up
+    busy_loop(0.1)
+    path = profiler.save()
+    assert path == str(tmp_path / 'run.collapsed')
+    lines = open(path).read().splitlines()
+    assert lines
+    counts = []
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        counts.append(int(count))
+        assert all(frame.count(' (') == 1 for frame in stack.split(';'))
+    assert counts == sorted(counts, reverse=True)
+    busy = sum(count for line, count in zip(lines, counts) if 'busy_loop (test_profiling.py:' in line)
+    assert busy > 0.5 * sum(counts)
+
+
+def test_cprofile_profiler_writes_pstats(tmp_path):
+    with profiling.Profiler(str(tmp_path / 'run')) as profiler:
+        busy_loop(0.05)
+    stats = pstats.Stats(str(tmp_path / 'run.pstats'))
+    assert any(name == 'busy_loop' for (path, line, name) in stats.stats)
+
+
+def test_unknown_profiler_is_rejected(tmp_path):
+    with pytest.raises(Exception):
+        profiling.Profiler(str(tmp_path / 'run'), 'perf')
+
+
+def test_memory_log_reports_a_growing_site(tmp_path):
+    path = tmp_path / 'memory.log'
+    kept = []
+    with profiling.MemoryLog(str(path), top=3) as log:
+        for episode in range(3):
+            kept.append([bytearray(1000) for i in range(50)])  # the leak
+            log.episode()
+    lines = open(str(path)).read().splitlines()
+    assert lines[0].startswith('start: ')
+    episodes = [line for line in lines if line.startswith('episode ')]
+    assert [line.split(':')[0] for line in episodes] == ['episode 1', 'episode 2', 'episode 3']
+    for line in episodes:
+        growth = int(line.split('(')[1].split(')')[0])
+        assert growth >= 50000
+    sites = [line.split() for line in lines if line.startswith('  ')]
+    leaks = [site for site in sites if int(site[0]) >= 50000]
+    assert len(leaks) == 3
+    assert all('test_profiling.py:' in site[-1] for site in leaks)
+
+
+def test_memory_log_stops_the_tracing_it_started(tmp_path):
+    import tracemalloc
+    assert not tracemalloc.is_tracing()
+    log = profiling.MemoryLog(str(tmp_path / 'memory.log'))
+    log.episode('game 1')
+    assert tracemalloc.is_tracing()
+    log.close()
+    assert not tracemalloc.is_tracing()
+    assert open(str(tmp_path / 'memory.log')).read().splitlines()[1].startswith('game 1: ')
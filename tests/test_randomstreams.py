@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from reinforcement import gridworld
+from reinforcement import layout
+from reinforcement import util
+
+
+def walk(environment, steps=50):
+    states = []
+    for step in range(steps):
+        state = environment.getCurrentState()
+        actions = environment.getPossibleActions(state)
+        if not actions:
+            environment.reset()
+            continue
+        states.append(environment.doAction(actions[step % len(actions)]))
+    return states
+
+
+def test_gridworld_transitions_are_drawn_from_the_environment_stream():
+    grid = gridworld.getBookGrid()
+    grid.setNoise(0.5)
+    random.seed(0)
+    first = walk(gridworld.GridworldEnvironment(grid, random.Random(7)))
+    random.seed(1)
+    global_state = random.getstate()
+    second = walk(gridworld.GridworldEnvironment(grid, random.Random(7)))
+    assert first == second
+    assert random.getstate() == global_state
+    assert walk(gridworld.GridworldEnvironment(grid, random.Random(8))) != first
+
+
+def test_sampling_helpers_use_the_given_stream():
+    global_state = random.getstate()
+    draws = [util.sample([0.2, 0.3, 0.5], 'abc', random.Random(3)) for i in range(5)]
+    assert draws == [util.sample([0.2, 0.3, 0.5], 'abc', random.Random(3)) for i in range(5)]
+    rng = random.Random(4)
+    flips = [util.flipCoin(0.5, rng) for i in range(20)]
+    rng.seed(4)
+    assert [util.flipCoin(0.5, rng) for i in range(20)] == flips
+    assert random.getstate() == global_state
+
+
+def test_layout_positions_use_the_given_stream():
+    lay = layout.getLayout('mediumClassic')
+    global_state = random.getstate()
+    positions = [lay.getRandomLegalPosition(random.Random(seed)) for seed in range(5)]
+    assert positions == [lay.getRandomLegalPosition(random.Random(seed)) for seed in range(5)]
+    assert not any(lay.isWall(pos) for pos in positions)
+    assert random.getstate() == global_state
+
+
+def test_environment_ghosts_do_not_touch_the_random_module():
+    pytest.importorskip('numpy')
+    pytest.importorskip('gym')
+    from gymberkeleyrl.envs import PacmanEnv
+
+    def play(global_seed):
+        random.seed(global_seed)
+        env = PacmanEnv(layout='smallClassic', quiet_graphics=True, ghost_agent='RandomGhost')
+        env.seed(11)
+        env.reset()
+        global_state = random.getstate()
+        positions = []
+        for turn in range(20):
+            observation, reward, done, info = env.step(env.getPossibleActions()[0])
+            positions.append(observation.getGhostPositions())
+            if done:
+                break
+        assert random.getstate() == global_state
+        return positions
+
+    assert play(0) == play(1)
@@ -0,0 +1,79 @@
+import pytest
+
+from reinforcement import layout
+from reinforcement import pacman
+
+
+def make_state(name='smallClassic'):
+    state = pacman.GameState()
+    state.initialize(layout.getLayout(name), 2)
+    return state
+
+
+def test_readonly_state_shares_storage():
+    state = make_state()
+    view = state.readOnly()
+    assert view.getFood()._grid is state.data.food
+    assert view.getFood()[1] == state.data.food.data[1]
+    assert view.getFood().data == state.data.food.data
+    assert view.getWalls()._grid is state.data.layout.walls
+    assert view.getCapsules() == state.data.capsules
+    assert view == state and hash(view) == hash(state)
+
+
+def test_readonly_state_rejects_modification():
+    view = make_state().readOnly()
+    with pytest.raises(TypeError):
+        view.getFood()[1][1] = False
+    with pytest.raises(TypeError):
+        view.getCapsules().append((1, 1))
+    with pytest.raises(TypeError):
+        view.data.agentStates[0] = None
+    with pytest.raises(AttributeError):
+        view.data.score = 10
+
+
+def test_readonly_successor_is_a_game_state():
+    state = make_state()
+    view = state.readOnly()
+    action = view.getLegalActions(0)[0]
+    successor = view.generateSuccessor(0, action)
+    assert type(successor) is pacman.GameState
+    assert successor == state.generateSuccessor(0, action)
+
+
+def test_readonly_grid_data_rejects_modification():
+    state = make_state()
+    food = state.readOnly().getFood()
+    with pytest.raises(TypeError):
+        food.data[1][1] = 'X'
+    with pytest.raises(TypeError):
+        food.data[1] = []
+    with pytest.raises(AttributeError):
+        food.data = []
+    assert state.data.food[1][1] is True
+    copy = food.copy()
+    copy[1][1] = False
+    assert state.data.food[1][1] is True
+
+
+def test_readonly_layout_rejects_modification():
+    state = make_state()
+    lay = state.readOnly().data.layout
+    with pytest.raises(TypeError):
+        lay.walls[0] = None
+    with pytest.raises(TypeError):
+        lay.walls[0][0] = False
+    with pytest.raises(TypeError):
+        lay.food.data[1][1] = 'X'
+    with pytest.raises(TypeError):
+        lay.capsules.append((1, 1))
+    with pytest.raises(TypeError):
+        lay.agentPositions[0] = None
+    with pytest.raises(TypeError):
+        lay.getActionTable()[1][1] = ()
+    with pytest.raises(AttributeError):
+        lay.walls = None
+    assert state.data.layout.walls[0][0] is True
+    assert lay.isWall((0, 0)) and lay.getNumGhosts() == state.data.layout.getNumGhosts()
+    assert str(lay) == str(state.data.layout)
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from reinforcement import layout
+from reinforcement import pacman
+from reinforcement import recording
+from reinforcement import textDisplay
+from reinforcement.ghostAgents import RandomGhost
+from reinforcement.pacmanAgents import GreedyAgent
+
+
+def play_games(path, num_games=3, interval=8, layout_name='smallClassic'):
+    lay = layout.getLayout(layout_name)
+    rules = pacman.ClassicGameRules()
+    games = []
+    with recording.RecordingWriter(str(path), keyframeInterval=interval) as writer:
+        for seed in range(num_games):
+            random.seed(seed)
+            game = rules.newGame(lay, GreedyAgent(), [RandomGhost(1), RandomGhost(2)],
+                                 textDisplay.NullGraphics(), quiet=True,
+                                 keyframeInterval=writer.keyframeInterval)
+            game.run()
+            writer.writeGame(game, lay, seed)
+            games.append(game)
+    return lay, games
+
+
+def test_recordings_round_trip(tmp_path):
+    path = tmp_path / 'games.rec'
+    lay, games = play_games(path)
+    recordings = list(recording.readRecordings(str(path)))
+    assert len(recordings) == len(games)
+    for seed, (game, recorded) in enumerate(zip(games, recordings)):
+        assert recorded.layoutName == 'smallClassic'
+        assert recorded.seed == seed
+        assert recorded.moves == game.moveHistory
+        assert recorded.score == game.state.getScore()
+        assert (recorded.win, recorded.lose) == (game.state.isWin(), game.state.isLose())
+        assert recorded.numAgents == game.state.getNumAgents()
+        assert recorded.replay().end() == game.state
+
+
+def test_keyframes_are_the_states_kept_during_play(tmp_path):
+    path = tmp_path / 'games.rec'
+    lay, games = play_games(path)
+    for game, recorded in zip(games, recording.readRecordings(str(path))):
+        assert sorted(recorded.keyframes) == list(range(8, len(game.moveHistory) + 1, 8))
+        for i, state in game.keyframes:
+            assert recording.decodeState(recorded.keyframes[i], lay) == state
+
+
+def test_replay_seek_matches_stepping_through_the_game(tmp_path):
+    path = tmp_path / 'games.rec'
+    play_games(path, num_games=1)
+    recorded = next(recording.readRecordings(str(path)))
+    stepped = recorded.replay()
+    states = [stepped.seek(0)] + [stepped.step() for i in range(len(recorded.moves))]
+
+    replay = recorded.replay()
+    rng = random.Random(0)
+    for k in [rng.randrange(len(states)) for i in range(50)] + [0, len(states) - 1]:
+        assert replay.seek(k) == states[k]
+        assert replay.position == k
+    assert replay.seek(-3) == states[-4]
+    replay.seek(20)
+    assert replay.back() == states[19]
+    assert replay.end() == states[-1]
+
+
+def test_file_cut_short_ends_at_the_last_whole_record(tmp_path):
+    path = tmp_path / 'games.rec'
+    play_games(path, num_games=2)
+    data = path.read_bytes()
+    path.write_bytes(data[:-5])
+    assert len(list(recording.readRecordings(str(path)))) == 1
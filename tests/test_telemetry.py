@@ -0,0 +1,38 @@
+import csv
+import random
+
+from reinforcement import layout
+from reinforcement import pacman
+from reinforcement import telemetry
+from reinforcement import textDisplay
+from reinforcement.ghostAgents import RandomGhost
+from reinforcement.learningAgents import ReinforcementAgent
+
+
+class RandomLearner(ReinforcementAgent):
+
+    def getAction(self, state):
+        action = random.choice(self.getLegalActions(state))
+        self.doAction(state, action)
+        return action
+
+    def update(self, state, action, nextState, reward):
+        pass
+
+
+def read_metrics(path, num_games, num_training, workers):
+    with telemetry.MetricsWriter(str(path)) as metrics:
+        agent = RandomLearner(numTraining=num_training, metrics=metrics)
+        pacman.runGames(layout.getLayout('smallClassic'), agent, [RandomGhost(1), RandomGhost(2)],
+                        textDisplay.NullGraphics(), num_games, False, num_training, seed=7,
+                        workers=workers)
+    with open(str(path)) as f:
+        return [(row['episode'], row['training'], row['return'], row['length'])
+                for row in csv.DictReader(f)]
+
+
+def test_metrics_of_pool_games_are_written(tmp_path):
+    serial = read_metrics(tmp_path / 'serial.csv', 6, 2, workers=1)
+    pooled = read_metrics(tmp_path / 'pooled.csv', 6, 2, workers=2)
+    assert len(serial) == 6
+    assert pooled == serial
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from reinforcement import layout
+from reinforcement import pacman
+from reinforcement import textDisplay
+from reinforcement.game import Agent, Directions
+from reinforcement.ghostAgents import RandomGhost
+from reinforcement.util import TimedCall, TimeoutFunctionException, Watchdog
+
+
+def spin(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+    return 'done'
+
+
+def test_watchdog_interrupts_a_call_past_its_deadline():
+    watchdog = Watchdog()
+    start = time.monotonic()
+    with pytest.raises(TimeoutFunctionException):
+        watchdog.call(0.05, spin, 5)
+    assert time.monotonic() - start < 1
+    # The timeout is raised once: the next call on the thread is unaffected
+    assert watchdog.call(1, spin, 0.01) == 'done'
+    assert not watchdog.fired and not watchdog.deadlines
+
+
+def test_watchdog_ignores_a_stale_timeout():
+    watchdog = Watchdog()
+    watchdog.fired.add(threading.get_ident())
+    assert watchdog.call(1, spin, 0.01) == 'done'
+
+
+def test_watchdog_serves_several_threads():
+    watchdog = Watchdog()
+    results = {}
+
+    def run(name, seconds):
+        try:
+            results[name] = watchdog.call(0.2, spin, seconds)
+        except TimeoutFunctionException:
+            results[name] = 'timeout'
+
+    threads = [threading.Thread(target=run, args=(i, 5 if i % 2 else 0.01)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {0: 'done', 1: 'timeout', 2: 'done', 3: 'timeout'}
+
+
+def test_timed_call_without_time_left_does_not_call():
+    calls = []
+    timed = TimedCall(calls.append, -0.5)
+    with pytest.raises(TimeoutFunctionException):
+        timed(1)
+    assert calls == [] and timed.timeTaken == 0
+
+
+def test_timed_call_checks_the_time_taken():
+    with pytest.raises(TimeoutFunctionException):
+        TimedCall(spin, 0.01)(0.05)
+    assert TimedCall(spin, 1)(0.01) == 'done'
+
+
+class SlowAgent(Agent):
+
+    def getAction(self, state):
+        spin(5)
+        return Directions.STOP
+
+
+def test_game_times_out_a_slow_agent_with_a_watchdog():
+    rules = pacman.ClassicGameRules(timeout=0.1)
+    game = rules.newGame(layout.getLayout('smallClassic'), SlowAgent(), [RandomGhost(1)],
+                         textDisplay.NullGraphics(), quiet=True, catchExceptions=True,
+                         watchdog=Watchdog())
+    start = time.monotonic()
+    game.run()
+    assert time.monotonic() - start < 2
+    assert game.agentTimeout and game.agentCrashed and game.gameOver
@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('gym')
+
+from gymberkeleyrl.envs import PacmanEnv, SubprocVectorPacmanEnv
+from gymberkeleyrl.envs.pacmanenv import encode_state
+
+ENV_KWARGS = dict(layout='smallClassic', ghost_agent='RandomGhost')
+
+
+def make_local_envs(num_envs, seed):
+    envs = [PacmanEnv(quiet_graphics=True, readonly_observations=True, **ENV_KWARGS)
+            for i in range(num_envs)]
+    for i, env in enumerate(envs):
+        env.seed(seed + i)
+    return envs
+
+
+@pytest.mark.parametrize('num_workers', [1, 2])
+def test_vector_env_matches_separate_envs(num_workers):
+    num_envs, seed = 3, 5
+    envs = make_local_envs(num_envs, seed)
+    states = [env.reset(quiet=True) for env in envs]
+    with SubprocVectorPacmanEnv(num_envs, num_workers, seed=seed, **ENV_KWARGS) as vec_env:
+        obs, infos = vec_env.reset()
+        assert obs.shape == (num_envs,) + vec_env.observation_space.shape
+        for turn in range(60):
+            for i, (env, state) in enumerate(zip(envs, states)):
+                assert np.array_equal(obs[i], encode_state(state))
+                assert infos[i]['legal_actions'] == env.getPossibleActions()
+            actions = [info['legal_actions'][0] for info in infos]
+            obs, rewards, dones, infos = vec_env.step(actions)
+            for i, (env, action) in enumerate(zip(envs, actions)):
+                states[i], reward, done, _ = env.step(action)
+                assert rewards[i] == reward and dones[i] == done
+                if done:
+                    assert infos[i]['score'] == env.game.state.getScore()
+                    states[i] = env.reset(quiet=True)
+
+
+def test_observations_are_copies_of_the_shared_memory():
+    with SubprocVectorPacmanEnv(2, 1, seed=0, **ENV_KWARGS) as vec_env:
+        obs, infos = vec_env.reset()
+        first = obs.copy()
+        vec_env.step([info['legal_actions'][0] for info in infos])
+        assert np.array_equal(obs, first)